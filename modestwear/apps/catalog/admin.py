@@ -1,15 +1,26 @@
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.html import format_html
-from django.db.models import Count, Sum
-from django.urls import reverse
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 
-from apps.catalog.models import Category, Product, ProductImage, ProductVariant, CoverageLevel
+from apps.catalog.models import Category, Product, ProductImage, ProductVariant, CoverageLevel, Promotion
+from apps.catalog.inventory import import_stock, read_stock_rows
+from apps.orders.outbox import publish
+from core.exports import export_action
 
 class ProductVariantInline(admin.TabularInline):
 	model = ProductVariant
 	extra = 1
-	fields = ('sku', 'size', 'color', 'coverage', 'stock_available', 'is_active')
+	fields = ('sku', 'size', 'color', 'coverage', 'stock_available', 'low_stock_threshold', 'is_active')
 	readonly_fields = ('sku',)
 
 	def get_readonly_fields(self, request, obj=None):
@@ -60,21 +71,31 @@ class ProductAdmin(admin.ModelAdmin):
 	list_per_page = 25
 
 	def get_queryset(self, request):
-		return super().get_queryset(request).select_related('category', 'product_size').prefetch_related('variants')
+		# Correlated subqueries rather than joins: no row fan-out, and sorting works on the annotations
+		variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+		return super().get_queryset(request).select_related('category', 'product_size').annotate(
+			total_stock=Coalesce(
+				Subquery(variants.annotate(total=Sum('stock_available')).values('total')), 0
+			),
+			variant_count=Coalesce(
+				Subquery(variants.annotate(count=Count('id')).values('count')), 0
+			),
+		)
 
 	def total_stock(self, obj):
-		total = sum(variant.stock_available for variant in obj.variants.all())
+		total = obj.total_stock
 		if total == 0:
 			return format_html('<span style="color: red; font-weight: bold;">OUT OF STOCK</span>')
 		elif total <= 10:
 			return format_html('<span style="color: orange; font-weight: bold;">{} (LOW)</span>', total)
 		return format_html('<span style="color: green;">{}</span>', total)
 	total_stock.short_description = 'Total Stock'
-	total_stock.admin_order_field = 'variants__stock_available'
+	total_stock.admin_order_field = 'total_stock'
 
 	def variant_count(self, obj):
-		return obj.variants.count()
+		return obj.variant_count
 	variant_count.short_description = 'Variants'
+	variant_count.admin_order_field = 'variant_count'
 
 	@admin.action(description='Mark selected products as featured')
 	def make_featured(self, request, queryset):
@@ -141,19 +162,88 @@ class CoverageLevelAdmin(admin.ModelAdmin):
 		return obj.product_count
 	product_count.short_description = 'Products Using'
 
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+	list_display = ('name', 'kind', 'product', 'category', 'priority', 'starts_at', 'ends_at', 'is_active')
+	list_filter = ('kind', 'is_active', 'category')
+	list_editable = ('is_active', 'priority')
+	search_fields = ('name', 'product__name', 'category__name')
+	autocomplete_fields = ('product', 'category')
+	fieldsets = (
+		(None, {'fields': ('name', 'kind', 'priority', 'is_active')}),
+		('Applies to', {'fields': ('product', 'category'), 'description': 'Leave both empty for a catalog-wide promotion.'}),
+		('Discount', {'fields': ('percent_off', 'buy_quantity', 'get_quantity', 'tiers')}),
+		('Schedule', {'fields': ('starts_at', 'ends_at')}),
+	)
+
+class StockImportForm(forms.Form):
+	file = forms.FileField(help_text='CSV with a sku,stock,price header, or JSONL')
+	dry_run = forms.BooleanField(required=False, help_text='Report the changes without saving them')
+
+	def clean_file(self):
+		upload = self.cleaned_data['file']
+		extension = upload.name.rsplit('.', 1)[-1].lower()
+		if extension not in ('csv', 'jsonl'):
+			raise forms.ValidationError('Upload a .csv or .jsonl file.')
+		upload.import_format = extension
+		return upload
+
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
 	list_display = ('product', 'sku', 'size', 'color', 'stock_status', 'is_active')
 	list_filter = ('is_active', 'size', 'color', 'product__category')
 	search_fields = ('sku', 'product__name', 'color')
 	list_editable = ('is_active',)
-	actions = ['mark_out_of_stock', 'restock_items']
+	actions = ['mark_out_of_stock', 'restock_items', export_action('variants', 'csv'), export_action('variants', 'ndjson')]
+	change_list_template = 'admin/catalog/productvariant/change_list.html'
+
+	def get_urls(self):
+		custom_urls = [
+			path(
+				'import-stock/',
+				self.admin_site.admin_view(self.import_stock_view),
+				name='catalog_productvariant_import_stock'
+			),
+		]
+		return custom_urls + super().get_urls()
+
+	def import_stock_view(self, request):
+		if not self.has_change_permission(request):
+			raise PermissionDenied
+		summary = None
+		form = StockImportForm(request.POST or None, request.FILES or None)
+		if request.method == 'POST' and form.is_valid():
+			upload = form.cleaned_data['file']
+			# Decode the upload lazily so large files are streamed, not read into memory
+			lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+			try:
+				summary = import_stock(
+					read_stock_rows(lines, upload.import_format),
+					dry_run=form.cleaned_data['dry_run']
+				)
+			except UnicodeDecodeError as exc:
+				# Chunks are committed as they go, so earlier rows may already be applied
+				form.add_error('file', f'The file is not UTF-8 ({exc.reason} at byte {exc.start}); rows before it may have been imported.')
+			else:
+				self.message_user(
+					request,
+					f"{summary['stock_updated']} stock and {summary['price_updated']} price updates from {summary['rows']} rows.",
+					messages.WARNING if summary['error_count'] or summary['unknown_count'] else messages.SUCCESS
+				)
+		context = {
+			**self.admin_site.each_context(request),
+			'opts': self.model._meta,
+			'form': form,
+			'summary': summary,
+			'dry_run': form.cleaned_data.get('dry_run') if summary else False,
+		}
+		return TemplateResponse(request, 'admin/catalog/productvariant/import_stock.html', context)
 
 	def stock_status(self, obj):
 		if obj.stock_available <= 0:
 			color = 'red'
 			text = 'OUT OF STOCK'
-		elif obj.stock_available <= 5:
+		elif obj.stock_available <= obj.low_stock_threshold:
 			color = 'orange'
 			text = f'LOW STOCK ({obj.stock_available})'
 		else:
@@ -164,12 +254,16 @@ class ProductVariantAdmin(admin.ModelAdmin):
 
 	@admin.action(description='Mark as out of stock')
 	def mark_out_of_stock(self, request, queryset):
-		updated = queryset.update(stock_available=0, is_active=False)
+		updated = queryset.update(stock_available=0, is_active=False, stock_updated_at=timezone.now())
 		self.message_user(request, f'{updated} variants marked as out of stock.')
 
 	@admin.action(description='Restock items (set to 10)')
 	def restock_items(self, request, queryset):
-		updated = queryset.update(stock_available=10, is_active=True)
+		with transaction.atomic():
+			restocked = list(queryset.select_for_update().filter(stock_available__lte=0).values_list('id', flat=True))
+			updated = queryset.update(stock_available=10, is_active=True, stock_updated_at=timezone.now())
+			if restocked:
+				publish('variant.restocked', variant_ids=restocked)
 		self.message_user(request, f'{updated} variants restocked.')
 
 @admin.register(ProductImage)
@@ -0,0 +1,254 @@
+import csv
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.catalog.models import Product, ProductVariant
+from apps.orders.outbox import publish
+
+logger = logging.getLogger(__name__)
+
+STOCK_IMPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ISSUES = 50
+
+
+def read_stock_rows(lines, file_format):
+    """
+    Stream ``(line_number, row)`` pairs from an iterable of text lines.
+
+    ``file_format`` is ``csv`` (with a ``sku,stock,price`` header) or ``jsonl``.
+    Nothing is held in memory beyond the current line.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else {'_invalid': line}
+    else:
+        raise ValueError(f"Unsupported stock import format: {file_format}")
+
+
+def _parse_row(row):
+    """Return ``(sku, stock, price)``; stock/price are None when the column is blank"""
+    if '_invalid' in row:
+        raise ValueError("not a JSON object")
+    sku = str(row.get('sku') or '').strip()
+    if not sku:
+        raise ValueError("missing sku")
+
+    stock = row.get('stock')
+    if stock in (None, ''):
+        stock = None
+    else:
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid stock '{stock}'")
+        if stock < 0:
+            raise ValueError(f"negative stock '{stock}'")
+
+    price = row.get('price')
+    if price in (None, ''):
+        price = None
+    else:
+        try:
+            price = Decimal(str(price)).quantize(Decimal('0.01'))
+            in_range = Decimal('0') < price < Decimal('10000')
+        except InvalidOperation:
+            raise ValueError(f"invalid price '{price}'")
+        if not in_range:
+            raise ValueError(f"price out of range '{price}'")
+    return sku, stock, price
+
+
+def _new_summary():
+    return {
+        'rows': 0,
+        'stock_updated': 0,
+        'stock_units_delta': 0,
+        'price_updated': 0,
+        'stock_unchanged': 0,
+        'price_only': 0,
+        'unknown_skus': [],
+        'unknown_count': 0,
+        'errors': [],
+        'error_count': 0,
+    }
+
+
+def _record(summary, key, count_key, value):
+    summary[count_key] += 1
+    if len(summary[key]) < MAX_REPORTED_ISSUES:
+        summary[key].append(value)
+
+
+def _apply_chunk(chunk, summary, dry_run):
+    parsed = {}
+    for line_number, row in chunk:
+        summary['rows'] += 1
+        try:
+            sku, stock, price = _parse_row(row)
+        except ValueError as exc:
+            _record(summary, 'errors', 'error_count', f"line {line_number}: {exc}")
+            continue
+        # A SKU repeated within the file keeps its last value
+        parsed[sku] = (stock, price)
+
+    variants = {
+        variant.sku: variant
+        for variant in ProductVariant.objects.filter(sku__in=list(parsed)).only(
+            'id', 'sku', 'stock_available', 'product_id', 'is_active'
+        )
+    }
+
+    changed_variants = []
+    restocked = []
+    sold_out = set()
+    new_prices = {}
+    now = timezone.now()
+    for sku, (stock, price) in parsed.items():
+        variant = variants.get(sku)
+        if variant is None:
+            _record(summary, 'unknown_skus', 'unknown_count', sku)
+            continue
+        if stock is None:
+            # No stock column for this row: a price update only
+            summary['price_only'] += 1
+        elif stock != variant.stock_available:
+            summary['stock_units_delta'] += stock - variant.stock_available
+            if variant.is_active and variant.stock_available <= 0 < stock:
+                restocked.append(variant.id)
+            elif variant.stock_available > 0 >= stock:
+                sold_out.add(variant.product_id)
+            variant.stock_available = stock
+            variant.stock_updated_at = now
+            changed_variants.append(variant)
+        else:
+            summary['stock_unchanged'] += 1
+        if price is not None:
+            # Prices live on the product; variants of one product share the last value seen
+            new_prices[variant.product_id] = price
+
+    changed_products = []
+    price_drops = []
+    for product in Product.objects.filter(id__in=list(new_prices)).only('id', 'base_price'):
+        if product.base_price != new_prices[product.id]:
+            if new_prices[product.id] < product.base_price:
+                price_drops.append([product.id, str(product.base_price)])
+            product.base_price = new_prices[product.id]
+            changed_products.append(product)
+
+    summary['stock_updated'] += len(changed_variants)
+    summary['price_updated'] += len(changed_products)
+    if dry_run:
+        return
+
+    with transaction.atomic():
+        if changed_variants:
+            ProductVariant.objects.bulk_update(changed_variants, ['stock_available', 'stock_updated_at'])
+        if changed_products:
+            Product.objects.bulk_update(changed_products, ['base_price'])
+        # bulk_update skips post_save, so wishlist notifications are published here, one event per chunk
+        if restocked:
+            publish('variant.restocked', variant_ids=restocked)
+        if price_drops:
+            publish('product.price_dropped', drops=price_drops)
+        changed = sold_out | {product.id for product in changed_products}
+        if changed:
+            publish('product.changed', product_ids=sorted(changed))
+
+
+def import_stock(rows, chunk_size=STOCK_IMPORT_CHUNK_SIZE, dry_run=False):
+    """
+    Apply ``sku, stock, price`` rows to ProductVariant stock and product prices.
+
+    Rows are consumed in chunks: each chunk resolves its SKUs with one ``IN``
+    query and writes with ``bulk_update`` in its own transaction, so memory
+    stays flat and a bad row never aborts the rest of the file.
+    Returns a summary dict of what changed.
+    """
+    summary = _new_summary()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _apply_chunk(chunk, summary, dry_run)
+
+    logger.info(
+        f"Stock import{' (dry run)' if dry_run else ''}: {summary['rows']} rows, "
+        f"{summary['stock_updated']} stock and {summary['price_updated']} price updates, "
+        f"{summary['unknown_count']} unknown SKUs, {summary['error_count']} errors"
+    )
+    return summary
+
+
+def low_stock_variants(since=None, variant_ids=None):
+    """
+    Active variants at or below their own ``low_stock_threshold``.
+
+    ``since`` limits the scan to variants whose stock changed after that time,
+    which is served by the partial ``variant_low_stock_idx`` index.
+    Returns plain rows, product and category names included, in one query.
+    """
+    queryset = ProductVariant.objects.filter(is_active=True, stock_available__lte=F('low_stock_threshold'))
+    if since is not None:
+        queryset = queryset.filter(stock_updated_at__gte=since)
+    if variant_ids is not None:
+        queryset = queryset.filter(id__in=variant_ids)
+    return list(
+        queryset.order_by('product__category__name', 'product__name', 'sku').values(
+            'sku', 'stock_available', 'low_stock_threshold',
+            'product_id', 'product__name', 'product__category__name',
+        )
+    )
+
+
+def build_low_stock_digest(rows):
+    """Roll low stock rows up into ``{category: {product: [variant rows]}}``"""
+    digest = {}
+    for row in rows:
+        products = digest.setdefault(row['product__category__name'], {})
+        products.setdefault(row['product__name'], []).append(row)
+    return digest
+
+
+def send_low_stock_digest(digest):
+    """Log one digest for all low stock variants and mail it to STOCK_ALERT_RECIPIENTS"""
+    lines = []
+    for category, products in digest.items():
+        lines.append(f"{category}:")
+        for product, variants in products.items():
+            skus = ', '.join(
+                f"{row['sku']} ({row['stock_available']}/{row['low_stock_threshold']})" for row in variants
+            )
+            lines.append(f"  {product}: {skus}")
+    body = "\n".join(lines)
+    count = sum(len(variants) for products in digest.values() for variants in products.values())
+    logger.warning(f"Low stock digest: {count} variants\n{body}")
+
+    recipients = getattr(settings, 'STOCK_ALERT_RECIPIENTS', [])
+    if recipients:
+        send_mail(
+            subject=f"[{settings.APP_NAME}] Low stock: {count} variants",
+            message=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=recipients,
+        )
+    return count
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.inventory import STOCK_IMPORT_CHUNK_SIZE, import_stock, read_stock_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk update variant stock and product prices from a CSV or JSONL file of sku, stock, price'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or JSONL file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=STOCK_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Report the diff without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Cannot infer the file format, pass --format csv or --format jsonl')
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                summary = import_stock(
+                    read_stock_rows(handle, file_format),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        except UnicodeDecodeError as exc:
+            raise CommandError(f'{path} is not UTF-8 ({exc.reason} at byte {exc.start}); rows before it may have been imported')
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{summary['rows']} rows: {summary['stock_updated']} stock updates "
+            f"({summary['stock_units_delta']:+d} units), {summary['price_updated']} price updates, "
+            f"{summary['stock_unchanged']} unchanged, {summary['price_only']} price only"
+        ))
+        if summary['unknown_count']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['unknown_count']} unknown SKUs: {', '.join(summary['unknown_skus'])}"
+            ))
+        for error in summary['errors']:
+            self.stdout.write(self.style.ERROR(error))
+        if summary['error_count'] > len(summary['errors']):
+            self.stdout.write(self.style.ERROR(f"... {summary['error_count'] - len(summary['errors'])} more errors"))
@@ -122,11 +122,10 @@ class Command(BaseCommand):
                 
                 # Add 2-4 products to each outfit
                 selected_products = random.sample(product_list, random.randint(2, 4))
-                for pos, product in enumerate(selected_products):
+                for product in selected_products:
                     OutfitItem.objects.create(
                         outfit=outfit,
-                        product=product,
-                        position=pos
+                        product=product
                     )
         
         self.stdout.write(
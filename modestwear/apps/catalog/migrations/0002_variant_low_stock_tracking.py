@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productvariant",
+            name="low_stock_threshold",
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name="productvariant",
+            name="stock_updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="productvariant",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_active", True),
+                    ("stock_available__lte", models.F("low_stock_threshold")),
+                ),
+                fields=["stock_updated_at"],
+                name="variant_low_stock_idx",
+            ),
+        ),
+    ]
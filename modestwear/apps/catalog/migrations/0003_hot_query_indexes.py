@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0002_variant_low_stock_tracking"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "base_price"], name="product_category_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productvariant",
+            index=models.Index(
+                fields=["product", "is_active"], name="variant_product_active_idx"
+            ),
+        ),
+    ]
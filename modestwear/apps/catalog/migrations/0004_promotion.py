@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0003_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Promotion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("percent", "Percent off"),
+                            ("bogo", "Buy X get Y free"),
+                            ("tiered", "Tiered quantity discount"),
+                        ],
+                        default="percent",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "percent_off",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=5, null=True
+                    ),
+                ),
+                ("buy_quantity", models.PositiveIntegerField(default=1)),
+                ("get_quantity", models.PositiveIntegerField(default=1)),
+                ("tiers", models.JSONField(blank=True, default=list)),
+                ("priority", models.IntegerField(default=0)),
+                ("starts_at", models.DateTimeField(blank=True, null=True)),
+                ("ends_at", models.DateTimeField(blank=True, null=True)),
+                ("is_active", models.BooleanField(default=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="promotions",
+                        to="catalog.category",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="promotions",
+                        to="catalog.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-priority", "id"),
+            },
+        ),
+    ]
@@ -1,8 +1,11 @@
+from decimal import Decimal
 from io import BytesIO
 from PIL import Image
 
+from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.db import models
+from django.utils import timezone
 
 class Category(models.Model):
     parent = models.ForeignKey('self', blank=True, null=True, on_delete=models.CASCADE)
@@ -37,12 +40,28 @@ class Product(models.Model):
 
     class Meta:
         ordering = ('-date_added',)
+        indexes = [
+            # Category listings filtered or sorted by price
+            models.Index(fields=['category', 'base_price'], name='product_category_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
     def get_absolute_url(self):
         return f'/{self.category.slug}/{self.slug}/'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_base_price = instance.__dict__.get('base_price')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Kept for post_save receivers detecting price drops
+        self._previous_base_price = getattr(self, '_loaded_base_price', None)
+        super().save(*args, **kwargs)
+        self._loaded_base_price = self.__dict__.get('base_price')
     
 
 class ProductVariant(models.Model):
@@ -53,7 +72,84 @@ class ProductVariant(models.Model):
     coverage = models.ForeignKey(CoverageLevel, default=None,  on_delete=models.CASCADE)
     stock_available =models.IntegerField(default=0)
     is_active = models.BooleanField(default=False)
-    
+    low_stock_threshold = models.PositiveIntegerField(default=5)
+    # Bumped whenever stock_available changes so alerting only re-checks touched variants
+    stock_updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Active variants of a product (detail pages, cart and outfit totals)
+            models.Index(fields=['product', 'is_active'], name='variant_product_active_idx'),
+            models.Index(
+                fields=['stock_updated_at'],
+                name='variant_low_stock_idx',
+                condition=models.Q(is_active=True, stock_available__lte=models.F('low_stock_threshold')),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock = instance.__dict__.get('stock_available')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Kept for post_save receivers detecting restocks
+        self._previous_stock = getattr(self, '_loaded_stock', None)
+        if 'stock_available' in self.__dict__ and self.stock_available != self._previous_stock:
+            self.stock_updated_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'stock_available' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'stock_updated_at'}
+        super().save(*args, **kwargs)
+        self._loaded_stock = self.stock_available
+
+
+class Promotion(models.Model):
+    KIND_CHOICES = (
+        ('percent', 'Percent off'),
+        ('bogo', 'Buy X get Y free'),
+        ('tiered', 'Tiered quantity discount'),
+    )
+
+    name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='percent')
+    # Scope: a product, a category, or (both empty) the whole catalog
+    category = models.ForeignKey(Category, related_name='promotions', on_delete=models.CASCADE, null=True, blank=True)
+    product = models.ForeignKey(Product, related_name='promotions', on_delete=models.CASCADE, null=True, blank=True)
+    percent_off = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    buy_quantity = models.PositiveIntegerField(default=1)
+    get_quantity = models.PositiveIntegerField(default=1)
+    # [[min_quantity, percent_off], ...] for tiered promotions
+    tiers = models.JSONField(default=list, blank=True)
+    # Breaks ties between promotions offering a line the same discount; the larger discount always wins first
+    priority = models.IntegerField(default=0)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('-priority', 'id')
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.kind == 'percent' and not (self.percent_off and 0 < self.percent_off <= 100):
+            raise ValidationError({'percent_off': 'Percent promotions need a percent_off between 0 and 100.'})
+        if self.kind == 'bogo' and not (self.buy_quantity and self.get_quantity):
+            raise ValidationError({'buy_quantity': 'Buy and get quantities must be at least 1.'})
+        if self.kind == 'tiered':
+            try:
+                valid = bool(self.tiers) and all(int(qty) > 0 and 0 < Decimal(str(pct)) <= 100 for qty, pct in self.tiers)
+            except (TypeError, ValueError, ArithmeticError):
+                valid = False
+            if not valid:
+                raise ValidationError({'tiers': 'Tiers must be a list of [min_quantity, percent_off] pairs.'})
+        if self.starts_at and self.ends_at and self.ends_at <= self.starts_at:
+            raise ValidationError({'ends_at': 'The promotion must end after it starts.'})
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
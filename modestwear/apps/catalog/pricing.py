@@ -0,0 +1,212 @@
+import logging
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.catalog.models import Promotion
+
+logger = logging.getLogger(__name__)
+
+PRICING_VERSION_KEY = 'pricing:rules_version'
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+# One priced thing: a cart item, an order line or a product on a listing page
+Line = namedtuple('Line', 'key product_id category_id base_price quantity')
+PricedLine = namedtuple('PricedLine', 'key quantity base_price unit_price total discount promotion')
+Pricing = namedtuple('Pricing', 'lines subtotal discount total')
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class CompiledRule:
+    """A promotion reduced to its live window and a discount function over the lines it covers"""
+    __slots__ = ('id', 'name', 'priority', 'starts_at', 'ends_at', 'discount')
+
+    def __init__(self, promotion, discount):
+        self.id = promotion.id
+        self.name = promotion.name
+        self.priority = promotion.priority
+        self.starts_at = promotion.starts_at
+        self.ends_at = promotion.ends_at
+        self.discount = discount
+
+    def is_live(self, now):
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+
+def _percent_discount(percent):
+    def discount(lines):
+        return {line.key: line.base_price * line.quantity * percent / HUNDRED for line in lines}
+    return discount
+
+
+def _bogo_discount(buy, get):
+    def discount(lines):
+        # Free units go to the cheapest units in scope, across every line the rule covers
+        free = sum(line.quantity for line in lines) // (buy + get) * get
+        amounts = {}
+        for line in sorted(lines, key=lambda line: line.base_price):
+            if free <= 0:
+                break
+            units = min(free, line.quantity)
+            amounts[line.key] = line.base_price * units
+            free -= units
+        return amounts
+    return discount
+
+
+def _tiered_discount(tiers):
+    tiers = sorted((int(quantity), Decimal(str(percent))) for quantity, percent in tiers)
+
+    def discount(lines):
+        quantity = sum(line.quantity for line in lines)
+        percent = next((percent for minimum, percent in reversed(tiers) if quantity >= minimum), None)
+        if percent is None:
+            return {}
+        return {line.key: line.base_price * line.quantity * percent / HUNDRED for line in lines}
+    return discount
+
+
+def compile_rules(now=None):
+    """
+    Compile active promotions into rules indexed by scope.
+
+    Returns ``{'product': {id: [rules]}, 'category': {id: [rules]}, 'all': [rules]}``.
+    Promotions that have not started yet are kept; each rule checks its own
+    window when evaluated, so no recompile is needed when a sale begins.
+    """
+    now = now or timezone.now()
+    index = {'product': defaultdict(list), 'category': defaultdict(list), 'all': []}
+    promotions = Promotion.objects.filter(is_active=True).filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    for promotion in promotions:
+        if promotion.kind == 'percent':
+            discount = _percent_discount(Decimal(str(promotion.percent_off or 0)))
+        elif promotion.kind == 'bogo':
+            discount = _bogo_discount(promotion.buy_quantity or 1, promotion.get_quantity or 1)
+        elif promotion.kind == 'tiered':
+            discount = _tiered_discount(promotion.tiers or [])
+        else:
+            logger.warning(f"Skipping promotion {promotion.id} with unknown kind {promotion.kind}")
+            continue
+        rule = CompiledRule(promotion, discount)
+        if promotion.product_id:
+            index['product'][promotion.product_id].append(rule)
+        elif promotion.category_id:
+            index['category'][promotion.category_id].append(rule)
+        else:
+            index['all'].append(rule)
+    return index
+
+
+# Per-process compiled rules, reused until the shared version key changes
+_compiled = {'rules': None, 'version': None, 'loaded_at': 0.0}
+
+
+def get_rules():
+    """
+    Return the compiled rules, recompiling only when promotions changed.
+
+    Compares the version stored in the cache on each call, and recompiles
+    after ``PRICING_RULES_TTL`` seconds regardless in case the cache was
+    unreachable when a promotion was edited.
+    """
+    version = cache.get(PRICING_VERSION_KEY)
+    ttl = getattr(settings, 'PRICING_RULES_TTL', 300)
+    if (
+        _compiled['rules'] is None
+        or version != _compiled['version']
+        or time.monotonic() - _compiled['loaded_at'] > ttl
+    ):
+        _compiled.update(rules=compile_rules(), version=version, loaded_at=time.monotonic())
+    return _compiled['rules']
+
+
+def invalidate_rules():
+    """Drop this process's compiled rules and, once committed, tell every other process"""
+    _compiled['rules'] = None
+    transaction.on_commit(lambda: cache.set(PRICING_VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def price_lines(lines, now=None):
+    """
+    Price ``Line`` tuples in one pass over the lines.
+
+    Each line is bucketed under every live rule whose scope covers it, then
+    each rule prices its whole bucket at once, so quantity based promotions
+    (BOGO, tiers) see every unit they cover. Promotions do not stack: a line
+    gets the single largest discount offered for it, and of equal discounts
+    the one from the highest ``priority`` promotion. Each line's discount is
+    rounded to the cent, so its total is exactly gross minus discount and an
+    order's total equals the sum of its lines. ``unit_price`` is the total
+    split per unit rounded down; line_units puts the leftover cents on one unit.
+    """
+    lines = list(lines)
+    rules = get_rules()
+    now = now or timezone.now()
+
+    buckets = defaultdict(list)
+    for line in lines:
+        scoped = rules['product'].get(line.product_id, []) + rules['category'].get(line.category_id, []) + rules['all']
+        for rule in scoped:
+            buckets[rule].append(line)
+
+    best = {}
+    for rule, covered in buckets.items():
+        if not rule.is_live(now):
+            continue
+        for key, amount in rule.discount(covered).items():
+            if amount > 0 and (key not in best or (amount, rule.priority) > best[key][:2]):
+                best[key] = (amount, rule.priority, rule.name)
+
+    priced = {}
+    subtotal = total = Decimal('0')
+    for line in lines:
+        base_price = _money(line.base_price)
+        gross = base_price * line.quantity
+        amount, _, promotion = best.get(line.key, (Decimal('0'), 0, None))
+        line_discount = min(_money(amount), gross)
+        line_total = gross - line_discount
+        unit_price = (line_total / line.quantity).quantize(CENT, rounding=ROUND_DOWN) if line.quantity else base_price
+        priced[line.key] = PricedLine(
+            line.key, line.quantity, base_price, unit_price, line_total, line_discount, promotion,
+        )
+        subtotal += gross
+        total += line_total
+    return Pricing(priced, subtotal, subtotal - total, total)
+
+
+def line_units(priced_line):
+    """
+    ``(quantity, unit price)`` pairs adding up to exactly the line's total.
+
+    When the total does not split evenly (three for two at 10.00 is 20.00)
+    the leftover cents go on a single unit: ``[(2, 6.66), (1, 6.68)]``.
+    """
+    remainder = priced_line.total - priced_line.unit_price * priced_line.quantity
+    if priced_line.quantity <= 1 or not remainder:
+        return [(priced_line.quantity, priced_line.unit_price)]
+    return [(priced_line.quantity - 1, priced_line.unit_price), (1, priced_line.unit_price + remainder)]
+
+
+def _product_line(key, product, quantity):
+    return Line(key, product.id, product.category_id, Decimal(str(product.base_price)), quantity)
+
+
+def price_cart(cart_items):
+    """Price cart items (with ``variant__product`` loaded) together, keyed by cart item id"""
+    return price_lines(_product_line(item.id, item.variant.product, item.quantity) for item in cart_items)
+
+
+def price_products(products):
+    """Price a listing page of products at quantity one, keyed by product id"""
+    return price_lines(_product_line(product.id, product, 1) for product in products).lines
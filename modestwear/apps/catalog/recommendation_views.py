@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from apps.catalog.models import Product
+from apps.catalog.pricing import price_products
 from apps.catalog.serializers import ProductSerializer
 from apps.catalog.recommendations import RecommendationService
 
@@ -25,7 +26,8 @@ def user_recommendations(request):
         limit=limit
     )
     
-    serializer = ProductSerializer(recommendations, many=True)
+    recommendations = list(recommendations)
+    serializer = ProductSerializer(recommendations, many=True, context={'prices': price_products(recommendations)})
     return Response({
         'recommendations': serializer.data,
         'count': len(recommendations),
@@ -48,7 +50,8 @@ def product_recommendations(request, product_id):
         limit=limit
     )
     
-    serializer = ProductSerializer(recommendations, many=True)
+    recommendations = list(recommendations)
+    serializer = ProductSerializer(recommendations, many=True, context={'prices': price_products(recommendations)})
     return Response({
         'recommendations': serializer.data,
         'count': len(recommendations),
@@ -65,7 +68,8 @@ def popular_products(request):
     limit = int(request.GET.get('limit', 10))
     popular = RecommendationService._popularity_based(limit)
     
-    serializer = ProductSerializer(popular, many=True)
+    popular = list(popular)
+    serializer = ProductSerializer(popular, many=True, context={'prices': price_products(popular)})
     return Response({
         'recommendations': serializer.data,
         'count': len(popular),
@@ -81,7 +85,8 @@ def trending_products(request):
     limit = int(request.GET.get('limit', 10))
     trending = RecommendationService.get_trending_products(limit)
     
-    serializer = ProductSerializer(trending, many=True)
+    trending = list(trending)
+    serializer = ProductSerializer(trending, many=True, context={'prices': price_products(trending)})
     return Response({
         'recommendations': serializer.data,
         'count': len(trending),
@@ -99,7 +104,8 @@ def similar_price_products(request, product_id):
     
     similar = RecommendationService.get_price_based_recommendations(product, limit)
     
-    serializer = ProductSerializer(similar, many=True)
+    similar = list(similar)
+    serializer = ProductSerializer(similar, many=True, context={'prices': price_products(similar)})
     return Response({
         'recommendations': serializer.data,
         'count': len(similar),
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from .models import Category, Product
+from .pricing import price_products
 
 class ProductSerializer(serializers.ModelSerializer):
+	price = serializers.SerializerMethodField()
+
 	class Meta:
 		model = Product
 		fields = (
@@ -10,4 +13,11 @@ class ProductSerializer(serializers.ModelSerializer):
 			"get_absolute_url",
 			"description",
 			"base_price",
-		)
\ No newline at end of file
+			"price",
+		)
+
+	def get_price(self, obj):
+		# Listing views pass the whole page's prices; a lone product is priced on its own
+		prices = self.context.get('prices') or {}
+		line = prices.get(obj.id) or price_products([obj])[obj.id]
+		return line.unit_price
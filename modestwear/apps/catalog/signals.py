@@ -1,9 +1,48 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from apps.orders.models import OrderItem
+from apps.catalog.models import Product, ProductImage, ProductVariant, Promotion
 
-@receiver(post_save, sender=OrderItem)
-def check_stock_level(sender, instance, **kwargs):
-	variant = instance.variant
-	if variant.stock_quantity <=5: 
-		print(f"Alarm: Low stock for {variant.product.name} - {variant.size}. Only {variant.stock_available} left.")
\ No newline at end of file
+@receiver(post_save, sender=ProductVariant)
+def publish_variant_restocked(sender, instance, created, raw=False, **kwargs):
+	# Only the outbox row is written here; the wishlist fan-out runs on a worker
+	if created or raw:
+		return
+	previous = getattr(instance, '_previous_stock', None)
+	if previous is not None and previous <= 0 < instance.stock_available and instance.is_active:
+		from apps.orders.outbox import publish
+		publish('variant.restocked', variant_ids=[instance.id])
+	elif previous is not None and instance.stock_available <= 0 < previous:
+		# Sold out
+		from apps.orders.outbox import publish
+		publish('product.changed', product_ids=[instance.product_id])
+
+@receiver(post_save, sender=Product)
+def publish_price_dropped(sender, instance, created, raw=False, **kwargs):
+	if created or raw:
+		return
+	previous = getattr(instance, '_previous_base_price', None)
+	if previous is not None and instance.base_price is not None and instance.base_price < previous:
+		from apps.orders.outbox import publish
+		publish('product.price_dropped', drops=[[instance.id, str(previous)]])
+
+@receiver(post_save, sender=Product)
+def publish_product_changed(sender, instance, created, raw=False, **kwargs):
+	# Copies of the product elsewhere (outfit snapshots) rebuild from this event
+	if created or raw:
+		return
+	from apps.orders.outbox import publish
+	publish('product.changed', product_ids=[instance.id])
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def publish_product_image_changed(sender, instance, raw=False, **kwargs):
+	if raw:
+		return
+	from apps.orders.outbox import publish
+	publish('product.changed', product_ids=[instance.product_id])
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def invalidate_pricing_rules(sender, **kwargs):
+	from apps.catalog.pricing import invalidate_rules
+	invalidate_rules()
@@ -0,0 +1,180 @@
+import io
+import pytest
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from apps.catalog.inventory import build_low_stock_digest, import_stock, low_stock_variants, read_stock_rows
+from apps.catalog.models import ProductVariant
+from apps.orders.models import OutboxEvent
+from apps.orders.tasks import check_low_stock_alerts
+
+pytestmark = pytest.mark.django_db
+
+
+def _csv(text):
+    return read_stock_rows(io.StringIO(text), 'csv')
+
+
+@pytest.mark.catalog
+class TestStockImport:
+    """Test streaming stock and price import"""
+
+    def test_updates_stock_and_price(self, product_variant):
+        """Test a CSV row updates the variant stock and the product price"""
+        summary = import_stock(_csv("sku,stock,price\nEMD-001-M-NAVY,7,79.50\n"))
+
+        product_variant.refresh_from_db()
+        product_variant.product.refresh_from_db()
+        assert product_variant.stock_available == 7
+        assert product_variant.product.base_price == Decimal('79.50')
+        assert summary['stock_updated'] == 1
+        assert summary['stock_units_delta'] == -43
+        assert summary['price_updated'] == 1
+
+    def test_jsonl_and_blank_columns(self, product_variant):
+        """Test JSONL input and that missing columns are left untouched"""
+        lines = io.StringIO('{"sku": "EMD-001-M-NAVY", "stock": 12}\n\n')
+        summary = import_stock(read_stock_rows(lines, 'jsonl'))
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 12
+        assert summary['price_updated'] == 0
+
+    def test_price_only_rows_counted_apart(self, product_variant):
+        """Test rows without a stock value are not reported as unchanged stock"""
+        summary = import_stock(_csv("sku,stock,price\nEMD-001-M-NAVY,,79.50\n"))
+
+        assert (summary['price_only'], summary['stock_unchanged'], summary['price_updated']) == (1, 0, 1)
+
+    def test_reports_unknown_and_invalid_rows(self, product_variant):
+        """Test unknown SKUs and bad rows are reported without aborting the import"""
+        summary = import_stock(_csv(
+            "sku,stock,price\nNOPE,1,\nEMD-001-M-NAVY,abc,\n,3,\nEMD-001-M-NAVY,9,\n"
+        ))
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 9
+        assert summary['unknown_skus'] == ['NOPE']
+        assert summary['error_count'] == 2
+        assert summary['rows'] == 4
+
+    def test_dry_run_writes_nothing(self, product_variant):
+        """Test dry runs only report the diff"""
+        summary = import_stock(_csv("sku,stock,price\nEMD-001-M-NAVY,1,\n"), dry_run=True)
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 50
+        assert summary['stock_updated'] == 1
+
+    def test_publishes_restocks_and_price_drops(self, product_variant):
+        """Test bulk writes still announce restocks from zero and price drops"""
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_available=0)
+        import_stock(_csv("sku,stock,price\nEMD-001-M-NAVY,4,79.50\n"))
+
+        events = dict(OutboxEvent.objects.values_list('topic', 'payload'))
+        assert events['variant.restocked'] == {'variant_ids': [product_variant.id]}
+        assert events['product.price_dropped'] == {'drops': [[product_variant.product_id, '89.99']]}
+
+    def test_one_lookup_per_chunk(self, product, coverage_level, django_assert_num_queries):
+        """Test SKUs are resolved per chunk rather than per row"""
+        ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, sku=f'SKU-{i}', color='Black', coverage=coverage_level, stock_available=1)
+            for i in range(30)
+        ])
+        rows = "sku,stock,price\n" + "".join(f"SKU-{i},5,\n" for i in range(30))
+        # Per chunk: variant lookup, savepoint, bulk update, release
+        with django_assert_num_queries(8):
+            import_stock(_csv(rows), chunk_size=15)
+
+        assert set(ProductVariant.objects.values_list('stock_available', flat=True)) == {5}
+
+    def test_management_command(self, product_variant, tmp_path):
+        """Test the import_stock management command"""
+        path = tmp_path / 'stock.csv'
+        path.write_text("sku,stock,price\nEMD-001-M-NAVY,3,\n")
+        out = io.StringIO()
+        call_command('import_stock', str(path), stdout=out)
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 3
+        assert '1 stock updates' in out.getvalue()
+
+    def test_admin_rejects_non_utf8_upload(self, admin_client, product_variant, settings):
+        """Test an upload that is not UTF-8 is a form error, not a server error"""
+        # The admin template needs static files; no manifest is built for tests
+        settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        upload = SimpleUploadedFile('stock.csv', 'sku,stock,price\nEMD-001-M-NAVY,3,caf\xe9\n'.encode('latin-1'))
+        response = admin_client.post(reverse('admin:catalog_productvariant_import_stock'), {'file': upload})
+
+        assert response.status_code == 200
+        assert 'not UTF-8' in str(response.context['form'].errors['file'])
+
+
+@pytest.mark.catalog
+class TestLowStockAlerts:
+    """Test incremental low stock detection and digests"""
+
+    def test_save_bumps_stock_marker_only_on_change(self, product_variant):
+        """Test stock_updated_at moves only when stock changes"""
+        before = product_variant.stock_updated_at
+        product_variant.color = 'Black'
+        product_variant.save()
+        assert ProductVariant.objects.get(id=product_variant.id).stock_updated_at == before
+
+        variant = ProductVariant.objects.get(id=product_variant.id)
+        variant.stock_available = 2
+        variant.save(update_fields=['stock_available'])
+        assert ProductVariant.objects.get(id=product_variant.id).stock_updated_at > before
+
+    def test_per_variant_threshold(self, product_variant):
+        """Test each variant is compared with its own threshold"""
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_available=8)
+        assert low_stock_variants() == []
+
+        ProductVariant.objects.filter(id=product_variant.id).update(low_stock_threshold=10)
+        assert [row['sku'] for row in low_stock_variants()] == ['EMD-001-M-NAVY']
+
+    def test_only_changed_variants_rechecked(self, product_variant):
+        """Test the since marker skips variants untouched since the last run"""
+        ProductVariant.objects.filter(id=product_variant.id).update(
+            stock_available=1, stock_updated_at=timezone.now() - timedelta(hours=2)
+        )
+        assert low_stock_variants(since=timezone.now() - timedelta(hours=1)) == []
+        assert len(low_stock_variants(since=timezone.now() - timedelta(hours=3))) == 1
+
+    def test_digest_groups_by_category_and_product(self, product_variant, coverage_level):
+        """Test rows roll up per category and product"""
+        ProductVariant.objects.create(
+            product=product_variant.product, sku='EMD-001-L-NAVY', color='Navy', coverage=coverage_level,
+            stock_available=0, is_active=True
+        )
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_available=3)
+        digest = build_low_stock_digest(low_stock_variants())
+
+        assert list(digest) == ['Dresses']
+        assert [row['sku'] for row in digest['Dresses']['Elegant Maxi Dress']] == ['EMD-001-L-NAVY', 'EMD-001-M-NAVY']
+
+    def test_task_uses_marker(self, product_variant, locmem_cache, django_assert_max_num_queries):
+        """Test the periodic task reports a variant once, then only after it changes again"""
+        product_variant.stock_available = 1
+        product_variant.save()
+
+        with django_assert_max_num_queries(1):
+            assert check_low_stock_alerts() == 'Checked 1 low stock items'
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_updated_at=timezone.now() - timedelta(minutes=10))
+        assert check_low_stock_alerts() == 'Checked 0 low stock items'
+
+        product_variant.stock_available = 0
+        product_variant.save()
+        assert check_low_stock_alerts() == 'Checked 1 low stock items'
+
+    def test_task_catches_late_commits(self, product_variant, locmem_cache):
+        """Test a change stamped just before a run but committed after it is reported by the next run"""
+        assert check_low_stock_alerts() == 'Checked 0 low stock items'
+        ProductVariant.objects.filter(id=product_variant.id).update(
+            stock_available=1, stock_updated_at=timezone.now() - timedelta(minutes=1)
+        )
+        assert check_low_stock_alerts() == 'Checked 1 low stock items'
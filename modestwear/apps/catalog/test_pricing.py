@@ -0,0 +1,155 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+from apps.catalog import pricing
+from apps.catalog.models import Product, ProductVariant, Promotion
+from apps.orders.models import CartItem
+from apps.orders.services import create_order_from_cart
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fresh_rules(locmem_cache):
+    """Compiled rules are per process; never let them leak between tests"""
+    pricing._compiled['rules'] = None
+    yield
+    pricing._compiled['rules'] = None
+
+
+@pytest.fixture
+def cheap_variant(db, product, coverage_level):
+    cheap = Product.objects.create(
+        category=product.category, name='Plain Scarf', slug='plain-scarf', base_price=Decimal('20.00'),
+        product_size=coverage_level,
+    )
+    return ProductVariant.objects.create(
+        product=cheap, sku='PS-001', color='Black', coverage=coverage_level, stock_available=50, is_active=True
+    )
+
+
+@pytest.mark.catalog
+class TestPricingEngine:
+    """Test promotion rules priced over whole carts and listings"""
+
+    def test_no_promotions_charges_base_price(self, cart_item):
+        """Test prices fall back to base_price * quantity"""
+        result = pricing.price_cart([cart_item])
+
+        assert result.lines[cart_item.id].total == Decimal('179.98')
+        assert result.discount == Decimal('0')
+
+    def test_percent_off_category(self, cart_item, category):
+        """Test a category percent promotion discounts cart lines and listing prices alike"""
+        Promotion.objects.create(name='Dress sale', kind='percent', category=category, percent_off=Decimal('25'))
+
+        line = pricing.price_cart([cart_item]).lines[cart_item.id]
+        listed = pricing.price_products([cart_item.variant.product])[cart_item.variant.product_id]
+
+        assert line.unit_price == listed.unit_price == Decimal('67.49')
+        assert line.total == Decimal('134.98')
+        assert line.promotion == 'Dress sale'
+
+    def test_bogo_spans_lines_and_frees_cheapest_units(self, user, product_variant, cheap_variant, category):
+        """Test buy 2 get 1 counts units across lines and gives the cheapest away"""
+        Promotion.objects.create(name='3 for 2', kind='bogo', category=category, buy_quantity=2, get_quantity=1)
+        dress = CartItem.objects.create(user=user, variant=product_variant, quantity=2)
+        scarf = CartItem.objects.create(user=user, variant=cheap_variant, quantity=1)
+
+        result = pricing.price_cart([dress, scarf])
+
+        assert result.lines[scarf.id].total == Decimal('0.00')
+        assert result.lines[dress.id].total == Decimal('179.98')
+        assert result.total == Decimal('179.98')
+
+    def test_uneven_split_never_overcharges(self, user, cheap_variant, category):
+        """Test a total that does not split per unit is charged exactly, the odd cents on one unit"""
+        Promotion.objects.create(name='3 for 2', kind='bogo', category=category, buy_quantity=2, get_quantity=1)
+        scarf = CartItem.objects.create(user=user, variant=cheap_variant, quantity=3)
+
+        result = pricing.price_cart([scarf])
+        line = result.lines[scarf.id]
+        assert (line.total, line.discount, line.unit_price) == (Decimal('40.00'), Decimal('20.00'), Decimal('13.33'))
+        assert result.total == result.subtotal - result.discount
+
+        order = create_order_from_cart(user, CartItem.objects.filter(user=user), '1 Main St')
+        items = sorted(order.items.values_list('quantity', 'price_at_purchase'))
+        assert items == [(1, Decimal('13.34')), (2, Decimal('13.33'))]
+        assert sum(quantity * price for quantity, price in items) == order.total_price == Decimal('40.00')
+
+    def test_tiered_uses_highest_tier_reached(self, user, product_variant, cheap_variant):
+        """Test the cart quantity picks the best tier met"""
+        Promotion.objects.create(name='Bulk', kind='tiered', tiers=[[2, 10], [4, 20]])
+        dress = CartItem.objects.create(user=user, variant=product_variant, quantity=1)
+        scarf = CartItem.objects.create(user=user, variant=cheap_variant, quantity=3)
+
+        result = pricing.price_cart([dress, scarf])
+
+        assert result.lines[scarf.id].unit_price == Decimal('16.00')
+        assert result.lines[dress.id].unit_price == Decimal('71.99')
+
+    def test_largest_discount_wins_without_stacking(self, cart_item, category, product):
+        """Test overlapping promotions do not stack"""
+        Promotion.objects.create(name='Category', kind='percent', category=category, percent_off=Decimal('10'))
+        Promotion.objects.create(name='Product', kind='percent', product=product, percent_off=Decimal('30'))
+
+        line = pricing.price_cart([cart_item]).lines[cart_item.id]
+
+        assert line.promotion == 'Product'
+        assert line.unit_price == Decimal('62.99')
+
+    def test_priority_breaks_equal_discounts(self, cart_item, category, product):
+        """Test the higher priority promotion wins a tie, whatever its scope"""
+        Promotion.objects.create(name='Product', kind='percent', product=product, percent_off=Decimal('20'))
+        Promotion.objects.create(name='Category', kind='percent', category=category, percent_off=Decimal('20'), priority=10)
+        Promotion.objects.create(name='Smaller', kind='percent', percent_off=Decimal('10'), priority=99)
+
+        line = pricing.price_cart([cart_item]).lines[cart_item.id]
+
+        assert line.promotion == 'Category'
+        assert line.unit_price == Decimal('71.99')
+
+    def test_scheduled_promotion_waits_for_its_window(self, cart_item):
+        """Test promotions only apply between starts_at and ends_at"""
+        now = timezone.now()
+        Promotion.objects.create(
+            name='Weekend', kind='percent', percent_off=Decimal('50'),
+            starts_at=now + timedelta(days=1), ends_at=now + timedelta(days=3),
+        )
+
+        assert pricing.price_cart([cart_item]).discount == Decimal('0')
+        later = pricing.price_lines(
+            [pricing.Line(1, cart_item.variant.product_id, None, Decimal('10.00'), 1)], now=now + timedelta(days=2)
+        )
+        assert later.total == Decimal('5.00')
+
+    def test_rules_compiled_once_until_promotions_change(self, cart_item, django_assert_num_queries, django_capture_on_commit_callbacks):
+        """Test pricing reuses the compiled rules and recompiles after a promotion is saved"""
+        pricing.price_cart([cart_item])
+        with django_assert_num_queries(0):
+            pricing.price_cart([cart_item])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Promotion.objects.create(name='Flash', kind='percent', percent_off=Decimal('10'))
+
+        assert pricing.price_cart([cart_item]).lines[cart_item.id].promotion == 'Flash'
+
+    def test_checkout_and_cart_use_same_prices(self, authenticated_client, user, cart_item, category):
+        """Test the cart endpoint and checkout charge the same promoted amount"""
+        Promotion.objects.create(name='Dress sale', kind='percent', category=category, percent_off=Decimal('25'))
+
+        response = authenticated_client.get(reverse('orders:cart-detail'))
+        order = create_order_from_cart(user, CartItem.objects.filter(user=user), '1 Main St')
+
+        assert Decimal(str(response.data[0]['subtotal'])) == order.total_price == Decimal('134.98')
+        assert order.items.get().price_at_purchase == Decimal('67.49')
+
+    def test_percent_promotion_requires_percent_off(self):
+        """Test model validation of promotion settings"""
+        with pytest.raises(ValidationError):
+            Promotion(name='Broken', kind='percent').full_clean()
+        with pytest.raises(ValidationError):
+            Promotion(name='Broken', kind='tiered', tiers=[['x', 10]]).full_clean()
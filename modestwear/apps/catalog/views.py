@@ -6,14 +6,15 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 
 from apps.catalog.models import Product, Category, ProductVariant
+from .pricing import price_products
 from .serializers import ProductSerializer
 
 class LatestProductList(APIView):
 	permission_classes = [AllowAny]
 	
 	def get(self, request, format=None):
-		products = Product.objects.all()[0:4]
-		serializer = ProductSerializer(products, many=True)
+		products = list(Product.objects.all()[0:4])
+		serializer = ProductSerializer(products, many=True, context={'prices': price_products(products)})
 		return Response(serializer.data)
 	
 
@@ -38,8 +39,8 @@ def search(request):
 	query = request.data.get('query', '')
 
 	if query:
-		products = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
-		serializer = ProductSerializer(products, many=True)
+		products = list(Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query)))
+		serializer = ProductSerializer(products, many=True, context={'prices': price_products(products)})
 		return Response(serializer.data)
 	else:
 		return Response({"products": []})
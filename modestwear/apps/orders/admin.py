@@ -1,8 +1,14 @@
+from django import forms
 from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.db.models import Count
 from django.urls import reverse
-from .models import Order, OrderItem, CartItem, WishList
+from .models import (
+	Order, OrderItem, CartItem, WishList, OutboxEvent, BulkOrderJob, ArchivedOrder, ArchivedOrderItem, Coupon, CouponRedemption,
+)
+from .services import enqueue_bulk_transition, transition_order
+from .tasks import run_bulk_order_job
+from core.exports import export_action
 
 class OrderItemInline(admin.TabularInline):
 	model = OrderItem
@@ -10,8 +16,20 @@ class OrderItemInline(admin.TabularInline):
 	extra = 0
 	fields = ('variant', 'quantity', 'price_at_purchase')
 
+class OrderAdminForm(forms.ModelForm):
+	class Meta:
+		model = Order
+		fields = '__all__'
+
+	def clean_status(self):
+		status = self.cleaned_data['status']
+		if self.instance.pk and status != self.instance.status and not self.instance.can_transition_to(status):
+			raise forms.ValidationError(f"Cannot move order from {self.instance.status} to {status}.")
+		return status
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+	form = OrderAdminForm
 	list_display = (
 		'id',
 		'user',
@@ -25,25 +43,46 @@ class OrderAdmin(admin.ModelAdmin):
 	)
 	search_fields = ('user__email', 'user__first_name', 'user__last_name', 'id')
 	list_editable = ('status',)
-	actions = ['mark_shipped', 'mark_delivered', 'mark_cancelled']
+	actions = ['mark_shipped', 'mark_delivered', 'mark_cancelled', export_action('orders', 'csv'), export_action('orders', 'ndjson')]
 	inlines = [OrderItemInline]
 	list_per_page = 25
 	date_hierarchy = 'created_at'
 
+	def get_changelist_form(self, request, **kwargs):
+		kwargs.setdefault('form', OrderAdminForm)
+		return super().get_changelist_form(request, **kwargs)
+
+	def save_model(self, request, obj, form, change):
+		# Status edits go through the state machine so cancellations release stock
+		if change and 'status' in form.changed_data:
+			new_status = obj.status
+			obj.status = form.initial['status']
+			super().save_model(request, obj, form, change)
+			transition_order(obj, new_status)
+		else:
+			super().save_model(request, obj, form, change)
+
+	def _enqueue_transition(self, request, queryset, to_status):
+		# Large selections run in the background in chunks; progress shows under Bulk order jobs
+		job = enqueue_bulk_transition(list(queryset.order_by().values_list('id', flat=True)), to_status, request.user)
+		url = reverse('admin:orders_bulkorderjob_change', args=[job.id], current_app=self.admin_site.name)
+		self.message_user(
+			request,
+			format_html('Queued <a href="{}">job #{}</a> to mark {} orders as {}.', url, job.id, job.total, to_status),
+			messages.SUCCESS
+		)
+
 	@admin.action(description="Mark selected orders as shipped")
 	def mark_shipped(self, request, queryset):
-		updated = queryset.update(status='shipped')
-		self.message_user(request, f"{updated} orders marked as shipped.", messages.SUCCESS)
+		self._enqueue_transition(request, queryset, 'shipped')
 
 	@admin.action(description="Mark selected orders as delivered")
 	def mark_delivered(self, request, queryset):
-		updated = queryset.update(status='delivered')
-		self.message_user(request, f"{updated} orders marked as delivered.", messages.SUCCESS)
+		self._enqueue_transition(request, queryset, 'delivered')
 
 	@admin.action(description="Mark selected orders as cancelled")
 	def mark_cancelled(self, request, queryset):
-		updated = queryset.update(status='cancelled')
-		self.message_user(request, f"{updated} orders cancelled.", messages.WARNING)
+		self._enqueue_transition(request, queryset, 'cancelled')
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -62,4 +101,84 @@ class WishListAdmin(admin.ModelAdmin):
 	list_display = ('user', 'variant', 'added_at')
 	list_filter = ('added_at', 'variant__product__category')
 	search_fields = ('user__email', 'variant__product__name')
-	date_hierarchy = 'added_at'
\ No newline at end of file
+	date_hierarchy = 'added_at'
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+	list_display = ('id', 'topic', 'created_at', 'processed_at', 'attempts')
+	list_filter = ('topic', ('processed_at', admin.EmptyFieldListFilter))
+	search_fields = ('topic', 'last_error')
+	readonly_fields = ('topic', 'payload', 'created_at', 'processed_at', 'attempts', 'last_error')
+	list_per_page = 50
+
+@admin.register(BulkOrderJob)
+class BulkOrderJobAdmin(admin.ModelAdmin):
+	list_display = ('id', 'to_status', 'status', 'progress_bar', 'updated', 'total', 'created_by', 'created_at', 'finished_at')
+	list_filter = ('status', 'to_status')
+	readonly_fields = (
+		'to_status', 'status', 'progress_bar', 'total', 'processed', 'updated', 'last_order_id',
+		'error', 'created_by', 'created_at', 'started_at', 'finished_at'
+	)
+	exclude = ('order_ids',)
+	actions = ['resume_jobs']
+	list_per_page = 50
+
+	def has_add_permission(self, request):
+		return False
+
+	def progress_bar(self, obj):
+		return format_html(
+			'<progress value="{}" max="100"></progress> {}% ({}/{})',
+			obj.progress, obj.progress, obj.processed, obj.total
+		)
+	progress_bar.short_description = 'Progress'
+
+	@admin.action(description="Resume selected jobs")
+	def resume_jobs(self, request, queryset):
+		job_ids = list(queryset.exclude(status='completed').values_list('id', flat=True))
+		for job_id in job_ids:
+			run_bulk_order_job.delay(job_id)
+		self.message_user(request, f"{len(job_ids)} jobs resumed.", messages.SUCCESS)
+
+class ArchivedOrderItemInline(admin.TabularInline):
+	model = ArchivedOrderItem
+	fields = ('variant', 'quantity', 'price_at_purchase')
+	readonly_fields = fields
+	extra = 0
+	can_delete = False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+	list_display = ('id', 'user', 'status', 'total_price', 'created_at', 'archived_at')
+	list_filter = ('status',)
+	search_fields = ('user__email', 'id')
+	readonly_fields = ('id', 'user', 'status', 'total_price', 'address', 'created_at', 'archived_at')
+	inlines = [ArchivedOrderItemInline]
+	list_per_page = 25
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+class CouponRedemptionInline(admin.TabularInline):
+	model = CouponRedemption
+	fields = ('user', 'order', 'amount', 'created_at', 'released_at')
+	readonly_fields = fields
+	extra = 0
+	can_delete = False
+
+	def has_add_permission(self, request, obj=None):
+		return False
+
+@admin.register(Coupon)
+class CouponAdmin(admin.ModelAdmin):
+	list_display = ('code', 'percent_off', 'amount_off', 'redeemed_count', 'max_redemptions', 'per_user_limit', 'starts_at', 'ends_at', 'is_active')
+	list_filter = ('is_active',)
+	list_editable = ('is_active',)
+	search_fields = ('code',)
+	# Counters are only moved by checkout and cancellation
+	readonly_fields = ('redeemed_count', 'created_at')
+	inlines = [CouponRedemptionInline]
+	list_per_page = 25
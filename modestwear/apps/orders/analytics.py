@@ -0,0 +1,268 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.orders.models import (
+    ArchivedOrder, ArchivedOrderItem, CategorySalesDaily, Order, OrderItem, OrderRollupState, OrderStatusDaily,
+    ProductSalesDaily,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DAYS_PER_CHUNK = 7
+ROLLUP_STATE_BATCH_SIZE = 2000
+
+LINE_TOTAL = ExpressionWrapper(F('quantity') * F('price_at_purchase'), output_field=DecimalField())
+
+
+def _counts_as_sale(status):
+    return status is not None and status != 'cancelled'
+
+
+def _new_bucket():
+    return {'orders': {}, 'units': 0, 'revenue': Decimal('0')}
+
+
+def _apply_deltas(model, key_field, deltas):
+    """
+    Add ``{(date, key): {'orders_count', 'units', 'revenue'}}`` deltas to a rollup table.
+
+    Existing rows are locked in key order, so concurrent workers neither lose
+    updates nor deadlock; missing rows are inserted.
+    """
+    if not deltas:
+        return
+    fields = [name for name in ('orders_count', 'units', 'revenue') if any(name in delta for delta in deltas.values())]
+    existing = {
+        (row.date, getattr(row, key_field)): row
+        for row in model.objects.select_for_update()
+        .filter(date__in={date for date, _ in deltas}, **{f'{key_field}__in': {key for _, key in deltas}})
+        .order_by('date', key_field)
+    }
+    changed, created = [], []
+    for (date, key), delta in deltas.items():
+        row = existing.get((date, key))
+        if row is None:
+            created.append(model(date=date, **{key_field: key}, **delta))
+            continue
+        for name in fields:
+            setattr(row, name, getattr(row, name) + delta.get(name, 0))
+        changed.append(row)
+    if changed:
+        model.objects.bulk_update(changed, fields)
+    if created:
+        model.objects.bulk_create(created)
+
+
+def sync_order_rollups(order_ids):
+    """
+    Bring the daily rollups in line with the current status of these orders.
+
+    Each order's contribution is tracked in OrderRollupState, so only the
+    difference between the status it is counted under and its current one is
+    applied. Redelivered or out-of-order events are therefore harmless.
+    Returns the number of orders whose contribution changed.
+    """
+    with transaction.atomic():
+        states = dict(
+            OrderRollupState.objects.select_for_update().filter(order_id__in=order_ids).values_list('order_id', 'status')
+        )
+        orders = Order.objects.filter(id__in=order_ids).values_list('id', 'status', 'total_price', 'created_at')
+
+        status_deltas = defaultdict(lambda: {'orders_count': 0, 'revenue': Decimal('0')})
+        sales_sign = {}
+        new_states, moved_states = [], []
+        for order_id, status, total_price, created_at in orders:
+            previous = states.get(order_id)
+            if previous == status:
+                continue
+            day = timezone.localdate(created_at)
+            if previous is not None:
+                status_deltas[(day, previous)]['orders_count'] -= 1
+                status_deltas[(day, previous)]['revenue'] -= total_price
+                moved_states.append(OrderRollupState(order_id=order_id, status=status))
+            else:
+                new_states.append(OrderRollupState(order_id=order_id, status=status))
+            status_deltas[(day, status)]['orders_count'] += 1
+            status_deltas[(day, status)]['revenue'] += total_price
+            if _counts_as_sale(previous) != _counts_as_sale(status):
+                sales_sign[order_id] = 1 if _counts_as_sale(status) else -1
+
+        product_buckets = defaultdict(_new_bucket)
+        category_buckets = defaultdict(_new_bucket)
+        if sales_sign:
+            items = OrderItem.objects.filter(order_id__in=list(sales_sign)).values_list(
+                'order_id', 'order__created_at', 'variant__product_id', 'variant__product__category_id',
+                'quantity', 'price_at_purchase',
+            )
+            for order_id, created_at, product_id, category_id, quantity, price in items:
+                sign = sales_sign[order_id]
+                day = timezone.localdate(created_at)
+                for bucket in (product_buckets[(day, product_id)], category_buckets[(day, category_id)]):
+                    bucket['orders'][order_id] = sign
+                    bucket['units'] += sign * quantity
+                    bucket['revenue'] += sign * quantity * price
+
+        def as_deltas(buckets):
+            # Orders are counted once per product/category however many of its lines they hold
+            return {
+                key: {
+                    'orders_count': sum(bucket['orders'].values()),
+                    'units': bucket['units'],
+                    'revenue': bucket['revenue'],
+                }
+                for key, bucket in buckets.items()
+            }
+
+        _apply_deltas(OrderStatusDaily, 'status', dict(status_deltas))
+        _apply_deltas(ProductSalesDaily, 'product_id', as_deltas(product_buckets))
+        _apply_deltas(CategorySalesDaily, 'category_id', as_deltas(category_buckets))
+        if moved_states:
+            OrderRollupState.objects.bulk_update(moved_states, ['status'])
+        if new_states:
+            OrderRollupState.objects.bulk_create(new_states)
+    return len(new_states) + len(moved_states)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _sum_rows(querysets, keys):
+    """Add up grouped aggregate rows from several querysets that share the grouping ``keys``"""
+    totals = {}
+    for queryset in querysets:
+        for row in queryset:
+            key = tuple(row.pop(name) for name in keys)
+            if key in totals:
+                for name, value in row.items():
+                    totals[key][name] += value
+            else:
+                totals[key] = row
+    return [dict(zip(keys, key), **row) for key, row in totals.items()]
+
+
+def rebuild_rollups(start_date, end_date, days_per_chunk=BACKFILL_DAYS_PER_CHUNK):
+    """
+    Recompute the rollups for orders placed between ``start_date`` and ``end_date`` (inclusive).
+
+    History is processed ``days_per_chunk`` days per transaction with grouped
+    aggregate queries, so memory and lock time stay bounded however long the
+    range is. Live and archived orders are both counted, so a rebuild after
+    archiving gives the same totals. Existing rollup rows in each chunk are replaced.
+    Yields ``(chunk_start, chunk_end, orders)`` as each chunk is committed.
+    """
+    day = start_date
+    while day <= end_date:
+        chunk_end = min(day + timedelta(days=days_per_chunk - 1), end_date)
+        lower, _ = _day_bounds(day)
+        _, upper = _day_bounds(chunk_end)
+        with transaction.atomic():
+            orders = Order.objects.filter(created_at__gte=lower, created_at__lt=upper)
+            archived = ArchivedOrder.objects.filter(created_at__gte=lower, created_at__lt=upper)
+            # Archived items whose variant was deleted have no product to count under
+            items = [
+                model.objects.filter(
+                    order__created_at__gte=lower, order__created_at__lt=upper, variant__isnull=False
+                ).exclude(order__status='cancelled').annotate(date=TruncDate('order__created_at'))
+                for model in (OrderItem, ArchivedOrderItem)
+            ]
+
+            for model in (ProductSalesDaily, CategorySalesDaily, OrderStatusDaily):
+                model.objects.filter(date__gte=day, date__lte=chunk_end).delete()
+            OrderRollupState.objects.filter(order__in=orders).delete()
+
+            # Orders live in exactly one of the two tables, so per-table distinct counts add up
+            ProductSalesDaily.objects.bulk_create(
+                ProductSalesDaily(product_id=row.pop('variant__product_id'), **row)
+                for row in _sum_rows([
+                    queryset.values('date', 'variant__product_id').annotate(
+                        orders_count=Count('order_id', distinct=True), units=Sum('quantity'), revenue=Sum(LINE_TOTAL),
+                    ).order_by()
+                    for queryset in items
+                ], ('date', 'variant__product_id'))
+            )
+            CategorySalesDaily.objects.bulk_create(
+                CategorySalesDaily(category_id=row.pop('variant__product__category_id'), **row)
+                for row in _sum_rows([
+                    queryset.values('date', 'variant__product__category_id').annotate(
+                        orders_count=Count('order_id', distinct=True), units=Sum('quantity'), revenue=Sum(LINE_TOTAL),
+                    ).order_by()
+                    for queryset in items
+                ], ('date', 'variant__product__category_id'))
+            )
+            status_rows = _sum_rows([
+                queryset.annotate(date=TruncDate('created_at')).values('date', 'status').annotate(
+                    orders_count=Count('id'), revenue=Sum('total_price'),
+                ).order_by()
+                for queryset in (orders, archived)
+            ], ('date', 'status'))
+            OrderStatusDaily.objects.bulk_create(OrderStatusDaily(**row) for row in status_rows)
+            # Archived orders never change status again, so only live ones are tracked
+            OrderRollupState.objects.bulk_create(
+                (OrderRollupState(order_id=order_id, status=status)
+                 for order_id, status in orders.values_list('id', 'status').iterator(chunk_size=ROLLUP_STATE_BATCH_SIZE)),
+                batch_size=ROLLUP_STATE_BATCH_SIZE,
+            )
+        count = sum(row['orders_count'] for row in status_rows)
+        logger.info(f"Rebuilt sales rollups for {day} to {chunk_end}: {count} orders")
+        yield day, chunk_end, count
+        day = chunk_end + timedelta(days=1)
+
+
+def _since(days):
+    return timezone.localdate() - timedelta(days=days - 1) if days else None
+
+
+def top_products(days=30, limit=5):
+    """Best selling products over the last ``days`` days, as ``product_id``/``name`` rows with totals"""
+    queryset = ProductSalesDaily.objects.all()
+    if days:
+        queryset = queryset.filter(date__gte=_since(days))
+    return list(
+        queryset.values('product_id', 'product__name')
+        .annotate(orders=Sum('orders_count'), units=Sum('units'), revenue=Sum('revenue'))
+        .filter(orders__gt=0)
+        .order_by('-orders', '-revenue')[:limit]
+    )
+
+
+def category_performance(days=30, limit=5):
+    """Categories by orders over the last ``days`` days"""
+    queryset = CategorySalesDaily.objects.all()
+    if days:
+        queryset = queryset.filter(date__gte=_since(days))
+    return list(
+        queryset.values('category_id', 'category__name')
+        .annotate(orders=Sum('orders_count'), units=Sum('units'), revenue=Sum('revenue'))
+        .filter(orders__gt=0)
+        .order_by('-orders', '-revenue')[:limit]
+    )
+
+
+def status_breakdown(days=None):
+    """Order counts and revenue per current status, optionally for orders of the last ``days`` days"""
+    queryset = OrderStatusDaily.objects.all()
+    if days:
+        queryset = queryset.filter(date__gte=_since(days))
+    return list(
+        queryset.values('status')
+        .annotate(count=Sum('orders_count'), revenue=Sum('revenue'))
+        .filter(count__gt=0)
+        .order_by('-count')
+    )
+
+
+def revenue(days=None, statuses=('delivered',)):
+    """Revenue of orders currently in ``statuses``"""
+    queryset = OrderStatusDaily.objects.filter(status__in=statuses)
+    if days:
+        queryset = queryset.filter(date__gte=_since(days))
+    return queryset.aggregate(total=Sum('revenue'))['total'] or Decimal('0')
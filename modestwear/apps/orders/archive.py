@@ -0,0 +1,55 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses never change again, so they can leave the live tables
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+ORDER_FIELDS = ('id', 'user_id', 'status', 'total_price', 'address', 'created_at')
+ORDER_ITEM_FIELDS = ('id', 'order_id', 'variant_id', 'quantity', 'price_at_purchase')
+
+
+def archive_orders(older_than_days=None, batch_size=None, max_batches=None):
+    """
+    Move delivered and cancelled orders older than ``older_than_days`` into the archive tables.
+
+    Each batch copies the orders and their items and deletes the originals in
+    one transaction, so an order is always in exactly one place. Rows are
+    claimed with ``SKIP LOCKED`` and the daily sales rollups are left intact.
+    Returns the number of orders archived.
+    """
+    days = older_than_days or getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365)
+    batch_size = batch_size or getattr(settings, 'ORDER_ARCHIVE_BATCH_SIZE', 1000)
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+                .order_by('id')
+                .values(*ORDER_FIELDS)[:batch_size]
+            )
+            if not orders:
+                break
+            order_ids = [order['id'] for order in orders]
+            ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(**item)
+                for item in OrderItem.objects.filter(order_id__in=order_ids).values(*ORDER_ITEM_FIELDS)
+            ])
+            Order.objects.filter(id__in=order_ids).delete()
+        archived += len(orders)
+        batches += 1
+        if len(orders) < batch_size:
+            break
+
+    logger.info(f"Archived {archived} orders placed before {cutoff:%Y-%m-%d}")
+    return archived
@@ -0,0 +1,75 @@
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from apps.orders.models import Coupon, CouponRedemption, CouponUsage
+
+
+def coupon_discount(code, total):
+    """Look up a usable coupon by code and return ``(coupon, amount off total)``"""
+    coupon = Coupon.objects.filter(code__iexact=(code or '').strip(), is_active=True).first()
+    now = timezone.now()
+    if coupon is None or (coupon.starts_at and now < coupon.starts_at) or (coupon.ends_at and now >= coupon.ends_at):
+        raise ValidationError(f"Coupon {code} is not valid")
+    return coupon, coupon.discount_for(total)
+
+
+def redeem_coupon(coupon, user, order, amount):
+    """
+    Count one use of ``coupon`` by ``user`` against both of its caps.
+
+    Each cap is a single conditional UPDATE (``count < cap``) rather than a
+    read-then-write, so concurrent checkouts queue on the row lock and the
+    losers match zero rows instead of over-redeeming. Must run inside the
+    checkout transaction: a ValidationError rolls the whole order back.
+    """
+    usage, _ = CouponUsage.objects.get_or_create(coupon=coupon, user=user)
+    if not CouponUsage.objects.filter(id=usage.id, count__lt=coupon.per_user_limit).update(count=F('count') + 1):
+        raise ValidationError(f"You have already used coupon {coupon.code}")
+
+    claimed = Coupon.objects.filter(id=coupon.id, is_active=True).filter(
+        Q(max_redemptions__isnull=True) | Q(redeemed_count__lt=F('max_redemptions'))
+    ).update(redeemed_count=F('redeemed_count') + 1)
+    if not claimed:
+        raise ValidationError(f"Coupon {coupon.code} has been fully redeemed")
+
+    return CouponRedemption.objects.create(coupon=coupon, user=user, order=order, amount=amount)
+
+
+def release_coupons(order_ids):
+    """
+    Give back the coupon uses held by these (cancelled) orders.
+
+    The compensating decrements mirror redeem_coupon and lock in the same
+    order, usage rows before the coupon; each redemption is marked released
+    in the same transaction so it is never given back twice.
+    Returns the number of redemptions released.
+    """
+    redemptions = list(
+        CouponRedemption.objects.select_for_update()
+        .filter(order_id__in=order_ids, released_at__isnull=True)
+        .values_list('id', 'coupon_id', 'user_id')
+    )
+    if not redemptions:
+        return 0
+
+    per_coupon = Counter(coupon_id for _, coupon_id, _ in redemptions)
+    per_user = defaultdict(Counter)
+    for _, coupon_id, user_id in redemptions:
+        per_user[coupon_id][user_id] += 1
+
+    for coupon_id, users in sorted(per_user.items()):
+        CouponUsage.objects.filter(coupon_id=coupon_id, user_id__in=list(users)).update(count=Case(
+            *[When(user_id=user_id, then=F('count') - count) for user_id, count in users.items()],
+            output_field=IntegerField(),
+        ))
+    Coupon.objects.filter(id__in=sorted(per_coupon)).update(redeemed_count=Case(
+        *[When(id=coupon_id, then=F('redeemed_count') - count) for coupon_id, count in per_coupon.items()],
+        output_field=IntegerField(),
+    ))
+    CouponRedemption.objects.filter(id__in=[redemption_id for redemption_id, _, _ in redemptions]).update(
+        released_at=timezone.now()
+    )
+    return len(redemptions)
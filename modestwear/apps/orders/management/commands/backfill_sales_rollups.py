@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.orders.analytics import BACKFILL_DAYS_PER_CHUNK, rebuild_rollups
+from apps.orders.models import ArchivedOrder, Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily product, category and status sales rollups from order history. '
+        'Best run while the outbox dispatcher is paused, or for days that no longer change.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First order day (YYYY-MM-DD), defaults to the oldest live or archived order')
+        parser.add_argument('--end', help='Last order day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--days-per-chunk', type=int, default=BACKFILL_DAYS_PER_CHUNK)
+
+    def _parse_date(self, value, name):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'--{name} must be a YYYY-MM-DD date')
+
+    def handle(self, *args, **options):
+        if options['days_per_chunk'] < 1:
+            raise CommandError('--days-per-chunk must be at least 1')
+        end = self._parse_date(options['end'], 'end') if options['end'] else timezone.localdate()
+        if options['start']:
+            start = self._parse_date(options['start'], 'start')
+        else:
+            oldest = min(
+                (found for found in (
+                    model.objects.aggregate(oldest=Min('created_at'))['oldest'] for model in (Order, ArchivedOrder)
+                ) if found is not None),
+                default=None,
+            )
+            if oldest is None:
+                self.stdout.write('No orders to roll up')
+                return
+            start = timezone.localdate(oldest)
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        total = 0
+        for chunk_start, chunk_end, orders in rebuild_rollups(start, end, options['days_per_chunk']):
+            total += orders
+            self.stdout.write(f'{chunk_start} to {chunk_end}: {orders} orders')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups for {total} orders from {start} to {end}'))
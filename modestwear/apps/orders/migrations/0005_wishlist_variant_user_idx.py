@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0004_order_user_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="wishlist",
+            index=models.Index(
+                fields=["variant", "user"], name="wishlist_variant_user_idx"
+            ),
+        ),
+    ]
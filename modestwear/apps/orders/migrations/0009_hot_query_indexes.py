@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0008_order_archive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                fields=["user", "variant"], name="cartitem_user_variant_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["variant", "order"], name="orderitem_variant_order_idx"
+            ),
+        ),
+    ]
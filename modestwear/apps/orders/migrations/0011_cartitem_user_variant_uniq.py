@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    # Fold each user's duplicate rows for a variant into the oldest one so the constraint can be added
+    CartItem = apps.get_model("orders", "CartItem")
+    duplicates = (
+        CartItem.objects.filter(user__isnull=False)
+        .values("user_id", "variant_id")
+        .annotate(rows=Count("id"), keep=Min("id"), total=Sum("quantity"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates.iterator():
+        CartItem.objects.filter(id=group["keep"]).update(quantity=group["total"])
+        CartItem.objects.filter(user_id=group["user_id"], variant_id=group["variant_id"]).exclude(
+            id=group["keep"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0010_coupons"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="cartitem",
+            name="cartitem_user_variant_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "variant"), name="cartitem_user_variant_uniq"
+            ),
+        ),
+    ]
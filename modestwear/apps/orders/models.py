@@ -1,6 +1,9 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
 from django.conf import settings
-from apps.catalog.models import ProductVariant
+from django.core.exceptions import ValidationError
+from apps.catalog.models import Category, Product, ProductVariant
 class WishList(models.Model):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 	variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE)
@@ -8,6 +11,10 @@ class WishList(models.Model):
 
 	class Meta:
 		unique_together = ('user', 'variant')
+		indexes = [
+			# Restock and price drop fan-out walks the wishers of a variant in user order
+			models.Index(fields=['variant', 'user'], name='wishlist_variant_user_idx'),
+		]
 
 class CartItem(models.Model):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
@@ -16,6 +23,12 @@ class CartItem(models.Model):
 	quantity = models.PositiveIntegerField(default=1)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	class Meta:
+		constraints = [
+			# One row per variant in a user's cart; add_to_cart upserts against it and cart reads use its index
+			models.UniqueConstraint(fields=['user', 'variant'], name='cartitem_user_variant_uniq'),
+		]
+
 class Order(models.Model):
 	STATUS_CHOICES = (
 		("pending", "Pending"),
@@ -24,15 +37,225 @@ class Order(models.Model):
 		("delivered", "Delivered"),
 		("cancelled", "Cancelled")
 	)
+	# Allowed status moves; anything not listed here is rejected by the order services
+	TRANSITIONS = {
+		"pending": ("paid", "cancelled"),
+		"paid": ("shipped", "cancelled"),
+		"shipped": ("delivered",),
+		"delivered": (),
+		"cancelled": (),
+	}
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
 	total_price = models.DecimalField(max_digits=10, decimal_places=2)
 	address = models.TextField()
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	class Meta:
+		indexes = [
+			# Order history is read per user, newest first
+			models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+			# Archival picks old delivered/cancelled orders
+			models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+		]
+
+	def can_transition_to(self, status):
+		return status in self.TRANSITIONS.get(self.status, ())
+
 class OrderItem(models.Model):
 	order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
 	variant = models.ForeignKey(ProductVariant, on_delete= models.CASCADE)
 	quantity = models.PositiveIntegerField()
 	price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2)
 
+	class Meta:
+		indexes = [
+			# Sales and recommendation joins start from the variant
+			models.Index(fields=['variant', 'order'], name='orderitem_variant_order_idx'),
+		]
+
+
+class OutboxEvent(models.Model):
+	"""Side effect recorded in the same transaction as the change that caused it"""
+	topic = models.CharField(max_length=100)
+	payload = models.JSONField(default=dict)
+	created_at = models.DateTimeField(auto_now_add=True)
+	processed_at = models.DateTimeField(null=True, blank=True)
+	attempts = models.PositiveIntegerField(default=0)
+	last_error = models.TextField(blank=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['id'], name='outbox_pending_idx', condition=models.Q(processed_at__isnull=True)),
+		]
+
+	def __str__(self):
+		return f"{self.topic} #{self.pk}"
+
+
+class ProductSalesDaily(models.Model):
+	"""Sales of one product per order day; cancelled orders are not counted"""
+	date = models.DateField()
+	product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+	orders_count = models.IntegerField(default=0)
+	units = models.IntegerField(default=0)
+	revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['date', 'product'], name='product_sales_daily_unique'),
+		]
+
+
+class CategorySalesDaily(models.Model):
+	"""Sales of one category per order day; cancelled orders are not counted"""
+	date = models.DateField()
+	category = models.ForeignKey(Category, related_name='+', on_delete=models.CASCADE)
+	orders_count = models.IntegerField(default=0)
+	units = models.IntegerField(default=0)
+	revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['date', 'category'], name='category_sales_daily_unique'),
+		]
+
+
+class OrderStatusDaily(models.Model):
+	"""Orders placed on a day, bucketed by their current status"""
+	date = models.DateField()
+	status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+	orders_count = models.IntegerField(default=0)
+	revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['date', 'status'], name='order_status_daily_unique'),
+		]
+
+
+class OrderRollupState(models.Model):
+	"""The status an order is currently counted under in the daily rollups"""
+	order = models.OneToOneField(Order, primary_key=True, related_name='+', on_delete=models.CASCADE)
+	status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+
+
+class BulkOrderJob(models.Model):
+	"""Bulk status change applied in the background, one chunk of orders per transaction"""
+	STATUS_CHOICES = (
+		("queued", "Queued"),
+		("running", "Running"),
+		("completed", "Completed"),
+		("failed", "Failed"),
+	)
+	to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+	order_ids = models.JSONField(default=list)
+	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+	total = models.PositiveIntegerField(default=0)
+	processed = models.PositiveIntegerField(default=0)
+	updated = models.PositiveIntegerField(default=0)
+	# Highest order id handled so far; a resumed job continues after it
+	last_order_id = models.BigIntegerField(null=True, blank=True)
+	error = models.TextField(blank=True)
+	created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ('-created_at',)
+
+	def __str__(self):
+		return f"Mark {self.total} orders {self.to_status} (#{self.pk})"
+
+	@property
+	def progress(self):
+		return round(100 * self.processed / self.total) if self.total else 100
+
+
+class ArchivedOrder(models.Model):
+	"""Delivered or cancelled order moved out of the live tables; keeps its original id"""
+	id = models.BigIntegerField(primary_key=True)
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='archived_orders', on_delete=models.CASCADE)
+	status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+	total_price = models.DecimalField(max_digits=10, decimal_places=2)
+	address = models.TextField()
+	created_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', 'created_at'], name='archived_user_created_idx'),
+		]
+
+
+class ArchivedOrderItem(models.Model):
+	id = models.BigIntegerField(primary_key=True)
+	order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+	# Kept when the variant is later deleted
+	variant = models.ForeignKey(ProductVariant, null=True, related_name='+', on_delete=models.SET_NULL)
+	quantity = models.PositiveIntegerField()
+	price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2)
+
+
+class Coupon(models.Model):
+	"""Discount code with a global and a per-user redemption cap"""
+	code = models.CharField(max_length=50, unique=True)
+	percent_off = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+	amount_off = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+	# Empty for unlimited
+	max_redemptions = models.PositiveIntegerField(null=True, blank=True)
+	per_user_limit = models.PositiveIntegerField(default=1)
+	# Only ever changed by conditional UPDATEs in apps.orders.coupons
+	redeemed_count = models.PositiveIntegerField(default=0)
+	starts_at = models.DateTimeField(null=True, blank=True)
+	ends_at = models.DateTimeField(null=True, blank=True)
+	is_active = models.BooleanField(default=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		constraints = [
+			models.CheckConstraint(
+				check=models.Q(max_redemptions__isnull=True) | models.Q(redeemed_count__lte=models.F('max_redemptions')),
+				name='coupon_within_max_redemptions',
+			),
+		]
+
+	def __str__(self):
+		return self.code
+
+	def clean(self):
+		if (self.percent_off is None) == (self.amount_off is None):
+			raise ValidationError('Set exactly one of percent_off or amount_off.')
+		if self.percent_off is not None and not 0 < self.percent_off <= 100:
+			raise ValidationError({'percent_off': 'Must be between 0 and 100.'})
+
+	def discount_for(self, total):
+		if self.percent_off is not None:
+			amount = total * self.percent_off / 100
+		else:
+			amount = self.amount_off or 0
+		return min(Decimal(amount), total).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class CouponUsage(models.Model):
+	"""How many unreleased redemptions of a coupon a user holds"""
+	coupon = models.ForeignKey(Coupon, related_name='usages', on_delete=models.CASCADE)
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+	count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['coupon', 'user'], name='coupon_usage_unique'),
+		]
+
+
+class CouponRedemption(models.Model):
+	coupon = models.ForeignKey(Coupon, related_name='redemptions', on_delete=models.CASCADE)
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='coupon_redemptions', on_delete=models.CASCADE)
+	# Kept when the order is archived
+	order = models.ForeignKey(Order, null=True, related_name='coupon_redemptions', on_delete=models.SET_NULL)
+	amount = models.DecimalField(max_digits=10, decimal_places=2)
+	created_at = models.DateTimeField(auto_now_add=True)
+	# Set when the order is cancelled and the use is given back
+	released_at = models.DateTimeField(null=True, blank=True)
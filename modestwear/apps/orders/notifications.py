@@ -0,0 +1,165 @@
+import logging
+from itertools import groupby, islice
+from operator import itemgetter
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+
+from apps.catalog.models import Product
+from apps.orders.models import WishList
+
+logger = logging.getLogger(__name__)
+
+WISHLIST_CHUNK_SIZE = 2000
+WISHLIST_EMAIL_BATCH_SIZE = 200
+
+ROW_FIELDS = (
+    'user_id', 'user__email', 'user__first_name', 'variant_id', 'variant__sku', 'variant__size',
+    'variant__color', 'variant__product_id', 'variant__product__name', 'variant__product__base_price',
+)
+
+
+def wishlist_rows(queryset, chunk_size=WISHLIST_CHUNK_SIZE):
+    """
+    Stream wishlist rows ordered by user, ready to be grouped per recipient.
+
+    Rows are fetched with a server-side cursor in ``chunk_size`` pieces, so a
+    hot SKU with 100k wishers never sits in memory as a whole.
+    """
+    return (
+        queryset.filter(user__is_active=True)
+        .exclude(user__email='')
+        .order_by('user_id', 'variant_id')
+        .values(*ROW_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _dedupe_key(kind, row):
+    key = f"wishlist_notified:{kind}:{row['user_id']}:{row['variant_id']}"
+    if kind == 'price_drop':
+        # A further drop is news again
+        key = f"{key}:{row['variant__product__base_price']}"
+    return key
+
+
+def _restock_message(rows):
+    names = sorted({row['variant__product__name'] for row in rows})
+    subject = (
+        f"{settings.APP_NAME} - {names[0]} is back in stock" if len(names) == 1
+        else f"{settings.APP_NAME} - {len(names)} items from your wishlist are back in stock"
+    )
+    lines = [
+        f"  {row['variant__product__name']} (size {row['variant__size']}, {row['variant__color']})"
+        for row in rows
+    ]
+    body = "\n".join([
+        f"Hello {rows[0]['user__first_name'] or rows[0]['user__email']},",
+        "",
+        "Good news, these items from your wishlist are available again:",
+        *lines,
+        "",
+        f"Shop now: {settings.FRONTEND_URL}/wishlist",
+        "",
+        f"{settings.APP_NAME} Team",
+    ])
+    return subject, body
+
+
+def _price_drop_message(rows, previous_prices):
+    # Several wished variants of one product share a price, list the product once
+    products = {}
+    for row in rows:
+        products.setdefault(row['variant__product_id'], row)
+    subject = (
+        f"{settings.APP_NAME} - Price drop on {rows[0]['variant__product__name']}" if len(products) == 1
+        else f"{settings.APP_NAME} - Price drops on {len(products)} items from your wishlist"
+    )
+    lines = [
+        f"  {row['variant__product__name']}: now {row['variant__product__base_price']}"
+        f" (was {previous_prices.get(product_id, '-')})"
+        for product_id, row in products.items()
+    ]
+    body = "\n".join([
+        f"Hello {rows[0]['user__first_name'] or rows[0]['user__email']},",
+        "",
+        "Items on your wishlist just got cheaper:",
+        *lines,
+        "",
+        f"Shop now: {settings.FRONTEND_URL}/wishlist",
+        "",
+        f"{settings.APP_NAME} Team",
+    ])
+    return subject, body
+
+
+def _send_batch(kind, recipients, render):
+    """Send one message per recipient over a single SMTP connection"""
+    keys = {_dedupe_key(kind, row) for _, rows in recipients for row in rows}
+    already_sent = cache.get_many(list(keys))
+
+    messages, sent_keys = [], {}
+    for _, rows in recipients:
+        fresh = [row for row in rows if _dedupe_key(kind, row) not in already_sent]
+        if not fresh:
+            continue
+        subject, body = render(fresh)
+        messages.append(EmailMessage(
+            subject=subject,
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[fresh[0]['user__email']],
+        ))
+        sent_keys.update((_dedupe_key(kind, row), 1) for row in fresh)
+
+    if not messages:
+        return 0
+    # send_messages opens the connection once for the whole batch
+    sent = get_connection().send_messages(messages) or 0
+    # Marking after each batch keeps a retried task from mailing the same people twice
+    cache.set_many(sent_keys, timeout=getattr(settings, 'WISHLIST_NOTIFY_COOLDOWN', 60 * 60 * 24))
+    return sent
+
+
+def fan_out(kind, queryset, render, chunk_size=WISHLIST_CHUNK_SIZE, batch_size=WISHLIST_EMAIL_BATCH_SIZE):
+    """
+    Email every wisher in ``queryset`` once, however many of their items matched.
+
+    Recipients are coalesced per user and mailed ``batch_size`` at a time;
+    items a user was already told about within ``WISHLIST_NOTIFY_COOLDOWN``
+    are skipped, so stock flapping around zero does not spam anyone.
+    """
+    recipients = (
+        (user_id, list(rows))
+        for user_id, rows in groupby(wishlist_rows(queryset, chunk_size), key=itemgetter('user_id'))
+    )
+    sent = 0
+    while True:
+        batch = list(islice(recipients, batch_size))
+        if not batch:
+            break
+        sent += _send_batch(kind, batch, render)
+    logger.info(f"Wishlist {kind} notifications: {sent} emails sent")
+    return sent
+
+
+def notify_restocked(variant_ids, **kwargs):
+    """Tell wishers that these variants are available again"""
+    queryset = WishList.objects.filter(variant_id__in=variant_ids, variant__is_active=True, variant__stock_available__gt=0)
+    return fan_out('restock', queryset, _restock_message, **kwargs)
+
+
+def notify_price_dropped(drops, **kwargs):
+    """Tell wishers of these products about a lower price; ``drops`` is ``[[product_id, previous_price], ...]``"""
+    previous_prices = {product_id: Decimal(previous) for product_id, previous in drops}
+    # Skip products whose price went back up before this ran
+    still_lower = [
+        product_id for product_id, price in
+        Product.objects.filter(id__in=list(previous_prices)).values_list('id', 'base_price')
+        if price < previous_prices[product_id]
+    ]
+    queryset = WishList.objects.filter(variant__product_id__in=still_lower, variant__is_active=True)
+    return fan_out('price_drop', queryset, lambda rows: _price_drop_message(rows, previous_prices), **kwargs)
@@ -0,0 +1,92 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.orders.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Celery tasks fed by each topic; every handler receives the event payload as kwargs
+HANDLERS = {
+    'order.created': (
+        'apps.orders.tasks.process_order_payment',
+        'apps.orders.tasks.rollup_order_created',
+    ),
+    'order.status_changed': (
+        'apps.orders.tasks.handle_order_status_changed',
+        'apps.orders.tasks.rollup_order_status_changed',
+    ),
+    'stock.threshold_crossed': ('apps.orders.tasks.check_variant_stock_levels',),
+    'variant.restocked': (
+        'apps.orders.tasks.notify_wishlist_restocked',
+        'apps.outfits.tasks.rebuild_outfit_snapshots',
+    ),
+    'product.price_dropped': ('apps.orders.tasks.notify_wishlist_price_dropped',),
+    'product.changed': ('apps.outfits.tasks.rebuild_outfit_snapshots',),
+}
+
+
+def publish(topic, **payload):
+    """Record an event; call inside the transaction that makes the domain change"""
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def dispatch_pending(batch_size=None, max_batches=10):
+    """
+    Hand pending events to their Celery handlers in batches.
+
+    Rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    dispatchers can run side by side. An event is marked processed only after
+    all its handlers were enqueued, which gives at-least-once delivery;
+    failures are retried on later runs until ``OUTBOX_MAX_ATTEMPTS``.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+    dispatched = 0
+    failed_ids = set()
+
+    for _ in range(max_batches):
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, attempts__lt=max_attempts)
+                .exclude(id__in=failed_ids)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+
+            done, failed = [], []
+            for event in events:
+                try:
+                    for handler in HANDLERS.get(event.topic, ()):
+                        import_string(handler).delay(**event.payload)
+                    done.append(event.id)
+                except Exception as exc:
+                    logger.error(f"Outbox event {event.id} ({event.topic}) failed: {str(exc)}")
+                    event.attempts += 1
+                    event.last_error = str(exc)
+                    failed.append(event)
+                    failed_ids.add(event.id)
+
+            OutboxEvent.objects.filter(id__in=done).update(processed_at=timezone.now(), attempts=F('attempts') + 1)
+            if failed:
+                OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error'])
+            dispatched += len(done)
+
+        if len(events) < batch_size:
+            break
+    return dispatched
+
+
+def purge_processed(older_than_days=None):
+    """Delete delivered events past the retention window"""
+    days = older_than_days or getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import WishList, CartItem, Order, OrderItem
+from .models import WishList, CartItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
 from apps.catalog.models import ProductVariant
+from apps.catalog.pricing import price_cart
 
 class VariantBriefSerializer(serializers.ModelSerializer):
 	product_name = serializers.ReadOnlyField(source='product.name')
@@ -24,7 +25,11 @@ class CartItemSerializer(serializers.ModelSerializer):
 		fields = ['id', 'variant', 'variant_details', 'quantity', 'subtotal']
 	
 	def get_subtotal(self, obj):
-		return obj.variant.product.base_price * obj.quantity
+		# CartView prices the whole cart at once; pricing an item alone misses cart-wide promotions
+		pricing = self.context.get('pricing')
+		if pricing is None or obj.id not in pricing.lines:
+			pricing = price_cart([obj])
+		return pricing.lines[obj.id].total
 		
 class OrderItemSerializer(serializers.ModelSerializer):
 	variant_details = VariantBriefSerializer(source='variant', read_only=True)
@@ -36,4 +41,16 @@ class OrderSerializer(serializers.ModelSerializer):
 	items = OrderItemSerializer(many=True, read_only=True)
 	class Meta:
 		model = Order
-		fields = ['id', 'status', 'total_price', 'address', 'created_at', 'items']
\ No newline at end of file
+		fields = ['id', 'status', 'total_price', 'address', 'created_at', 'items']
+
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+	variant_details = VariantBriefSerializer(source='variant', read_only=True)
+	class Meta:
+		model = ArchivedOrderItem
+		fields = ['id', 'variant_details', 'quantity', 'price_at_purchase']
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+	items = ArchivedOrderItemSerializer(many=True, read_only=True)
+	class Meta:
+		model = ArchivedOrder
+		fields = ['id', 'status', 'total_price', 'address', 'created_at', 'items']
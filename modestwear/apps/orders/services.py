@@ -1,30 +1,277 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, F, IntegerField, Sum, When
 from django.core.exceptions import ValidationError
-from apps.orders.models import Order, OrderItem
+from apps.catalog.models import ProductVariant
+from apps.catalog.pricing import line_units, price_cart
+from apps.orders.coupons import coupon_discount, redeem_coupon, release_coupons
+from apps.orders.models import ArchivedOrder, BulkOrderJob, CartItem, Order, OrderItem
+from apps.orders.outbox import publish
+from apps.orders.tasks import run_bulk_order_job
+
+ORDER_STATUS_CACHE_KEY = "order_status:{}"
+
+def add_to_cart(user, quantities):
+    """
+    Add ``{variant_id: quantity}`` to a user's cart in one transaction.
+
+    Missing rows are inserted empty, ignoring conflicts on the unique
+    ``(user, variant)`` constraint, and every row is then incremented with a
+    single ``F()`` UPDATE. Concurrent adds to one cart therefore queue on the
+    row locks and add up instead of inserting duplicates. Stock is checked
+    against the quantities the rows hold after the UPDATE, so the check
+    cannot be raced; a shortfall rolls the whole add back.
+    Returns the cart items for these variants.
+    """
+    quantities = {variant_id: quantity for variant_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        raise ValidationError("Nothing to add")
 
-def create_order_from_cart(user, cart_items, address):
     with transaction.atomic():
-        for item in cart_items:
+        active = set(ProductVariant.objects.filter(id__in=list(quantities), is_active=True).values_list('id', flat=True))
+        missing = sorted(set(quantities) - active)
+        if missing:
+            raise ValidationError(f"Unknown or unavailable variants: {', '.join(map(str, missing))}")
+
+        CartItem.objects.bulk_create(
+            [CartItem(user=user, variant_id=variant_id, quantity=0) for variant_id in sorted(quantities)],
+            ignore_conflicts=True,
+        )
+        whens = [When(variant_id=variant_id, then=F('quantity') + quantity) for variant_id, quantity in quantities.items()]
+        CartItem.objects.filter(user=user, variant_id__in=list(quantities)).update(
+            quantity=Case(*whens, default=F('quantity'), output_field=IntegerField())
+        )
+        items = list(CartItem.objects.filter(user=user, variant_id__in=list(quantities)).select_related('variant__product'))
+        for item in items:
             if item.variant.stock_available < item.quantity:
                 raise ValidationError(f"Not enough stock for {item.variant.product.name}")
-            
-        total_price = sum(item.variant.product.base_price * item.quantity for item in cart_items)
+    return items
+
+
+def create_order_from_cart(user, cart_items, address, coupon_code=None):
+    with transaction.atomic():
+        items = list(cart_items)
+        if not items:
+            raise ValidationError("Cart is empty")
+
+        quantities = defaultdict(int)
+        for item in items:
+            quantities[item.variant_id] += item.quantity
+
+        # Lock the variants once so stock checks and the decrement see the same rows.
+        # Locks go in id order: variants, then the coupon usage, then the coupon, as in cancellation
+        variants = (
+            ProductVariant.objects.select_for_update(of=('self',)).select_related('product')
+            .order_by('id').in_bulk(list(quantities))
+        )
+        for variant_id, quantity in quantities.items():
+            variant = variants[variant_id]
+            if variant.stock_available < quantity:
+                raise ValidationError(f"Not enough stock for {variant.product.name}")
+
+        for item in items:
+            item.variant = variants[item.variant_id]
+        # Same engine as the cart and listings, so checkout charges what the cart showed
+        pricing = price_cart(items)
+        coupon, coupon_amount = coupon_discount(coupon_code, pricing.total) if coupon_code else (None, 0)
 
         order = Order.objects.create(
             user=user,
-            total_price=total_price,
+            total_price=pricing.total - coupon_amount,
             address=address
         )
-        
-        for item in cart_items:
-            OrderItem.objects.create(
+
+        # A line whose total does not split evenly per unit becomes two items, so they add up to the total
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                variant=item.variant,
-                quantity=item.quantity,
-                price_at_purchase=item.variant.product.base_price
+                variant_id=item.variant_id,
+                quantity=quantity,
+                price_at_purchase=unit_price
             )
-            item.variant.stock_available -= item.quantity
-            item.variant.save()
-        
+            for item in items
+            for quantity, unit_price in line_units(pricing.lines[item.id])
+        ])
+
+        crossed = decrement_stock(quantities)
+        if coupon is not None:
+            # Claimed last so the campaign's hot coupon row stays locked for as little of the checkout as possible
+            redeem_coupon(coupon, user, order, coupon_amount)
+
+        publish('order.created', order_id=order.id)
+        if crossed:
+            # One consolidated alerting event per checkout instead of per-item work
+            publish('stock.threshold_crossed', variant_ids=crossed)
+        sold_out = sorted({
+            variants[variant_id].product_id for variant_id, quantity in quantities.items()
+            if variants[variant_id].stock_available == quantity
+        })
+        if sold_out:
+            # The UPDATE sends no signals; outfit snapshots show stock
+            publish('product.changed', product_ids=sold_out)
         cart_items.delete()
-        return order
\ No newline at end of file
+        # Payment is an order.created handler, so it survives a crash between commit and enqueue
+        transaction.on_commit(lambda: cache_order_statuses({order.id: (user.id, order.status)}))
+        return order
+
+
+def decrement_stock(quantities):
+    """
+    Subtract ``{variant_id: quantity}`` from stock in one UPDATE.
+
+    Reads back the post-update stock and returns the ids of active variants
+    whose stock crossed their low stock threshold with this decrement.
+    """
+    whens = [When(id=variant_id, then=F('stock_available') - quantity) for variant_id, quantity in quantities.items()]
+    ProductVariant.objects.filter(id__in=list(quantities)).update(
+        stock_available=Case(*whens, output_field=IntegerField()),
+        stock_updated_at=timezone.now()
+    )
+    updated = ProductVariant.objects.filter(id__in=list(quantities), is_active=True).values_list(
+        'id', 'stock_available', 'low_stock_threshold'
+    )
+    return sorted(
+        variant_id for variant_id, stock, threshold in updated
+        if stock <= threshold < stock + quantities[variant_id]
+    )
+
+
+def restore_stock(order_ids):
+    """
+    Return the reserved quantities of the given orders to stock in a single UPDATE.
+
+    Returns the ids of active variants that came back from zero stock.
+    """
+    totals = {
+        row['variant_id']: row['quantity']
+        for row in OrderItem.objects.filter(order_id__in=order_ids)
+        .values('variant_id')
+        .annotate(quantity=Sum('quantity'))
+    }
+    if not totals:
+        return []
+    # Lock in id order like checkout, rather than in whatever order the UPDATE scans
+    list(ProductVariant.objects.select_for_update().filter(id__in=list(totals)).order_by('id').values_list('id', flat=True))
+    whens = [When(id=variant_id, then=F('stock_available') + quantity) for variant_id, quantity in totals.items()]
+    ProductVariant.objects.filter(id__in=list(totals)).update(
+        stock_available=Case(*whens, output_field=IntegerField()),
+        stock_updated_at=timezone.now()
+    )
+    updated = ProductVariant.objects.filter(id__in=list(totals), is_active=True).values_list('id', 'stock_available')
+    return sorted(
+        variant_id for variant_id, stock in updated
+        if stock - totals[variant_id] <= 0 < stock
+    )
+
+
+def transition_orders(order_ids, to_status):
+    """
+    Move orders to ``to_status`` where the state machine allows it.
+
+    Rows are locked and only orders in a valid source status are updated, so
+    concurrent transitions cannot skip states. Cancelling releases stock and coupon uses.
+    Returns a list of ``(order_id, user_id, from_status)`` for the orders that moved.
+    """
+    sources = [status for status, targets in Order.TRANSITIONS.items() if to_status in targets]
+    with transaction.atomic():
+        changes = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status__in=sources)
+            .values_list('id', 'user_id', 'status')
+        )
+        changed_ids = [order_id for order_id, _, _ in changes]
+        if changed_ids:
+            Order.objects.filter(id__in=changed_ids).update(status=to_status)
+            if to_status == 'cancelled':
+                # Stock before coupons: the same lock order as checkout, so the two cannot deadlock
+                restocked = restore_stock(changed_ids)
+                release_coupons(changed_ids)
+                if restocked:
+                    publish('variant.restocked', variant_ids=restocked)
+            publish(
+                'order.status_changed',
+                to_status=to_status,
+                changes=[[order_id, from_status] for order_id, _, from_status in changes],
+            )
+            transaction.on_commit(lambda: cache_order_statuses(
+                {order_id: (user_id, to_status) for order_id, user_id, _ in changes}
+            ))
+    return changes
+
+
+def transition_order(order, to_status):
+    """Transition a single order, raising ValidationError when the move is not allowed"""
+    if not order.can_transition_to(to_status):
+        raise ValidationError(f"Cannot move order from {order.status} to {to_status}")
+    if not transition_orders([order.id], to_status):
+        raise ValidationError(f"Order {order.id} changed status concurrently")
+    order.status = to_status
+    return order
+
+
+def enqueue_bulk_transition(order_ids, to_status, user=None):
+    """Record a BulkOrderJob for these orders and start it once committed"""
+    order_ids = sorted(order_ids)
+    job = BulkOrderJob.objects.create(to_status=to_status, order_ids=order_ids, total=len(order_ids), created_by=user)
+    transaction.on_commit(lambda: run_bulk_order_job.delay(job.id))
+    return job
+
+
+def process_bulk_order_job(job, chunk_size=None):
+    """
+    Apply a BulkOrderJob ``chunk_size`` orders per transaction.
+
+    Each chunk locks the job row and picks up after the ``last_order_id``
+    it reads there, and progress is saved in the same transaction as the
+    chunk's transitions. A job interrupted at any point therefore resumes
+    without moving an order twice or skipping one, and two workers running
+    the same job take turns instead of counting chunks twice.
+    """
+    chunk_size = chunk_size or getattr(settings, 'BULK_ORDER_JOB_CHUNK_SIZE', 1000)
+    BulkOrderJob.objects.filter(id=job.id).update(status='running', started_at=job.started_at or timezone.now(), error='')
+    while True:
+        with transaction.atomic():
+            locked = BulkOrderJob.objects.select_for_update().only('order_ids', 'to_status', 'last_order_id').get(id=job.id)
+            # order_ids is stored sorted
+            start = 0 if locked.last_order_id is None else bisect_right(locked.order_ids, locked.last_order_id)
+            chunk = locked.order_ids[start:start + chunk_size]
+            if not chunk:
+                break
+            moved = transition_orders(chunk, locked.to_status)
+            BulkOrderJob.objects.filter(id=job.id).update(
+                processed=F('processed') + len(chunk),
+                updated=F('updated') + len(moved),
+                last_order_id=chunk[-1],
+            )
+    BulkOrderJob.objects.filter(id=job.id).update(status='completed', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def cache_order_statuses(statuses):
+    """Cache ``{order_id: (user_id, status)}`` for the status polling endpoint"""
+    timeout = getattr(settings, 'ORDER_STATUS_CACHE_TTL', 3600)
+    cache.set_many({
+        ORDER_STATUS_CACHE_KEY.format(order_id): {'user_id': user_id, 'status': status}
+        for order_id, (user_id, status) in statuses.items()
+    }, timeout=timeout)
+
+
+def get_order_status(order_id):
+    """Return ``{'user_id', 'status'}`` for an order, reading through the cache"""
+    entry = cache.get(ORDER_STATUS_CACHE_KEY.format(order_id))
+    if entry is not None:
+        return entry
+    row = Order.objects.filter(id=order_id).values('user_id', 'status').first()
+    if row is None:
+        # Old orders live in the archive
+        row = ArchivedOrder.objects.filter(id=order_id).values('user_id', 'status').first()
+    if row is None:
+        return None
+    cache_order_statuses({order_id: (row['user_id'], row['status'])})
+    return row
@@ -1,8 +1,11 @@
+from django.core.cache import cache
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from apps.orders.models import Order
+from apps.orders.services import ORDER_STATUS_CACHE_KEY
 
 @receiver(post_save, sender=Order)
-def send_order_confirmation(sender, instance, created, **kwargs):
-	if created:
-		print(f"Sending confirmation email to {instance.user.email}")
\ No newline at end of file
+def invalidate_order_status_cache(sender, instance, created, **kwargs):
+	# Saves that bypass the transition services (e.g. admin edits) must not leave a stale status
+	if not created:
+		cache.delete(ORDER_STATUS_CACHE_KEY.format(instance.pk))
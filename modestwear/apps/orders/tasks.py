@@ -1,26 +1,78 @@
 from celery import shared_task
+from datetime import timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+LOW_STOCK_MARKER_KEY = 'low_stock_alerts:last_run'
+# Stock writes are stamped before they commit, so each run looks back this far past the previous one
+LOW_STOCK_MARKER_OVERLAP_MINUTES = 5
 
-@shared_task
-def process_order_payment(order_id):
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_order_payment(self, order_id):
     """
-    Process order payment asynchronously
+    Process order payment asynchronously and move the order pending -> paid.
+    Handler of the order.created outbox event; the order is cancelled
+    (releasing its stock) when payment keeps failing.
     """
+    from apps.orders.models import Order
+    from apps.orders.services import transition_order
+
     try:
-        from apps.orders.models import Order
-        
         order = Order.objects.get(id=order_id)
-        # Payment processing logic here
+    except Order.DoesNotExist:
+        logger.error(f"Order {order_id} not found for payment")
+        return f"Order {order_id} not found"
+
+    if order.status != 'pending':
+        # Redelivered task: the order has already been handled
+        return f"Order {order_id} already {order.status}"
+
+    try:
+        # Payment gateway call goes here
         logger.info(f"Processing payment for order {order_id}")
-        return f"Payment processed for order {order_id}"
-        
+        transition_order(order, 'paid')
     except Exception as exc:
         logger.error(f"Payment processing failed: {str(exc)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        transition_order(order, 'cancelled')
+        raise
+
+    # The confirmation email follows from the order.status_changed outbox event
+    return f"Payment processed for order {order_id}"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def run_bulk_order_job(self, job_id):
+    """
+    Apply a bulk order status change in chunks
+    Retries resume after the last committed chunk
+    """
+    from apps.orders.models import BulkOrderJob
+    from apps.orders.services import process_bulk_order_job
+
+    try:
+        job = BulkOrderJob.objects.get(id=job_id)
+    except BulkOrderJob.DoesNotExist:
+        logger.error(f"Bulk order job {job_id} not found")
+        return f"Bulk order job {job_id} not found"
+
+    if job.status == 'completed':
+        return f"Bulk order job {job_id} already completed"
+
+    try:
+        job = process_bulk_order_job(job)
+    except Exception as exc:
+        logger.error(f"Bulk order job {job_id} failed: {str(exc)}")
+        BulkOrderJob.objects.filter(id=job_id).update(status='failed', error=str(exc))
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
         raise
 
+    return f"Bulk order job {job_id}: {job.updated} of {job.total} orders moved to {job.to_status}"
+
 
 @shared_task
 def update_inventory_stock(variant_id, quantity):
@@ -46,16 +98,143 @@ def update_inventory_stock(variant_id, quantity):
 def check_low_stock_alerts():
     """
     Periodic task to check for low stock items
-    Run hourly via Celery Beat
-    """
-    from apps.catalog.models import ProductVariant
-    
-    low_stock_items = ProductVariant.objects.filter(
-        stock_available__lte=5,
-        is_active=True
-    )
-    
-    for item in low_stock_items:
-        logger.warning(f"Low stock alert: {item.product.name} - {item.sku} ({item.stock_available} left)")
-    
-    return f"Checked {low_stock_items.count()} low stock items"
+    Run hourly via Celery Beat. Only variants whose stock changed since the
+    previous run are re-evaluated; all alerts go out as one digest.
+    """
+    from django.core.cache import cache
+    from django.utils import timezone
+    from apps.catalog.inventory import low_stock_variants, build_low_stock_digest, send_low_stock_digest
+
+    # A change stamped just before this run but committed after it is picked up by the next run;
+    # variants changed inside the overlap may be reported twice, never missed
+    marker = timezone.now() - timedelta(minutes=LOW_STOCK_MARKER_OVERLAP_MINUTES)
+    # Without a marker (first run or evicted cache) every low stock variant is reported
+    since = cache.get(LOW_STOCK_MARKER_KEY)
+    rows = low_stock_variants(since=since)
+    if rows:
+        send_low_stock_digest(build_low_stock_digest(rows))
+    cache.set(LOW_STOCK_MARKER_KEY, marker, timeout=None)
+
+    return f"Checked {len(rows)} low stock items"
+
+
+@shared_task
+def handle_order_status_changed(to_status, changes):
+    """
+    Outbox handler for order.status_changed events
+    """
+    from apps.users.tasks import send_order_confirmation_email
+
+    if to_status == 'paid':
+        for order_id, _ in changes:
+            send_order_confirmation_email.delay(order_id)
+    return f"Handled {len(changes)} orders moved to {to_status}"
+
+
+@shared_task
+def check_variant_stock_levels(variant_ids):
+    """
+    Outbox handler for stock.threshold_crossed events: one digest for the variants a checkout pushed below threshold
+    """
+    from apps.catalog.inventory import low_stock_variants, build_low_stock_digest, send_low_stock_digest
+
+    rows = low_stock_variants(variant_ids=variant_ids)
+    if rows:
+        send_low_stock_digest(build_low_stock_digest(rows))
+    return f"Checked {len(variant_ids)} variants"
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def rollup_order_created(self, order_id):
+    """
+    Outbox handler for order.created events: add the order to the daily sales rollups
+    """
+    from django.db import DatabaseError
+    from apps.orders.analytics import sync_order_rollups
+
+    try:
+        sync_order_rollups([order_id])
+    except DatabaseError as exc:
+        # Two workers creating the same rollup row; the retry sees the winner's row
+        raise self.retry(exc=exc)
+    return f"Rolled up order {order_id}"
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def rollup_order_status_changed(self, to_status, changes):
+    """
+    Outbox handler for order.status_changed events: move orders between rollup buckets
+    """
+    from django.db import DatabaseError
+    from apps.orders.analytics import sync_order_rollups
+
+    try:
+        synced = sync_order_rollups([order_id for order_id, _ in changes])
+    except DatabaseError as exc:
+        raise self.retry(exc=exc)
+    return f"Rolled up {synced} orders moved to {to_status}"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def notify_wishlist_restocked(self, variant_ids):
+    """
+    Outbox handler for variant.restocked events: email everyone wishing for these variants
+    """
+    from apps.orders.notifications import notify_restocked
+
+    try:
+        sent = notify_restocked(variant_ids)
+    except Exception as exc:
+        logger.error(f"Restock notifications failed: {str(exc)}")
+        # Batches already mailed are remembered, a retry only covers the rest
+        raise self.retry(exc=exc)
+    return f"Sent {sent} restock notifications"
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def notify_wishlist_price_dropped(self, drops):
+    """
+    Outbox handler for product.price_dropped events
+    """
+    from apps.orders.notifications import notify_price_dropped
+
+    try:
+        sent = notify_price_dropped(drops)
+    except Exception as exc:
+        logger.error(f"Price drop notifications failed: {str(exc)}")
+        raise self.retry(exc=exc)
+    return f"Sent {sent} price drop notifications"
+
+
+@shared_task
+def dispatch_outbox_events():
+    """
+    Drain pending outbox events to their handlers
+    Run every few seconds via Celery Beat
+    """
+    from apps.orders.outbox import dispatch_pending
+
+    dispatched = dispatch_pending()
+    return f"Dispatched {dispatched} outbox events"
+
+
+@shared_task
+def purge_outbox_events():
+    """
+    Delete delivered outbox events past the retention window
+    Run daily via Celery Beat
+    """
+    from apps.orders.outbox import purge_processed
+
+    return f"Purged {purge_processed()} outbox events"
+
+
+@shared_task
+def archive_old_orders():
+    """
+    Move old delivered/cancelled orders to the archive tables
+    Run daily via Celery Beat
+    """
+    from apps.orders.archive import archive_orders
+
+    return f"Archived {archive_orders()} orders"
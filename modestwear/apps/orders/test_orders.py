@@ -1,7 +1,26 @@
+import base64
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from django.urls import reverse
-from apps.orders.models import CartItem, WishList, Order, OrderItem
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from apps.orders.models import (
+    ArchivedOrder, ArchivedOrderItem, BulkOrderJob, CartItem, Coupon, CouponRedemption, CouponUsage, WishList, Order, OrderItem, OutboxEvent,
+    CategorySalesDaily, OrderRollupState, OrderStatusDaily, ProductSalesDaily,
+)
+from apps.orders import analytics, outbox
+from apps.orders.archive import archive_orders
+from apps.catalog.models import ProductVariant
+from apps.users.models import User
+from apps.orders.services import create_order_from_cart, enqueue_bulk_transition, process_bulk_order_job, transition_order, transition_orders
 
 pytestmark = pytest.mark.django_db
 
@@ -51,6 +70,19 @@ class TestCartAPI:
         
         cart_item.refresh_from_db()
         assert cart_item.quantity == initial_quantity + 2
+
+    def test_add_beyond_stock_rejected(self, authenticated_client, cart_item):
+        """Test the cart cannot hold more than is in stock"""
+        url = reverse('orders:cart-detail')
+        data = {
+            'variant': cart_item.variant.id,
+            'quantity': cart_item.variant.stock_available - cart_item.quantity + 1
+        }
+        response = authenticated_client.post(url, data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        cart_item.refresh_from_db()
+        assert cart_item.quantity == 2
     
     def test_get_empty_cart(self, authenticated_client):
         """Test getting empty cart"""
@@ -92,6 +124,16 @@ class TestWishlistAPI:
         assert not WishList.objects.filter(id=wishlist_item.id).exists()
         assert CartItem.objects.filter(user=user, variant=wishlist_item.variant).exists()
     
+    def test_move_to_cart_adds_to_existing_row(self, authenticated_client, wishlist_item, cart_item, user):
+        """Test moving a variant already in the cart increments its row instead of adding another"""
+        url = reverse('orders:move-to-cart', kwargs={'item_id': wishlist_item.id})
+        response = authenticated_client.post(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(CartItem.objects.filter(user=user).values_list('variant_id', 'quantity')) == [
+            (cart_item.variant_id, 3)
+        ]
+
     def test_move_nonexistent_item(self, authenticated_client):
         """Test moving non-existent wishlist item"""
         url = reverse('orders:move-to-cart', kwargs={'item_id': 9999})
@@ -110,7 +152,7 @@ class TestCheckoutAPI:
         data = {'address': '123 Main St, City, State 12345'}
         response = authenticated_client.post(url, data, format='json')
         
-        assert response.status_code == status.HTTP_201_CREATED
+        assert response.status_code == status.HTTP_202_ACCEPTED
         assert 'id' in response.data
         assert response.data['status'] == 'pending'
         assert Order.objects.filter(user=user).exists()
@@ -139,6 +181,81 @@ class TestCheckoutAPI:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert 'Not enough stock' in str(response.data)
 
+    def test_checkout_query_count_independent_of_cart_size(self, authenticated_client, user, product, coverage_level):
+        """Test checkout does a fixed number of queries however many lines the cart has"""
+        def checkout(lines):
+            for i in range(lines):
+                variant = ProductVariant.objects.create(
+                    product=product, sku=f'SKU-{lines}-{i}', color='Navy', coverage=coverage_level,
+                    stock_available=50, is_active=True
+                )
+                CartItem.objects.create(user=user, variant=variant, quantity=1)
+            with CaptureQueriesContext(connection) as queries:
+                response = authenticated_client.post(reverse('orders:checkout'), {'address': 'x'}, format='json')
+            assert response.status_code == status.HTTP_202_ACCEPTED
+            return len(queries)
+
+        assert checkout(1) == checkout(6)
+
+
+@pytest.mark.orders
+class TestCheckoutIdempotency:
+    """Test Idempotency-Key handling on checkout"""
+
+    def test_retry_replays_response(self, authenticated_client, cart_item, user, locmem_cache):
+        """Test a retried checkout returns the stored response without a second order"""
+        url = reverse('orders:checkout')
+        data = {'address': '123 Main St, City, State 12345'}
+        first = authenticated_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        second = authenticated_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        assert second.status_code == first.status_code
+        assert second.data['id'] == first.data['id']
+        assert second['Idempotent-Replayed'] == 'true'
+        assert Order.objects.filter(user=user).count() == 1
+
+    def test_stock_decremented_once(self, authenticated_client, cart_item, locmem_cache):
+        """Test retries do not decrement stock twice"""
+        initial_stock = cart_item.variant.stock_available
+        url = reverse('orders:checkout')
+        data = {'address': '123 Main St'}
+        for _ in range(3):
+            authenticated_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='retry-key')
+
+        cart_item.variant.refresh_from_db()
+        assert cart_item.variant.stock_available == initial_stock - cart_item.quantity
+
+    def test_key_reused_with_different_payload(self, authenticated_client, cart_item, locmem_cache):
+        """Test reusing a key with another payload is rejected"""
+        url = reverse('orders:checkout')
+        authenticated_client.post(url, {'address': 'First St'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        response = authenticated_client.post(url, {'address': 'Second St'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_failures_not_replayed(self, authenticated_client, cart_item, user, locmem_cache):
+        """Test a returned 400 frees the key like a raised one, so a retry after a restock goes through"""
+        ProductVariant.objects.filter(id=cart_item.variant_id).update(stock_available=1)
+        url = reverse('orders:checkout')
+        data = {'address': '1 St'}
+        failed = authenticated_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='restock')
+        assert failed.status_code == status.HTTP_400_BAD_REQUEST
+
+        ProductVariant.objects.filter(id=cart_item.variant_id).update(stock_available=10)
+        retried = authenticated_client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='restock')
+        assert retried.status_code == status.HTTP_202_ACCEPTED
+        assert 'Idempotent-Replayed' not in retried
+        assert Order.objects.filter(user=user).count() == 1
+
+    def test_without_key_not_deduplicated(self, authenticated_client, cart_item, user, locmem_cache):
+        """Test requests without the header behave as before"""
+        url = reverse('orders:checkout')
+        authenticated_client.post(url, {'address': '1 St'}, format='json')
+        CartItem.objects.create(user=user, variant=cart_item.variant, quantity=1)
+        authenticated_client.post(url, {'address': '1 St'}, format='json')
+
+        assert Order.objects.filter(user=user).count() == 2
+
 
 @pytest.mark.orders
 @pytest.mark.unit
@@ -190,7 +307,7 @@ class TestOrderCreationService:
         data = {'address': '456 Oak Ave, Town, State 67890'}
         response = authenticated_client.post(url, data, format='json')
         
-        assert response.status_code == status.HTTP_201_CREATED
+        assert response.status_code == status.HTTP_202_ACCEPTED
         
         # Verify order created
         order = Order.objects.get(user=user)
@@ -207,3 +324,629 @@ class TestOrderCreationService:
         
         # Verify cart cleared
         assert not CartItem.objects.filter(user=user).exists()
+
+
+@pytest.mark.orders
+class TestOrderStateMachine:
+    """Test order status transitions and asynchronous payment"""
+
+    def test_checkout_publishes_payment(self, authenticated_client, cart_item, user, django_capture_on_commit_callbacks):
+        """Test payment runs from the order.created event and moves the order to paid"""
+        url = reverse('orders:checkout')
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(url, {'address': '1 Main St'}, format='json')
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'pending'
+        assert response['Location'] == reverse('orders:order-status', kwargs={'order_id': response.data['id']})
+        order = Order.objects.get(id=response.data['id'])
+        assert order.status == 'pending'
+
+        outbox.dispatch_pending()
+        order.refresh_from_db()
+        assert order.status == 'paid'
+        # Redelivered events leave a paid order alone
+        outbox.publish('order.created', order_id=order.id)
+        outbox.dispatch_pending()
+        order.refresh_from_db()
+        assert order.status == 'paid'
+
+    def test_valid_transition(self, order):
+        """Test pending orders can be paid"""
+        transition_order(order, 'paid')
+        order.refresh_from_db()
+        assert order.status == 'paid'
+
+    def test_invalid_transition_rejected(self, order):
+        """Test orders cannot skip states"""
+        with pytest.raises(ValidationError):
+            transition_order(order, 'delivered')
+        order.refresh_from_db()
+        assert order.status == 'pending'
+
+    def test_bulk_transition_skips_invalid_sources(self, order, user):
+        """Test only orders in a valid source status move"""
+        delivered = Order.objects.create(user=user, status='delivered', total_price=10, address='x')
+        changes = transition_orders([order.id, delivered.id], 'cancelled')
+
+        assert [change[0] for change in changes] == [order.id]
+        delivered.refresh_from_db()
+        assert delivered.status == 'delivered'
+
+    def test_cancel_restores_stock(self, order, product_variant):
+        """Test cancelling an order returns its quantities to stock"""
+        OrderItem.objects.create(order=order, variant=product_variant, quantity=3, price_at_purchase=10)
+        transition_order(order, 'cancelled')
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 53
+
+    def test_status_endpoint(self, authenticated_client, order, locmem_cache):
+        """Test polling the order status"""
+        url = reverse('orders:order-status', kwargs={'order_id': order.id})
+        response = authenticated_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'pending'
+
+    def test_status_endpoint_other_user(self, authenticated_client, admin_user, locmem_cache):
+        """Test users cannot poll other users' orders"""
+        other = Order.objects.create(user=admin_user, total_price=10, address='x')
+        url = reverse('orders:order-status', kwargs={'order_id': other.id})
+        response = authenticated_client.get(url)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.orders
+class TestOutbox:
+    """Test transactional outbox publishing and dispatch"""
+
+    def test_checkout_records_events(self, authenticated_client, cart_item):
+        """Test checkout writes its side effects to the outbox"""
+        url = reverse('orders:checkout')
+        response = authenticated_client.post(url, {'address': '1 Main St'}, format='json')
+
+        topics = list(OutboxEvent.objects.values_list('topic', flat=True))
+        assert topics == ['order.created']
+        event = OutboxEvent.objects.get(topic='order.created')
+        assert event.payload == {'order_id': response.data['id']}
+
+    def test_threshold_crossing_published_once(self, authenticated_client, user, cart_item, product, coverage_level):
+        """Test a checkout emits a single event listing every variant it pushed below threshold"""
+        other = ProductVariant.objects.create(
+            product=product, sku='EMD-001-L-NAVY', color='Navy', coverage=coverage_level,
+            stock_available=7, is_active=True
+        )
+        CartItem.objects.create(user=user, variant=other, quantity=3)
+        cart_item.variant.stock_available = 6
+        cart_item.variant.save()
+        authenticated_client.post(reverse('orders:checkout'), {'address': 'x'}, format='json')
+
+        event = OutboxEvent.objects.get(topic='stock.threshold_crossed')
+        assert event.payload == {'variant_ids': sorted([cart_item.variant.id, other.id])}
+
+    def test_failed_checkout_records_nothing(self, authenticated_client, cart_item):
+        """Test events roll back with the transaction"""
+        # update() so selling out in the setup publishes nothing itself
+        ProductVariant.objects.filter(id=cart_item.variant_id).update(stock_available=0)
+        authenticated_client.post(reverse('orders:checkout'), {'address': 'x'}, format='json')
+
+        assert not OutboxEvent.objects.exists()
+
+    def test_dispatch_marks_processed(self, order):
+        """Test dispatched events are marked processed"""
+        transition_order(order, 'paid')
+        dispatched = outbox.dispatch_pending()
+
+        assert dispatched == 1
+        assert not OutboxEvent.objects.filter(processed_at__isnull=True).exists()
+
+    def test_failed_handler_is_retried(self, order, monkeypatch):
+        """Test a failing handler leaves the event pending with an error"""
+        monkeypatch.setitem(outbox.HANDLERS, 'order.created', ('apps.orders.tasks.missing_task',))
+        outbox.publish('order.created', order_id=order.id)
+
+        assert outbox.dispatch_pending() == 0
+        event = OutboxEvent.objects.get()
+        assert event.processed_at is None
+        assert event.attempts == 1
+        assert event.last_error
+
+
+@pytest.mark.orders
+class TestWishlistNotifications:
+    """Test back-in-stock and price drop notifications to wishers"""
+
+    @pytest.fixture
+    def sold_out(self, product_variant):
+        product_variant.stock_available = 0
+        product_variant.save()
+        return product_variant
+
+    def test_restock_notifies_wishers(self, sold_out, wishlist_item, admin_user, locmem_cache, mailoutbox):
+        """Test a 0 -> positive stock change mails every wisher once"""
+        WishList.objects.create(user=admin_user, variant=sold_out)
+        sold_out.stock_available = 5
+        sold_out.save()
+
+        event = OutboxEvent.objects.get(topic='variant.restocked')
+        assert event.payload == {'variant_ids': [sold_out.id]}
+        outbox.dispatch_pending()
+        assert sorted(mail.to[0] for mail in mailoutbox) == ['admin@example.com', 'test@example.com']
+        assert 'back in stock' in mailoutbox[0].subject
+
+    def test_items_coalesced_per_user(self, sold_out, wishlist_item, user, product, coverage_level, locmem_cache, mailoutbox):
+        """Test a user wishing several restocked variants gets one email"""
+        other = ProductVariant.objects.create(
+            product=product, sku='EMD-001-L-NAVY', color='Navy', coverage=coverage_level,
+            stock_available=0, is_active=True
+        )
+        WishList.objects.create(user=user, variant=other)
+        outbox.publish('variant.restocked', variant_ids=[sold_out.id, other.id])
+        ProductVariant.objects.filter(id__in=[sold_out.id, other.id]).update(stock_available=3)
+        outbox.dispatch_pending()
+
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].body.count('Elegant Maxi Dress') == 2
+
+    def test_repeat_restock_not_resent(self, sold_out, wishlist_item, locmem_cache, mailoutbox):
+        """Test stock flapping around zero does not mail the same wisher twice"""
+        for stock in (5, 0, 5):
+            sold_out.stock_available = stock
+            sold_out.save()
+        outbox.dispatch_pending()
+
+        assert OutboxEvent.objects.filter(topic='variant.restocked').count() == 2
+        assert len(mailoutbox) == 1
+
+    def test_stock_change_above_zero_publishes_nothing(self, product_variant, wishlist_item):
+        """Test only restocks from zero are announced"""
+        product_variant.stock_available = 60
+        product_variant.save()
+
+        assert not OutboxEvent.objects.filter(topic='variant.restocked').exists()
+
+    def test_cancel_restock_published(self, user, sold_out, django_capture_on_commit_callbacks):
+        """Test releasing a cancelled order's stock announces variants that were sold out"""
+        order = Order.objects.create(user=user, total_price=10, address='x')
+        OrderItem.objects.create(order=order, variant=sold_out, quantity=2, price_at_purchase=5)
+        transition_orders([order.id], 'cancelled')
+
+        event = OutboxEvent.objects.get(topic='variant.restocked')
+        assert event.payload == {'variant_ids': [sold_out.id]}
+
+    def test_price_drop_notifies_wishers(self, product, wishlist_item, locmem_cache, mailoutbox):
+        """Test a lower base price mails wishers with the old and new price"""
+        product = type(product).objects.get(id=product.id)
+        product.base_price = Decimal('59.99')
+        product.save()
+        outbox.dispatch_pending()
+
+        event = OutboxEvent.objects.get(topic='product.price_dropped')
+        assert event.payload == {'drops': [[product.id, '89.99']]}
+        assert len(mailoutbox) == 1
+        assert 'now 59.99 (was 89.99)' in mailoutbox[0].body
+
+    def test_price_increase_publishes_nothing(self, product, wishlist_item):
+        """Test raising the price does not notify anyone"""
+        product = type(product).objects.get(id=product.id)
+        product.base_price = Decimal('99.99')
+        product.save()
+
+        assert not OutboxEvent.objects.filter(topic='product.price_dropped').exists()
+
+
+@pytest.mark.orders
+class TestSalesRollups:
+    """Test the daily sales rollups and their backfill"""
+
+    @pytest.fixture
+    def placed_order(self, user, product_variant):
+        order = Order.objects.create(user=user, total_price=30, address='x')
+        OrderItem.objects.create(order=order, variant=product_variant, quantity=2, price_at_purchase=10)
+        OrderItem.objects.create(order=order, variant=product_variant, quantity=1, price_at_purchase=10)
+        return order
+
+    def _snapshot(self):
+        return (
+            sorted(ProductSalesDaily.objects.values_list('date', 'product_id', 'orders_count', 'units', 'revenue')),
+            sorted(CategorySalesDaily.objects.values_list('date', 'category_id', 'orders_count', 'units', 'revenue')),
+            sorted(OrderStatusDaily.objects.exclude(orders_count=0).values_list('date', 'status', 'orders_count', 'revenue')),
+        )
+
+    def test_order_events_update_rollups(self, placed_order, product):
+        """Test order.created and status changes flow into the rollups through the outbox"""
+        outbox.publish('order.created', order_id=placed_order.id)
+        transition_order(placed_order, 'paid')
+        outbox.dispatch_pending()
+
+        row = ProductSalesDaily.objects.get(product=product)
+        assert (row.orders_count, row.units, row.revenue) == (1, 3, Decimal('30.00'))
+        assert CategorySalesDaily.objects.get(category=product.category).units == 3
+        assert analytics.status_breakdown() == [{'status': 'paid', 'count': 1, 'revenue': Decimal('30.00')}]
+
+    def test_cancel_removes_sales(self, placed_order, product):
+        """Test cancelled orders drop out of product and category sales"""
+        analytics.sync_order_rollups([placed_order.id])
+        transition_order(placed_order, 'cancelled')
+        outbox.dispatch_pending()
+
+        row = ProductSalesDaily.objects.get(product=product)
+        assert (row.orders_count, row.units, row.revenue) == (0, 0, Decimal('0'))
+        assert analytics.top_products() == []
+        assert [row['status'] for row in analytics.status_breakdown()] == ['cancelled']
+
+    def test_redelivered_events_counted_once(self, placed_order):
+        """Test syncing the same order again changes nothing"""
+        assert analytics.sync_order_rollups([placed_order.id]) == 1
+        before = self._snapshot()
+        assert analytics.sync_order_rollups([placed_order.id]) == 0
+        assert self._snapshot() == before
+
+    def test_backfill_matches_incremental(self, placed_order, user, product_variant):
+        """Test the backfill command rebuilds exactly what the incremental path produced"""
+        other = Order.objects.create(user=user, total_price=10, address='x', status='delivered')
+        OrderItem.objects.create(order=other, variant=product_variant, quantity=1, price_at_purchase=10)
+        analytics.sync_order_rollups([placed_order.id, other.id])
+        transition_order(placed_order, 'cancelled')
+        analytics.sync_order_rollups([placed_order.id])
+        incremental = self._snapshot()
+
+        for model in (ProductSalesDaily, CategorySalesDaily, OrderStatusDaily, OrderRollupState):
+            model.objects.all().delete()
+        call_command('backfill_sales_rollups', '--days-per-chunk', '1', stdout=io.StringIO())
+
+        assert self._snapshot() == incremental
+        assert OrderRollupState.objects.count() == 2
+        assert analytics.revenue() == Decimal('10.00')
+
+    def test_backfill_counts_archived_orders(self, placed_order, user, product_variant):
+        """Test archiving then backfilling leaves the rollup totals unchanged"""
+        delivered = Order.objects.create(user=user, total_price=10, address='x', status='delivered')
+        OrderItem.objects.create(order=delivered, variant=product_variant, quantity=1, price_at_purchase=10)
+        cancelled = Order.objects.create(user=user, total_price=20, address='x', status='cancelled')
+        OrderItem.objects.create(order=cancelled, variant=product_variant, quantity=2, price_at_purchase=10)
+        Order.objects.filter(id__in=[delivered.id, cancelled.id]).update(created_at=timezone.now() - timedelta(days=400))
+        analytics.sync_order_rollups([placed_order.id, delivered.id, cancelled.id])
+        before = self._snapshot()
+
+        assert archive_orders(older_than_days=365) == 2
+        out = io.StringIO()
+        call_command('backfill_sales_rollups', stdout=out)
+
+        assert 'for 3 orders' in out.getvalue()
+        assert self._snapshot() == before
+        assert analytics.revenue() == Decimal('10.00')
+
+
+@pytest.mark.orders
+class TestBulkOrderJobs:
+    """Test chunked background bulk status changes"""
+
+    @pytest.fixture
+    def orders(self, user, product_variant):
+        orders = [Order.objects.create(user=user, total_price=10, address='x') for _ in range(5)]
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, variant=product_variant, quantity=1, price_at_purchase=10) for order in orders
+        )
+        return orders
+
+    def test_job_runs_in_chunks(self, orders, admin_user, product_variant, settings, django_capture_on_commit_callbacks):
+        """Test an enqueued job cancels every order, restocking in bulk, and reports progress"""
+        settings.BULK_ORDER_JOB_CHUNK_SIZE = 2
+        with django_capture_on_commit_callbacks(execute=True):
+            job = enqueue_bulk_transition([order.id for order in orders], 'cancelled', admin_user)
+
+        job.refresh_from_db()
+        assert (job.status, job.processed, job.updated, job.progress) == ('completed', 5, 5, 100)
+        assert job.last_order_id == max(order.id for order in orders)
+        assert set(Order.objects.values_list('status', flat=True)) == {'cancelled'}
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 55
+
+    def test_invalid_transitions_skipped(self, orders, django_capture_on_commit_callbacks):
+        """Test orders that cannot make the move are processed but not updated"""
+        transition_orders([orders[0].id], 'cancelled')
+        with django_capture_on_commit_callbacks(execute=True):
+            job = enqueue_bulk_transition([order.id for order in orders], 'paid')
+
+        job.refresh_from_db()
+        assert (job.processed, job.updated) == (5, 4)
+
+    def test_resume_continues_after_last_chunk(self, orders):
+        """Test a resumed job only touches orders after its checkpoint"""
+        ids = sorted(order.id for order in orders)
+        job = BulkOrderJob.objects.create(
+            to_status='cancelled', order_ids=ids, total=5, processed=2, last_order_id=ids[1], status='failed'
+        )
+        process_bulk_order_job(job, chunk_size=2)
+
+        job.refresh_from_db()
+        assert (job.status, job.processed, job.updated) == ('completed', 5, 3)
+        assert list(Order.objects.filter(status='pending').order_by('id').values_list('id', flat=True)) == ids[:2]
+
+
+    def test_stale_job_does_not_repeat_chunks(self, orders):
+        """Test a second run holding an outdated copy of the job continues from the saved checkpoint"""
+        ids = sorted(order.id for order in orders)
+        job = BulkOrderJob.objects.create(to_status='cancelled', order_ids=ids, total=5)
+        stale = BulkOrderJob.objects.get(id=job.id)
+        process_bulk_order_job(job, chunk_size=2)
+        process_bulk_order_job(stale, chunk_size=2)
+
+        job.refresh_from_db()
+        assert (job.status, job.processed, job.updated) == ('completed', 5, 5)
+
+@pytest.mark.orders
+class TestOrderArchive:
+    """Test moving old orders to the archive tables"""
+
+    @pytest.fixture
+    def old_orders(self, user, product_variant):
+        orders = []
+        for order_status in ('delivered', 'cancelled', 'pending', 'delivered'):
+            order = Order.objects.create(user=user, total_price=10, address='x', status=order_status)
+            OrderItem.objects.create(order=order, variant=product_variant, quantity=1, price_at_purchase=10)
+            orders.append(order)
+        Order.objects.filter(id__in=[order.id for order in orders[:3]]).update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+        return orders
+
+    def test_archives_old_finished_orders(self, old_orders):
+        """Test only old delivered/cancelled orders move, items included, in batches"""
+        assert archive_orders(older_than_days=365, batch_size=1) == 2
+
+        archived_ids = {order.id for order in old_orders[:2]}
+        assert set(ArchivedOrder.objects.values_list('id', flat=True)) == archived_ids
+        assert set(ArchivedOrderItem.objects.values_list('order_id', flat=True)) == archived_ids
+        assert not Order.objects.filter(id__in=archived_ids).exists()
+        assert not OrderItem.objects.filter(order_id__in=archived_ids).exists()
+        assert Order.objects.count() == 2
+
+    def test_status_falls_through_to_archive(self, authenticated_client, old_orders, locmem_cache):
+        """Test the status endpoint still answers for archived orders"""
+        archive_orders(older_than_days=365)
+        url = reverse('orders:order-status', kwargs={'order_id': old_orders[0].id})
+
+        response = authenticated_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'delivered'
+
+    def test_history_lists_archived_orders(self, authenticated_client, old_orders):
+        """Test ?archived=true pages through the archive with the same shape"""
+        archive_orders(older_than_days=365)
+        url = reverse('orders:order-list')
+
+        live = authenticated_client.get(url)
+        archived = authenticated_client.get(url, {'archived': 'true'})
+        assert [order['id'] for order in live.data['results']] == [old_orders[3].id, old_orders[2].id]
+        assert {order['id'] for order in archived.data['results']} == {old_orders[0].id, old_orders[1].id}
+        assert archived.data['results'][0]['items'][0]['variant_details']['product_name'] == 'Elegant Maxi Dress'
+
+
+@pytest.mark.orders
+class TestOrderHistoryAPI:
+    """Test the paginated order history endpoint"""
+
+    def _create_orders(self, user, variant, count, status='pending'):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(user=user, status=status, total_price=10, address='x')
+            OrderItem.objects.create(order=order, variant=variant, quantity=1, price_at_purchase=10)
+            orders.append(order)
+        return orders
+
+    def test_lists_own_orders_newest_first(self, authenticated_client, user, admin_user, product_variant):
+        """Test only the user's orders are listed, newest first"""
+        orders = self._create_orders(user, product_variant, 3)
+        self._create_orders(admin_user, product_variant, 1)
+        response = authenticated_client.get(reverse('orders:order-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [o['id'] for o in response.data['results']] == [o.id for o in reversed(orders)]
+        assert response.data['results'][0]['items'][0]['variant_details']['product_name'] == 'Elegant Maxi Dress'
+
+    def test_keyset_pages_cover_all_orders(self, authenticated_client, user, product_variant):
+        """Test following next links visits every order exactly once"""
+        orders = self._create_orders(user, product_variant, 5)
+        Order.objects.update(created_at=orders[0].created_at)  # force ties on created_at
+        seen = []
+        url = reverse('orders:order-list') + '?page_size=2'
+        while url:
+            response = authenticated_client.get(url)
+            seen.extend(o['id'] for o in response.data['results'])
+            url = response.data['next']
+
+        assert seen == sorted((o.id for o in orders), reverse=True)
+
+    def test_tampered_cursor_is_not_found(self, authenticated_client, user, product_variant):
+        """Test cursors whose values do not fit the ordering fields are 404s, not server errors"""
+        self._create_orders(user, product_variant, 1)
+        url = reverse('orders:order-list')
+        for position in (['x', 1], ['2024-01-01T00:00:00+00:00', 'x'], [None, 1], [[], 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            assert authenticated_client.get(url, {'cursor': cursor}).status_code == status.HTTP_404_NOT_FOUND
+
+        cursor = base64.urlsafe_b64encode(json.dumps(['2999-01-01T00:00:00+00:00', 1]).encode()).decode()
+        response = authenticated_client.get(url, {'cursor': cursor})
+        assert len(response.data['results']) == 1
+
+    def test_status_filter(self, authenticated_client, user, product_variant):
+        """Test filtering by status"""
+        self._create_orders(user, product_variant, 2)
+        paid = self._create_orders(user, product_variant, 1, status='paid')
+        response = authenticated_client.get(reverse('orders:order-list'), {'status': 'paid'})
+
+        assert [o['id'] for o in response.data['results']] == [paid[0].id]
+
+    def test_unknown_status_rejected(self, authenticated_client):
+        """Test an unknown status filter is a client error"""
+        response = authenticated_client.get(reverse('orders:order-list'), {'status': 'lost'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_constant_query_count(self, authenticated_client, user, product_variant):
+        """Test the number of queries does not grow with the page size"""
+        url = reverse('orders:order-list')
+        self._create_orders(user, product_variant, 1)
+        with CaptureQueriesContext(connection) as small:
+            authenticated_client.get(url)
+        self._create_orders(user, product_variant, 10)
+        with CaptureQueriesContext(connection) as large:
+            authenticated_client.get(url)
+
+        assert len(large) == len(small)
+
+
+@pytest.mark.orders
+class TestCoupons:
+    """Test coupon redemption at checkout and release on cancel"""
+
+    def _checkout(self, user, variant, code, quantity=1):
+        CartItem.objects.update_or_create(user=user, variant=variant, defaults={'quantity': quantity})
+        return create_order_from_cart(user, CartItem.objects.filter(user=user), '1 Main St', coupon_code=code)
+
+    def test_redemption_discounts_order(self, user, cart_item):
+        """Test a percent coupon reduces the order total and counts a use"""
+        coupon = Coupon.objects.create(code='LAUNCH10', percent_off=Decimal('10'), max_redemptions=5)
+
+        order = create_order_from_cart(user, CartItem.objects.filter(user=user), '1 Main St', coupon_code='launch10')
+
+        coupon.refresh_from_db()
+        assert order.total_price == Decimal('161.98')
+        assert coupon.redeemed_count == 1
+        assert CouponRedemption.objects.get().amount == Decimal('18.00')
+
+    def test_global_cap_rolls_back_checkout(self, user, admin_user, product_variant):
+        """Test an exhausted coupon fails the checkout without taking stock"""
+        Coupon.objects.create(code='ONCE', amount_off=Decimal('5'), max_redemptions=1)
+        self._checkout(admin_user, product_variant, 'ONCE')
+
+        with pytest.raises(ValidationError):
+            self._checkout(user, product_variant, 'ONCE')
+
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == 49
+        assert not Order.objects.filter(user=user).exists()
+        assert CartItem.objects.filter(user=user).exists()
+
+    def test_per_user_limit(self, user, product_variant):
+        """Test a user cannot go past the per-user limit"""
+        Coupon.objects.create(code='TWICE', amount_off=Decimal('5'), per_user_limit=2)
+        self._checkout(user, product_variant, 'TWICE')
+        self._checkout(user, product_variant, 'TWICE')
+
+        with pytest.raises(ValidationError):
+            self._checkout(user, product_variant, 'TWICE')
+        assert Coupon.objects.get().redeemed_count == 2
+
+    def test_invalid_and_expired_codes(self, user, product_variant):
+        """Test unknown and expired codes are rejected"""
+        Coupon.objects.create(code='OLD', amount_off=Decimal('5'), ends_at=timezone.now() - timedelta(days=1))
+
+        for code in ('NOPE', 'OLD'):
+            with pytest.raises(ValidationError):
+                self._checkout(user, product_variant, code)
+
+    def test_cancel_releases_use(self, user, product_variant):
+        """Test cancelling gives the use back exactly once"""
+        coupon = Coupon.objects.create(code='ONCE', amount_off=Decimal('5'), max_redemptions=1)
+        order = self._checkout(user, product_variant, 'ONCE')
+
+        transition_orders([order.id], 'cancelled')
+        transition_orders([order.id], 'cancelled')
+
+        coupon.refresh_from_db()
+        assert coupon.redeemed_count == 0
+        assert CouponUsage.objects.get(coupon=coupon, user=user).count == 0
+        assert CouponRedemption.objects.get().released_at is not None
+        self._checkout(user, product_variant, 'ONCE')
+        coupon.refresh_from_db()
+        assert coupon.redeemed_count == 1
+
+
+COUPON_STRESS_CHECKOUTS = 500
+COUPON_STRESS_WORKERS = 50
+
+
+@pytest.mark.orders
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='Concurrent checkouts need Postgres row locking')
+class TestCouponConcurrency:
+    """Stress coupon caps with concurrent checkouts on separate connections"""
+
+    def _run(self, users, code):
+        def checkout(user):
+            try:
+                create_order_from_cart(user, CartItem.objects.filter(user=user), '1 Main St', coupon_code=code)
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=COUPON_STRESS_WORKERS) as pool:
+            return sum(pool.map(checkout, users))
+
+    def test_no_over_redemption(self, product_variant):
+        """Test 500 concurrent checkouts redeem a 100 use coupon exactly 100 times"""
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_available=COUPON_STRESS_CHECKOUTS)
+        users = User.objects.bulk_create(
+            User(email=f'buyer{i}@example.com', username=f'buyer{i}') for i in range(COUPON_STRESS_CHECKOUTS)
+        )
+        CartItem.objects.bulk_create(CartItem(user=buyer, variant=product_variant) for buyer in users)
+        coupon = Coupon.objects.create(code='LAUNCH', percent_off=Decimal('10'), max_redemptions=100)
+
+        succeeded = self._run(users, 'LAUNCH')
+
+        coupon.refresh_from_db()
+        assert succeeded == coupon.redeemed_count == 100
+        assert CouponRedemption.objects.filter(coupon=coupon).count() == 100
+        assert Order.objects.count() == 100
+
+    def test_no_per_user_over_redemption(self, user, product_variant):
+        """Test one user's concurrent checkouts redeem a single use coupon once"""
+        CartItem.objects.create(user=user, variant=product_variant)
+        Coupon.objects.create(code='ONCE', amount_off=Decimal('5'), per_user_limit=1)
+
+        succeeded = self._run([user] * COUPON_STRESS_WORKERS, 'ONCE')
+
+        assert succeeded == 1
+        assert CouponRedemption.objects.count() == 1
+
+    def test_cancellations_during_checkouts(self, product_variant):
+        """Test cancelling coupon orders while others check out takes locks in one order and never deadlocks"""
+        ProductVariant.objects.filter(id=product_variant.id).update(stock_available=COUPON_STRESS_CHECKOUTS)
+        coupon = Coupon.objects.create(code='RUSH', percent_off=Decimal('10'))
+        users = User.objects.bulk_create(
+            User(email=f'rush{i}@example.com', username=f'rush{i}') for i in range(COUPON_STRESS_CHECKOUTS)
+        )
+        CartItem.objects.bulk_create(CartItem(user=buyer, variant=product_variant) for buyer in users)
+        placed = [
+            create_order_from_cart(buyer, CartItem.objects.filter(user=buyer), '1 Main St', coupon_code='RUSH').id
+            for buyer in users[:COUPON_STRESS_CHECKOUTS // 2]
+        ]
+
+        def run(job):
+            # Errors other than a rejected checkout (a deadlock included) propagate out of pool.map
+            kind, buyer, order_id = job
+            try:
+                if kind == 'cancel':
+                    transition_orders([order_id], 'cancelled')
+                else:
+                    create_order_from_cart(buyer, CartItem.objects.filter(user=buyer), '1 Main St', coupon_code='RUSH')
+            finally:
+                connection.close()
+
+        jobs = [('cancel', None, order_id) for order_id in placed]
+        jobs += [('checkout', buyer, None) for buyer in users[COUPON_STRESS_CHECKOUTS // 2:]]
+        jobs = [job for pair in zip(jobs[:len(placed)], jobs[len(placed):]) for job in pair]
+        with ThreadPoolExecutor(max_workers=COUPON_STRESS_WORKERS) as pool:
+            list(pool.map(run, jobs))
+
+        coupon.refresh_from_db()
+        held = CouponRedemption.objects.filter(coupon=coupon, released_at__isnull=True).count()
+        assert coupon.redeemed_count == held == COUPON_STRESS_CHECKOUTS - len(placed)
+        product_variant.refresh_from_db()
+        assert product_variant.stock_available == COUPON_STRESS_CHECKOUTS - held
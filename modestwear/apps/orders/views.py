@@ -1,12 +1,18 @@
 from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from apps.orders.models import WishList, CartItem, Order, OrderItem
-from apps.orders.serializers import WishListSerializer, CartItemSerializer, OrderSerializer
-from apps.orders.services import create_order_from_cart
+from rest_framework.exceptions import ValidationError as APIValidationError
+from apps.orders.models import WishList, CartItem, Order, OrderItem, ArchivedOrder
+from apps.orders.serializers import WishListSerializer, CartItemSerializer, OrderSerializer, ArchivedOrderSerializer
+from apps.catalog.pricing import price_cart
+from apps.orders.services import add_to_cart, create_order_from_cart, get_order_status
+from django.urls import reverse
 from django.core.exceptions import ValidationError
+from core.idempotency import idempotent
+from core.pagination import KeysetPagination
 
 class WishListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -22,44 +28,99 @@ class CartView(generics.ListCreateAPIView):
         permission_classes = [IsAuthenticated]
         serializer_class = CartItemSerializer
         def get_queryset(self):
-            return CartItem.objects.filter(user=self.request.user)
+            return CartItem.objects.filter(user=self.request.user).select_related('variant__product')
+
+        def list(self, request, *args, **kwargs):
+            items = list(self.get_queryset())
+            context = {**self.get_serializer_context(), 'pricing': price_cart(items)}
+            serializer = self.get_serializer(items, many=True, context=context)
+            return Response(serializer.data)
+
+        @idempotent
+        def post(self, request, *args, **kwargs):
+            return super().post(request, *args, **kwargs)
 
         def perform_create(self, serializer):
+            # Same upsert as adding a whole outfit: stock checked, existing rows incremented with F()
             variant = serializer.validated_data['variant']
-            item, created = CartItem.objects.get_or_create(
-                user = self.request.user,
-                variant = variant 
-        )
-            if not created:
-                item.quantity += serializer.validated_data.get('quantity', 1)
-                item.save()
+            try:
+                items = add_to_cart(self.request.user, {variant.id: serializer.validated_data.get('quantity', 1)})
+            except ValidationError as e:
+                raise APIValidationError({'quantity': e.messages})
+            serializer.instance = items[0]
 
         
 class MoveToCartView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, item_id):
         try:
             wishlist_item = WishList.objects.get(id=item_id, user=request.user)
-            cart_item, created = CartItem.objects.get_or_create(
-                user=request.user, 
-                variant=wishlist_item.variant
-                )
-            wishlist_item.delete()
-            return Response({'message': 'Item moved to cart'}, status=status.HTTP_200_OK)
         except  WishList.DoesNotExist:
             return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+        # Same upsert as the cart endpoint, so moving a variant already in the cart adds to its row
+        with transaction.atomic():
+            try:
+                add_to_cart(request.user, {wishlist_item.variant_id: 1})
+            except ValidationError as e:
+                return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+            wishlist_item.delete()
+        return Response({'message': 'Item moved to cart'}, status=status.HTTP_200_OK)
         
 
+class OrderListView(generics.ListAPIView):
+    """Order history, newest first, paginated by (created_at, id); ?archived=true lists archived orders"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
+
+    def archived(self):
+        return self.request.query_params.get('archived', '').lower() in ('1', 'true')
+
+    def get_serializer_class(self):
+        if not getattr(self, 'swagger_fake_view', False) and self.archived():
+            return ArchivedOrderSerializer
+        return self.serializer_class
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Order.objects.none()
+        model = ArchivedOrder if self.archived() else Order
+        queryset = model.objects.filter(user=self.request.user).prefetch_related('items__variant__product')
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                raise APIValidationError({'status': f"Unknown status '{order_status}'"})
+            queryset = queryset.filter(status=order_status)
+        return queryset
+
+
 class CheckoutView(APIView):
+    @idempotent
     def post(self, request):
         cart_items = CartItem.objects.filter(user=request.user)
         try:
             order = create_order_from_cart(
                 user=request.user,
                 cart_items=cart_items,
-                address=request.data.get('address')
+                address=request.data.get('address'),
+                coupon_code=request.data.get('coupon')
             )
-            return Response(OrderSerializer(order).data, status=201)
+            prefetch_related_objects([order], 'items__variant__product')
+            # Payment is processed by a worker; clients poll the status endpoint
+            response = Response(OrderSerializer(order).data, status=status.HTTP_202_ACCEPTED)
+            response['Location'] = reverse('orders:order-status', kwargs={'order_id': order.id})
+            return response
         except ValidationError as e:
-            return Response({'error': str(e)}, status=400)
\ No newline at end of file
+            return Response({'error': str(e)}, status=400)
+
+
+class OrderStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, order_id):
+        entry = get_order_status(order_id)
+        if entry is None or entry['user_id'] != request.user.id:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': order_id, 'status': entry['status']})
\ No newline at end of file
@@ -7,7 +7,9 @@ from .models import Outfit, OutfitItem
 class OutfitItemInline(admin.TabularInline):
 	model = OutfitItem
 	extra = 1
-	fields = ('product', 'position')
+	# New items are appended; order is changed through the API's move endpoint
+	fields = ('product', 'rank')
+	readonly_fields = ('rank',)
 	autocomplete_fields = ['product']
 
 @admin.register(Outfit)
@@ -69,7 +71,8 @@ class OutfitAdmin(admin.ModelAdmin):
 
 @admin.register(OutfitItem)
 class OutfitItemAdmin(admin.ModelAdmin):
-	list_display = ('outfit_link', 'product', 'position')
+	list_display = ('outfit_link', 'product', 'rank')
+	readonly_fields = ('rank',)
 	list_filter = ('outfit__is_public', 'product__category')
 	search_fields = ('outfit__name', 'product__name')
 	autocomplete_fields = ['outfit', 'product']
@@ -1,33 +1,72 @@
+from django.db.models import Q
 from rest_framework import serializers
 from apps.outfits.models import Outfit, OutfitItem
 from apps.catalog.serializers import ProductSerializer
+from apps.outfits.services import create_outfit
+from apps.outfits.snapshots import SNAPSHOT_VERSION, snapshot_items
 
 class OutfitItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
+    position = serializers.SerializerMethodField()
     
     class Meta:
         model = OutfitItem
         fields = ['id', 'product', 'product_id', 'position']
 
+    def get_position(self, obj):
+        # The item's index in the outfit; set when a whole outfit's items are listed in order
+        position = getattr(obj, 'position', None)
+        if position is None:
+            position = OutfitItem.objects.filter(
+                Q(rank__lt=obj.rank) | Q(rank=obj.rank, id__lt=obj.id), outfit_id=obj.outfit_id
+            ).count()
+        return position
+
 class OutfitSerializer(serializers.ModelSerializer):
-    items = OutfitItemSerializer(many=True, read_only=True)
+    """Renders items from the outfit's snapshot, so a page of outfits is one query"""
+    items = serializers.SerializerMethodField()
     items_count = serializers.SerializerMethodField()
+    # Annotated by apps.outfits.feed.with_totals
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    min_stock = serializers.IntegerField(read_only=True)
+    all_in_stock = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Outfit
-        fields = ['id', 'name', 'description', 'is_public', 'created_at', 'updated_at', 'items', 'items_count']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'description', 'is_public', 'created_at', 'updated_at', 'items', 'items_count',
+            'views_count', 'likes_count', 'saves_count', 'total_price', 'min_stock', 'all_in_stock',
+        ]
+        read_only_fields = ['created_at', 'updated_at', 'views_count', 'likes_count', 'saves_count']
     
+    def get_items(self, obj):
+        snapshot = obj.snapshot or {}
+        if snapshot.get('version') == SNAPSHOT_VERSION:
+            return snapshot['items']
+        # Not rebuilt since the layout changed (see the rebuild_outfit_snapshots command); read live
+        # in the snapshot's shape, once per outfit for both fields
+        if getattr(obj, '_live_items', None) is None:
+            obj._live_items = snapshot_items([obj.id])[obj.id]
+        return obj._live_items
+
     def get_items_count(self, obj):
-        return obj.items.count()
+        return len(self.get_items(obj))
+
+class OutfitItemPositionSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    position = serializers.IntegerField(min_value=0)
+
+class OutfitItemAddSerializer(OutfitItemPositionSerializer):
+    # Omitted: appended after the outfit's last item
+    position = serializers.IntegerField(min_value=0, required=False)
+
+class OutfitItemMoveSerializer(serializers.Serializer):
+    """Body of the move endpoint: the item to follow, or null to move to the start"""
+    after = serializers.IntegerField(allow_null=True)
 
 class OutfitCreateSerializer(serializers.ModelSerializer):
-    items = serializers.ListField(
-        child=serializers.DictField(child=serializers.IntegerField()),
-        write_only=True,
-        required=False
-    )
+    items = OutfitItemAddSerializer(many=True, write_only=True, required=False)
     
     class Meta:
         model = Outfit
@@ -35,13 +74,25 @@ class OutfitCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        outfit = Outfit.objects.create(user=self.context['request'].user, **validated_data)
-        
-        for item_data in items_data:
-            OutfitItem.objects.create(
-                outfit=outfit,
-                product_id=item_data['product_id'],
-                position=item_data.get('position', 0)
-            )
-        
-        return outfit
\ No newline at end of file
+        return create_outfit(self.context['request'].user, items_data, **validated_data)
+
+class OutfitItemsChangeSerializer(serializers.Serializer):
+    """Body of the bulk item endpoint; removals apply before additions and moves"""
+    add = OutfitItemAddSerializer(many=True, required=False, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    reorder = OutfitItemPositionSerializer(many=True, required=False, default=list)
+
+
+class OutfitCartItemSerializer(serializers.Serializer):
+    variant_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+class OutfitAddToCartSerializer(serializers.Serializer):
+    """Body of add-to-cart: the variant (size, colour) picked for each piece being bought"""
+    items = OutfitCartItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        variant_ids = [item['variant_id'] for item in items]
+        if len(variant_ids) != len(set(variant_ids)):
+            raise serializers.ValidationError('A variant can only appear once.')
+        return items
@@ -1,11 +1,30 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.core.cache import cache
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from apps.outfits.models import Outfit, OutfitItem
+from apps.outfits.models import Outfit, OutfitItem, OutfitReaction
 from apps.catalog.models import Product
-from .serializers import OutfitSerializer, OutfitCreateSerializer, OutfitItemSerializer
+from apps.orders.models import CartItem
+from apps.catalog.pricing import price_cart, price_products
+from apps.catalog.serializers import ProductSerializer
+from apps.outfits import engagement
+from apps.outfits.complements import complete_the_look
+from apps.outfits.feed import feed_cache_key, feed_cache_ttl, public_feed, with_totals
+from apps.orders.serializers import CartItemSerializer
+from apps.outfits.services import add_item, add_pieces_to_cart, change_items, move_item
+from core.idempotency import idempotent
+from core.pagination import KeysetPagination
+from .serializers import (
+    OutfitSerializer, OutfitCreateSerializer, OutfitItemSerializer, OutfitItemsChangeSerializer, OutfitAddToCartSerializer,
+    OutfitItemMoveSerializer,
+)
 
 class OutfitListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -14,11 +33,23 @@ class OutfitListCreateView(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return OutfitCreateSerializer
         return OutfitSerializer
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        outfit = serializer.save()
+        # Respond with the hydrated outfit so clients need no follow-up GET
+        outfit = self.get_queryset().get(id=outfit.id)
+        return Response(OutfitSerializer(outfit, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
     
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Outfit.objects.none()
-        return Outfit.objects.filter(user=self.request.user).prefetch_related('items__product')
+        return with_totals(Outfit.objects.filter(user=self.request.user))
 
 class OutfitDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
@@ -27,33 +58,93 @@ class OutfitDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Outfit.objects.none()
-        return Outfit.objects.filter(user=self.request.user).prefetch_related('items__product')
+        return with_totals(Outfit.objects.filter(user=self.request.user))
+
+class PopularOutfitPagination(KeysetPagination):
+    ordering = ('-popularity_score', '-id')
+
+class TrendingOutfitPagination(KeysetPagination):
+    ordering = ('-trending_score', '-id')
+
+class CheapestOutfitPagination(KeysetPagination):
+    ordering = ('total_price', 'id')
+
+class PriciestOutfitPagination(KeysetPagination):
+    ordering = ('-total_price', '-id')
+
+FEED_ORDERINGS = {
+    'newest': KeysetPagination,
+    'popular': PopularOutfitPagination,
+    'trending': TrendingOutfitPagination,
+    'price_asc': CheapestOutfitPagination,
+    'price_desc': PriciestOutfitPagination,
+}
 
 class PublicOutfitListView(generics.ListAPIView):
+    """
+    Public outfits, keyset paginated; pages are cached until a public outfit changes.
+    ?ordering=newest (default), popular, trending, price_asc or price_desc.
+    ?in_stock=true keeps outfits whose every item is available; ?min_price= and ?max_price= bound the total.
+    """
     permission_classes = [AllowAny]
     serializer_class = OutfitSerializer
-    queryset = Outfit.objects.filter(is_public=True).prefetch_related('items__product')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            ordering = self.request.query_params.get('ordering', 'newest')
+            if ordering not in FEED_ORDERINGS:
+                raise ValidationError({'ordering': f"Unknown ordering '{ordering}'"})
+            self._paginator = FEED_ORDERINGS[ordering]()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = public_feed()
+        params = self.request.query_params
+        if params.get('in_stock', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(all_in_stock=True)
+        for param, lookup in (('min_price', 'total_price__gte'), ('max_price', 'total_price__lte')):
+            if params.get(param):
+                try:
+                    bound = Decimal(params[param])
+                except InvalidOperation:
+                    bound = None
+                if bound is None or not bound.is_finite():
+                    raise ValidationError({param: 'Must be a number'})
+                queryset = queryset.filter(**{lookup: bound})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        key = feed_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, timeout=feed_cache_ttl())
+        return response
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def add_item_to_outfit(request, outfit_id):
     outfit = get_object_or_404(Outfit, id=outfit_id, user=request.user)
     product_id = request.data.get('product_id')
-    position = request.data.get('position', 0)
+    position = request.data.get('position')
     
     if not product_id:
         return Response({'error': 'product_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if position is not None:
+        try:
+            position = max(int(position), 0)
+        except (TypeError, ValueError):
+            return Response({'error': 'position must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
         product = Product.objects.get(id=product_id)
     except Product.DoesNotExist:
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    outfit_item, created = OutfitItem.objects.get_or_create(
-        outfit=outfit,
-        product=product,
-        defaults={'position': position}
-    )
+    outfit_item, created = add_item(outfit, product, position)
     
     if not created:
         return Response({'error': 'Product already in outfit'}, status=status.HTTP_400_BAD_REQUEST)
@@ -61,6 +152,99 @@ def add_item_to_outfit(request, outfit_id):
     serializer = OutfitItemSerializer(outfit_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def move_outfit_item(request, outfit_id, item_id):
+    """Move one item after another (``after``: item id, or null for the start); rewrites only that item"""
+    outfit = get_object_or_404(Outfit, id=outfit_id, user=request.user)
+    outfit_item = get_object_or_404(OutfitItem, id=item_id, outfit=outfit)
+    serializer = OutfitItemMoveSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    move_item(outfit, outfit_item, after=serializer.validated_data['after'])
+    return Response(OutfitItemSerializer(outfit_item).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def change_outfit_items(request, outfit_id):
+    """Add, remove and reorder items in one request; returns the updated outfit"""
+    outfit = get_object_or_404(Outfit, id=outfit_id, user=request.user)
+    serializer = OutfitItemsChangeSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    change_items(outfit, **serializer.validated_data)
+    outfit = with_totals(Outfit.objects.filter(id=outfit.id)).get()
+    return Response(OutfitSerializer(outfit, context={'request': request}).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def add_outfit_to_cart(request, outfit_id):
+    """Add the chosen variant of each piece to the cart in one transaction; returns the cart"""
+    outfit = get_object_or_404(_visible_outfits(request), id=outfit_id)
+    serializer = OutfitAddToCartSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    add_pieces_to_cart(outfit, request.user, {item['variant_id']: item['quantity'] for item in serializer.validated_data['items']})
+    cart = list(CartItem.objects.filter(user=request.user).select_related('variant__product'))
+    context = {'request': request, 'pricing': price_cart(cart)}
+    return Response(CartItemSerializer(cart, many=True, context=context).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def complete_outfit(request, outfit_id):
+    """Suggest pieces from categories the outfit does not cover yet"""
+    outfit = get_object_or_404(_visible_outfits(request), id=outfit_id)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 6)), 20))
+    except ValueError:
+        limit = 6
+    pieces = dict(OutfitItem.objects.filter(outfit=outfit).values_list('product_id', 'product__category_id'))
+    suggestions = complete_the_look(pieces, limit=limit)
+    products = [product for product, _, _ in suggestions]
+    context = {'request': request, 'prices': price_products(products)}
+    return Response({
+        'outfit_id': outfit.id,
+        'suggestions': [
+            {'product': ProductSerializer(product, context=context).data, 'score': round(score, 4), 'pairs_with': because}
+            for product, score, because in suggestions
+        ],
+    })
+
+def _visible_outfits(request):
+    visible = Q(is_public=True)
+    if request.user.is_authenticated:
+        visible |= Q(user=request.user)
+    return Outfit.objects.filter(visible)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def record_outfit_view(request, outfit_id):
+    """Count a view; buffered, so the outfit row is not written per view"""
+    if not _visible_outfits(request).filter(id=outfit_id).exists():
+        return Response({'error': 'Outfit not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.user.is_authenticated:
+        viewer = f"user:{request.user.id}"
+    else:
+        client = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+        viewer = 'anon:' + hashlib.sha256(client.encode('utf-8')).hexdigest()[:32]
+    engagement.record(outfit_id, views=1, viewer=viewer)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def react_to_outfit(request, outfit_id, kind):
+    """Like or save an outfit (POST), or take it back (DELETE)"""
+    outfit = get_object_or_404(_visible_outfits(request), id=outfit_id)
+    counter = {'like': 'likes', 'save': 'saves'}[kind]
+    if request.method == 'POST':
+        _, created = OutfitReaction.objects.get_or_create(user=request.user, outfit=outfit, kind=kind)
+        if created:
+            engagement.record(outfit.id, **{counter: 1})
+        return Response({kind: True}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    deleted, _ = OutfitReaction.objects.filter(user=request.user, outfit=outfit, kind=kind).delete()
+    if deleted:
+        engagement.record(outfit.id, **{counter: -1})
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_item_from_outfit(request, outfit_id, item_id):
@@ -5,3 +5,6 @@ class OutfitsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.outfits"
     label = "outfits"
+
+    def ready(self):
+        import apps.outfits.signals
@@ -0,0 +1,120 @@
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.outfits.models import OutfitItem, ProductComplement
+
+logger = logging.getLogger(__name__)
+
+COMPLEMENT_BATCH_SIZE = 2000
+# Items beyond this in one outfit are ignored; pair counting is quadratic per outfit
+MAX_ITEMS_PER_OUTFIT = 40
+
+
+def count_cooccurrences(rows):
+    """
+    Count how often products are styled together.
+
+    ``rows`` are ``(outfit_id, product_id, category_id)`` ordered by outfit.
+    Only pairs from different categories are counted, so a dress pairs with a
+    cardigan but never with another dress. Counts are kept in a sparse dict
+    of observed pairs; memory grows with distinct pairs, not products squared.
+    Returns ``(pair_counts, product_counts)``.
+    """
+    pairs = Counter()
+    products = Counter()
+    for _, items in groupby(rows, key=itemgetter(0)):
+        pieces = {}
+        for _, product_id, category_id in items:
+            if len(pieces) < MAX_ITEMS_PER_OUTFIT:
+                pieces[product_id] = category_id
+        products.update(pieces)
+        for (a, category_a), (b, category_b) in combinations(sorted(pieces.items()), 2):
+            if category_a != category_b:
+                pairs[a, b] += 1
+    return pairs, products
+
+
+def top_complements(pairs, products, top_k, min_count=1):
+    """
+    Rank each product's complements by cosine similarity of their outfit sets.
+
+    Cosine (``together / sqrt(outfits_a * outfits_b)``) keeps very common
+    basics from topping every list. Returns ``{product_id: [(score, complement_id, count)]}``.
+    """
+    candidates = defaultdict(list)
+    for (a, b), together in pairs.items():
+        if together < min_count:
+            continue
+        score = together / math.sqrt(products[a] * products[b])
+        candidates[a].append((score, b, together))
+        candidates[b].append((score, a, together))
+    return {
+        product_id: heapq.nlargest(top_k, scored, key=lambda entry: (entry[0], entry[2], -entry[1]))
+        for product_id, scored in candidates.items()
+    }
+
+
+def build_complements(top_k=None, min_count=None):
+    """
+    Rebuild the ProductComplement table from every outfit.
+
+    Outfit items are streamed in outfit order, counted in memory, and the top
+    ``top_k`` complements per product replace the previous ones in one
+    transaction, so readers never see a half built table.
+    Returns the number of complement rows written.
+    """
+    top_k = top_k or getattr(settings, 'COMPLEMENT_TOP_K', 10)
+    min_count = min_count or getattr(settings, 'COMPLEMENT_MIN_COUNT', 2)
+    rows = (
+        OutfitItem.objects.order_by('outfit_id')
+        .values_list('outfit_id', 'product_id', 'product__category_id')
+        .iterator(chunk_size=COMPLEMENT_BATCH_SIZE)
+    )
+    pairs, products = count_cooccurrences(rows)
+    ranked = top_complements(pairs, products, top_k, min_count)
+
+    complements = (
+        ProductComplement(product_id=product_id, complement_id=complement_id, rank=rank, score=score, co_occurrences=count)
+        for product_id, scored in ranked.items()
+        for rank, (score, complement_id, count) in enumerate(scored)
+    )
+    with transaction.atomic():
+        ProductComplement.objects.all().delete()
+        written = len(ProductComplement.objects.bulk_create(complements, batch_size=COMPLEMENT_BATCH_SIZE))
+    logger.info(f"Built {written} product complements from {len(pairs)} product pairs")
+    return written
+
+
+def complete_the_look(pieces, limit=6):
+    """
+    Suggest products missing from an outfit whose ``pieces`` are ``{product_id: category_id}``.
+
+    One lookup on the ``(product, rank)`` index fetches the stored complements
+    of every piece. Candidates are scored by the sum of their scores across
+    the pieces, and those in a category the outfit already covers are dropped.
+    Returns ``[(complement product, score, [matched outfit product ids])]``.
+    """
+    if not pieces:
+        return []
+    covered = set(pieces.values())
+    rows = (
+        ProductComplement.objects.filter(product_id__in=list(pieces))
+        .exclude(complement__category_id__in=covered)
+        .select_related('complement__category')
+    )
+    scores = defaultdict(float)
+    because = defaultdict(list)
+    candidates = {}
+    for row in rows:
+        candidates[row.complement_id] = row.complement
+        scores[row.complement_id] += row.score
+        because[row.complement_id].append(row.product_id)
+    ranked = sorted(candidates, key=lambda complement_id: (-scores[complement_id], complement_id))[:limit]
+    return [(candidates[complement_id], scores[complement_id], sorted(because[complement_id])) for complement_id in ranked]
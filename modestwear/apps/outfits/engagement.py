@@ -0,0 +1,171 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from redis.exceptions import RedisError
+
+from apps.outfits.models import Outfit
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = 'outfits:engagement:{}'
+VIEWERS_KEY = 'outfits:viewers:{}'
+DIRTY_KEY = 'outfits:engagement:dirty'
+COUNTER_FIELDS = {'views': 'views_count', 'likes': 'likes_count', 'saves': 'saves_count'}
+# Below this a decayed trending score is treated as zero and no longer rewritten
+TRENDING_FLOOR = 0.01
+
+
+def _weights():
+    return getattr(settings, 'OUTFIT_ENGAGEMENT_WEIGHTS', {'views': 1, 'likes': 3, 'saves': 5})
+
+
+def _viewers_ttl():
+    return getattr(settings, 'OUTFIT_VIEWERS_TTL', 60 * 60 * 24 * 30)
+
+
+def _redis():
+    """The Redis client behind the default cache, or None when the cache is not Redis"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def record(outfit_id, views=0, likes=0, saves=0, viewer=None):
+    """
+    Buffer engagement for an outfit.
+
+    Deltas go to a Redis hash and ``viewer`` into a HyperLogLog of unique
+    viewers, which expires ``OUTFIT_VIEWERS_TTL`` after the last view; a
+    restarted sketch never lowers the stored count, as flushes keep the
+    larger value. The outfit is marked dirty for the next flush. Nothing touches
+    the outfit row here. Without Redis the deltas are applied to the row
+    directly and every view counts as a unique viewer.
+    """
+    deltas = {'views': views, 'likes': likes, 'saves': saves}
+    client = _redis()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name, delta in deltas.items():
+                if delta:
+                    pipe.hincrby(COUNTERS_KEY.format(outfit_id), name, delta)
+            if viewer is not None:
+                pipe.pfadd(VIEWERS_KEY.format(outfit_id), viewer)
+                # Sliding expiry: only outfits nobody has viewed for the whole window lose their sketch
+                pipe.expire(VIEWERS_KEY.format(outfit_id), _viewers_ttl())
+            pipe.sadd(DIRTY_KEY, outfit_id)
+            pipe.execute()
+            return
+        except RedisError as exc:
+            logger.warning(f"Engagement buffer unavailable, writing outfit {outfit_id} directly: {str(exc)}")
+    apply_engagement({outfit_id: deltas}, unique_viewers={outfit_id: views} if views else None, absolute=False)
+
+
+def apply_engagement(deltas, unique_viewers=None, absolute=True):
+    """
+    Apply ``{outfit_id: {'views', 'likes', 'saves'}}`` deltas to the outfit rows in one UPDATE.
+
+    ``unique_viewers`` are HyperLogLog counts replacing the stored value
+    (``absolute``) or increments to it. Counts, popularity and trending
+    scores are then recomputed for the same rows in a second UPDATE.
+    """
+    if not deltas and not unique_viewers:
+        return 0
+    weights = _weights()
+    ids = sorted({*deltas, *(unique_viewers or {})})
+    updates = {}
+    for name, field in COUNTER_FIELDS.items():
+        whens = [
+            When(id=outfit_id, then=Greatest(F(field) + delta[name], Value(0)))
+            for outfit_id, delta in deltas.items() if delta.get(name)
+        ]
+        if whens:
+            updates[field] = Case(*whens, default=F(field), output_field=IntegerField())
+    if unique_viewers:
+        whens = [
+            When(id=outfit_id, then=Greatest(F('unique_viewers'), Value(count)) if absolute else F('unique_viewers') + count)
+            for outfit_id, count in unique_viewers.items()
+        ]
+        updates['unique_viewers'] = Case(*whens, default=F('unique_viewers'), output_field=IntegerField())
+    heat = {
+        outfit_id: sum(weights.get(name, 0) * max(delta.get(name, 0), 0) for name in COUNTER_FIELDS)
+        for outfit_id, delta in deltas.items()
+    }
+    whens = [When(id=outfit_id, then=F('trending_score') + value) for outfit_id, value in heat.items() if value]
+    if whens:
+        updates['trending_score'] = Case(*whens, default=F('trending_score'), output_field=FloatField())
+
+    with transaction.atomic():
+        updated = Outfit.objects.filter(id__in=ids).update(**updates) if updates else len(ids)
+        # Separate statement so the score reads the counts just written
+        Outfit.objects.filter(id__in=ids).update(popularity_score=(
+            F('unique_viewers') * weights.get('views', 0)
+            + F('likes_count') * weights.get('likes', 0)
+            + F('saves_count') * weights.get('saves', 0)
+        ))
+    return updated
+
+
+def flush_engagement(batch_size=None):
+    """
+    Move buffered engagement from Redis to the outfit rows, ``batch_size`` outfits per UPDATE.
+
+    Each outfit's counters are read and deleted in one MULTI, so increments
+    arriving meanwhile land in a fresh hash and are flushed next time. If
+    reading the counters fails the popped outfits are marked dirty again, and
+    if the database write fails the deltas are put back, before re-raising.
+    Returns the number of outfits flushed.
+    """
+    client = _redis()
+    if client is None:
+        return 0
+    batch_size = batch_size or getattr(settings, 'OUTFIT_ENGAGEMENT_FLUSH_BATCH', 500)
+    flushed = 0
+    while True:
+        ids = [int(outfit_id) for outfit_id in client.spop(DIRTY_KEY, batch_size) or []]
+        if not ids:
+            break
+        pipe = client.pipeline(transaction=True)
+        for outfit_id in ids:
+            pipe.hgetall(COUNTERS_KEY.format(outfit_id))
+            pipe.delete(COUNTERS_KEY.format(outfit_id))
+            pipe.pfcount(VIEWERS_KEY.format(outfit_id))
+        try:
+            results = pipe.execute()
+        except RedisError:
+            # The MULTI did not run, so the counters are still there; mark them dirty again
+            client.sadd(DIRTY_KEY, *ids)
+            raise
+
+        deltas, unique_viewers = {}, {}
+        for index, outfit_id in enumerate(ids):
+            counters, _, viewers = results[index * 3:index * 3 + 3]
+            deltas[outfit_id] = {name.decode(): int(value) for name, value in counters.items()}
+            unique_viewers[outfit_id] = viewers
+        try:
+            apply_engagement(deltas, unique_viewers)
+        except Exception:
+            pipe = client.pipeline(transaction=False)
+            for outfit_id, delta in deltas.items():
+                for name, value in delta.items():
+                    pipe.hincrby(COUNTERS_KEY.format(outfit_id), name, value)
+            pipe.sadd(DIRTY_KEY, *ids)
+            pipe.execute()
+            raise
+        flushed += len(ids)
+    if flushed:
+        logger.info(f"Flushed engagement for {flushed} outfits")
+    return flushed
+
+
+def decay_trending(hours=1):
+    """Halve trending scores every ``OUTFIT_TRENDING_HALF_LIFE_HOURS``; run every ``hours`` hours"""
+    half_life = getattr(settings, 'OUTFIT_TRENDING_HALF_LIFE_HOURS', 24)
+    factor = 0.5 ** (hours / half_life)
+    Outfit.objects.filter(trending_score__gt=0, trending_score__lt=TRENDING_FLOOR).update(trending_score=0)
+    return Outfit.objects.filter(trending_score__gte=TRENDING_FLOOR).update(trending_score=F('trending_score') * factor)
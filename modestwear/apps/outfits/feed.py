@@ -0,0 +1,72 @@
+import hashlib
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, DecimalField, ExpressionWrapper, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from apps.catalog.models import ProductVariant
+from apps.outfits.models import Outfit, OutfitItem
+
+FEED_VERSION_KEY = 'outfits:feed_version'
+
+
+def with_totals(queryset):
+    """
+    Annotate ``total_price``, ``min_stock`` and ``all_in_stock`` with correlated subqueries.
+
+    ``total_price`` sums the items' list prices and ``min_stock`` is the
+    scarcest item's units across its active variants. Being subqueries they
+    can be filtered and sorted on without joining items into the outer query.
+    An empty outfit totals 0 and is not in stock.
+    """
+    total = (
+        OutfitItem.objects.filter(outfit=OuterRef('pk')).order_by().values('outfit')
+        .annotate(total=Sum('product__base_price')).values('total')
+    )
+    units = (
+        ProductVariant.objects.filter(product=OuterRef('product'), is_active=True, stock_available__gt=0)
+        .order_by().values('product').annotate(units=Sum('stock_available')).values('units')
+    )
+    scarcest = (
+        OutfitItem.objects.filter(outfit=OuterRef('pk'))
+        .annotate(units=Coalesce(Subquery(units), 0)).order_by('units').values('units')[:1]
+    )
+    return queryset.annotate(
+        total_price=Coalesce(
+            Subquery(total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=10, decimal_places=2)
+        ),
+        min_stock=Coalesce(Subquery(scarcest), 0),
+    ).annotate(all_in_stock=ExpressionWrapper(Q(min_stock__gt=0), output_field=BooleanField()))
+
+
+def public_feed():
+    # Items are rendered from each outfit's snapshot, so the page needs no joins
+    return with_totals(Outfit.objects.filter(is_public=True))
+
+
+def feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() so concurrent cold readers agree on one version
+        if not cache.add(FEED_VERSION_KEY, version, timeout=None):
+            version = cache.get(FEED_VERSION_KEY) or version
+    return version
+
+
+def bump_feed_version():
+    """Orphan every cached feed page; called whenever a public outfit changes"""
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def feed_cache_key(request):
+    """Cache key for one feed page: the current version plus the page's full URL"""
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f"outfits:feed:{feed_version()}:{url}"
+
+
+def feed_cache_ttl():
+    return getattr(settings, 'OUTFIT_FEED_CACHE_TTL', 300)
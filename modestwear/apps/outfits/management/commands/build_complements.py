@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.outfits.complements import build_complements
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the complete-the-look product complements from outfit co-occurrence.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help='Complements kept per product, defaults to COMPLEMENT_TOP_K')
+        parser.add_argument('--min-count', type=int, help='Outfits a pair must share, defaults to COMPLEMENT_MIN_COUNT')
+
+    def handle(self, *args, **options):
+        for name in ('top_k', 'min_count'):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        written = build_complements(top_k=options['top_k'], min_count=options['min_count'])
+        self.stdout.write(self.style.SUCCESS(f'Built {written} product complements'))
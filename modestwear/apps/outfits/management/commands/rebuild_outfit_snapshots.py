@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.outfits.models import Outfit
+from apps.outfits.snapshots import SNAPSHOT_VERSION, build_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild outfit snapshots; by default only those missing or in an older layout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every outfit, not only stale snapshots')
+
+    def handle(self, *args, **options):
+        outfits = Outfit.objects.all()
+        if not options['all']:
+            outfits = outfits.exclude(snapshot__version=SNAPSHOT_VERSION)
+        rebuilt = build_snapshots(outfits.values_list('id', flat=True).iterator())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} outfit snapshots'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("outfits", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="outfit",
+            index=models.Index(
+                fields=["is_public", "-created_at"], name="outfit_public_created_idx"
+            ),
+        ),
+    ]
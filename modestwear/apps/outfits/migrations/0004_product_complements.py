@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0004_promotion"),
+        ("outfits", "0003_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductComplement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                ("co_occurrences", models.PositiveIntegerField()),
+                (
+                    "complement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.product",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="complements",
+                        to="catalog.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["product_id", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "rank"], name="complement_product_rank_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productcomplement",
+            constraint=models.UniqueConstraint(
+                fields=("product", "complement"), name="product_complement_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("outfits", "0004_product_complements"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutfitReaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("like", "Like"), ("save", "Save")], max_length=10
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="popularity_score",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="saves_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="trending_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="unique_viewers",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="outfit",
+            name="views_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="outfit",
+            index=models.Index(
+                fields=["is_public", "-popularity_score", "-id"],
+                name="outfit_public_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outfit",
+            index=models.Index(
+                fields=["is_public", "-trending_score", "-id"],
+                name="outfit_public_trending_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outfitreaction",
+            name="outfit",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reactions",
+                to="outfits.outfit",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outfitreaction",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="outfit_reactions",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="outfitreaction",
+            constraint=models.UniqueConstraint(
+                fields=("user", "outfit", "kind"), name="outfit_reaction_unique"
+            ),
+        ),
+    ]
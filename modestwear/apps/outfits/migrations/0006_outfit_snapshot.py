@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("outfits", "0005_outfit_engagement"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outfit",
+            name="snapshot",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:17
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+# Frozen copy of apps.outfits.ranking.spread_ranks, so later changes to the app cannot alter this migration
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+
+def spread_ranks(count):
+    width = 1
+    while BASE ** width <= count * 4:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for index in range(1, count + 1):
+        value, digits = step * index, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def positions_to_ranks(apps, schema_editor):
+    # Ties on the old integer position (it defaulted to 0) keep insertion order
+    OutfitItem = apps.get_model("outfits", "OutfitItem")
+    items = OutfitItem.objects.order_by("outfit_id", "position", "id").only("id", "outfit_id")
+    ranked = []
+    for _, outfit_items in groupby(items.iterator(chunk_size=2000), key=lambda item: item.outfit_id):
+        outfit_items = list(outfit_items)
+        for item, rank in zip(outfit_items, spread_ranks(len(outfit_items))):
+            item.rank = rank
+            ranked.append(item)
+    OutfitItem.objects.bulk_update(ranked, ["rank"], batch_size=2000)
+
+
+def ranks_to_positions(apps, schema_editor):
+    OutfitItem = apps.get_model("outfits", "OutfitItem")
+    items = OutfitItem.objects.order_by("outfit_id", "rank", "id").only("id", "outfit_id")
+    positioned = []
+    for _, outfit_items in groupby(items.iterator(chunk_size=2000), key=lambda item: item.outfit_id):
+        for position, item in enumerate(outfit_items):
+            item.position = position
+            positioned.append(item)
+    OutfitItem.objects.bulk_update(positioned, ["position"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("outfits", "0006_outfit_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outfititem",
+            name="rank",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.RunPython(positions_to_ranks, ranks_to_positions),
+        migrations.RemoveField(
+            model_name="outfititem",
+            name="position",
+        ),
+        migrations.AlterModelOptions(
+            name="outfititem",
+            options={"ordering": ["rank", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="outfititem",
+            index=models.Index(
+                fields=["outfit", "rank"], name="outfititem_outfit_rank_idx"
+            ),
+        ),
+    ]
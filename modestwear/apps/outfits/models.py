@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from apps.catalog.models import Product
+from apps.outfits.ranking import rank_between
 
 User = get_user_model()
 
@@ -11,21 +12,106 @@ class Outfit(models.Model):
     is_public = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Engagement, buffered in Redis and flushed in batches by apps.outfits.engagement
+    views_count = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
+    saves_count = models.PositiveIntegerField(default=0)
+    popularity_score = models.IntegerField(default=0)
+    trending_score = models.FloatField(default=0)
+    # Items with their product names, prices, thumbnails and stock, rebuilt by apps.outfits.snapshots
+    snapshot = models.JSONField(default=dict, blank=True)
+
+    # Written by background jobs with UPDATE statements; a plain save() leaves them alone so it cannot restore stale values
+    DERIVED_FIELDS = (
+        'views_count', 'unique_viewers', 'likes_count', 'saves_count', 'popularity_score', 'trending_score', 'snapshot',
+    )
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Public feed, newest first
+            models.Index(fields=['is_public', '-created_at'], name='outfit_public_created_idx'),
+            # Public feed by popularity or trending, keyset paginated on (score, id)
+            models.Index(fields=['is_public', '-popularity_score', '-id'], name='outfit_public_popular_idx'),
+            models.Index(fields=['is_public', '-trending_score', '-id'], name='outfit_public_trending_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_public = instance.__dict__.get('is_public')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        # Read by the feed invalidation receiver, so unpublishing also refreshes the feed
+        self._loaded_is_public = self.is_public
+
+class OutfitReaction(models.Model):
+    """A user's like or save of an outfit; one of each per user"""
+    KIND_CHOICES = (
+        ('like', 'Like'),
+        ('save', 'Save'),
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outfit_reactions')
+    outfit = models.ForeignKey(Outfit, on_delete=models.CASCADE, related_name='reactions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'outfit', 'kind'], name='outfit_reaction_unique'),
+        ]
+
 class OutfitItem(models.Model):
     outfit = models.ForeignKey(Outfit, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    position = models.PositiveIntegerField(default=0)  # For ordering items in outfit
+    # Fractional rank (apps.outfits.ranking); moving an item rewrites only this column
+    rank = models.CharField(max_length=64, default='', blank=True)
     
     class Meta:
-        ordering = ['position']
+        ordering = ['rank', 'id']
         unique_together = ['outfit', 'product']
+        indexes = [
+            models.Index(fields=['outfit', 'rank'], name='outfititem_outfit_rank_idx'),
+        ]
     
     def __str__(self):
         return f"{self.outfit.name} - {self.product.name}"
+
+    def save(self, *args, **kwargs):
+        if not self.rank:
+            # Appended after the outfit's last item
+            last = OutfitItem.objects.filter(outfit_id=self.outfit_id).order_by('-rank').values_list('rank', flat=True).first()
+            self.rank = rank_between(last, None)
+        super().save(*args, **kwargs)
+
+class ProductComplement(models.Model):
+    """A product styled with ``product`` in other categories, mined from outfits by apps.outfits.complements"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='complements')
+    complement = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    co_occurrences = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product_id', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'complement'], name='product_complement_unique'),
+        ]
+        indexes = [
+            # Complete-the-look reads the top complements of an outfit's products
+            models.Index(fields=['product', 'rank'], name='complement_product_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.complement_id} ({self.score:.3f})"
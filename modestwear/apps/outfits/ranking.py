@@ -0,0 +1,62 @@
+"""
+Fractional ranks for ordering outfit items.
+
+A rank is a base 36 string compared lexicographically. There is always a
+rank between two others, so moving an item rewrites only that item's rank.
+Ranks never end in ``'0'``, which keeps room below every rank. Only digits
+and lowercase letters are used, so they sort the same under every common
+database collation.
+"""
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+
+def _midpoint(low, high):
+    # ``low`` may be '' (the start), ``high`` None (the end); low < high
+    if high is not None:
+        common = 0
+        while common < len(high) and (low[common] if common < len(low) else '0') == high[common]:
+            common += 1
+        if common:
+            return high[:common] + _midpoint(low[common:], high[common:])
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else BASE
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit + 1) // 2]
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+def rank_between(before=None, after=None):
+    """A rank sorting after ``before`` and before ``after``; either may be None for the start or the end"""
+    low = before or ''
+    if after is not None and low >= after:
+        raise ValueError(f"No rank between {before!r} and {after!r}")
+    return _midpoint(low, after)
+
+
+def ranks_between(before, after, count):
+    """``count`` increasing ranks between ``before`` and ``after``, bisected so they stay short"""
+    if count <= 0:
+        return []
+    middle = rank_between(before, after)
+    left = (count - 1) // 2
+    return ranks_between(before, middle, left) + [middle] + ranks_between(middle, after, count - 1 - left)
+
+
+def spread_ranks(count):
+    """``count`` fixed-width ranks spaced evenly over the whole range; used for new outfits and rebalancing"""
+    width = 1
+    while BASE ** width <= count * 4:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for index in range(1, count + 1):
+        value, digits = step * index, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        # Trailing zeros dropped: 'k0' and 'k' sort identically against every other rank here
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
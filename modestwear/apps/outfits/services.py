@@ -0,0 +1,266 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from rest_framework.exceptions import ValidationError
+
+from apps.catalog.models import Product, ProductVariant
+from apps.orders.services import add_to_cart
+from apps.outfits.models import Outfit, OutfitItem
+from apps.outfits.ranking import rank_between, ranks_between, spread_ranks
+from apps.outfits.snapshots import build_snapshots, schedule_snapshots
+
+RANK_MAX_LENGTH = OutfitItem._meta.get_field('rank').max_length
+
+
+def check_products_exist(product_ids):
+    """Validate product ids with one ``IN`` query, naming every unknown id"""
+    product_ids = set(product_ids)
+    found = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    missing = sorted(product_ids - found)
+    if missing:
+        raise ValidationError({'product_id': f"Unknown products: {', '.join(map(str, missing))}"})
+
+
+def _check_no_duplicates(product_ids, field):
+    if len(product_ids) != len(set(product_ids)):
+        raise ValidationError({field: 'A product can only appear once.'})
+
+
+def _in_order(items):
+    # Items with a position first, by position; the rest keep the order they were given in
+    indexed = sorted(enumerate(items), key=lambda pair: (pair[1].get('position') is None, pair[1].get('position') or 0, pair[0]))
+    return [item for _, item in indexed]
+
+
+def create_outfit(user, items=(), **fields):
+    """
+    Create an outfit and its items in one transaction.
+
+    ``items`` are ``{'product_id', 'position'}`` dicts, ``position`` being the
+    item's index and optional. They are validated up front, given evenly
+    spaced ranks and inserted with a single ``bulk_create``. The snapshot is
+    built before returning so the owner's response already shows the items.
+    """
+    product_ids = [item['product_id'] for item in items]
+    _check_no_duplicates(product_ids, 'items')
+    check_products_exist(product_ids)
+    items = _in_order(items)
+    with transaction.atomic():
+        outfit = Outfit.objects.create(user=user, **fields)
+        OutfitItem.objects.bulk_create(
+            OutfitItem(outfit=outfit, product_id=item['product_id'], rank=rank)
+            for item, rank in zip(items, spread_ranks(len(items)))
+        )
+        build_snapshots([outfit.id])
+    return outfit
+
+
+def _ranks_for(order, fixed):
+    """
+    Ranks for the products in ``order`` missing from ``fixed``.
+
+    ``fixed`` maps the products that stay put to their ranks. Each run of
+    placed products gets ranks between its fixed neighbours, so only placed
+    rows are written. Returns ``None`` when there is no room (tied or too
+    long ranks) and the outfit needs rebalancing.
+    """
+    ranks, run, before = {}, [], None
+    for product_id in order + [None]:
+        if product_id is not None and product_id not in fixed:
+            run.append(product_id)
+            continue
+        after = fixed[product_id] if product_id is not None else None
+        try:
+            ranks.update(zip(run, ranks_between(before, after, len(run))))
+        except ValueError:
+            return None
+        run, before = [], after
+    if any(len(rank) > RANK_MAX_LENGTH for rank in ranks.values()):
+        return None
+    return ranks
+
+
+def change_items(outfit, add=(), remove=(), reorder=()):
+    """
+    Add, remove and reposition an outfit's items in one transaction.
+
+    ``add`` and ``reorder`` are ``{'product_id', 'position'}`` dicts and
+    ``remove`` is a list of product ids. Removals apply first, so a product can
+    be removed and re-added in the same request. Positions are indexes in the
+    resulting outfit; added items without one are appended. Only added and
+    moved rows are written. The outfit row is locked so concurrent edits to
+    one outfit apply one after the other, and its snapshot is rebuilt in the
+    same transaction.
+    """
+    add_ids = [item['product_id'] for item in add]
+    reorder_ids = [item['product_id'] for item in reorder]
+    _check_no_duplicates(add_ids, 'add')
+    _check_no_duplicates(reorder_ids, 'reorder')
+    check_products_exist(add_ids)
+
+    with transaction.atomic():
+        Outfit.objects.select_for_update().filter(id=outfit.id).first()
+        if remove:
+            OutfitItem.objects.filter(outfit=outfit, product_id__in=remove).delete()
+
+        current = list(OutfitItem.objects.filter(outfit=outfit))
+        existing = {item.product_id: item for item in current}
+        already = sorted(set(add_ids) & set(existing))
+        if already:
+            raise ValidationError({'add': f"Already in outfit: {', '.join(map(str, already))}"})
+        absent = sorted(set(reorder_ids) - set(existing) - set(add_ids))
+        if absent:
+            raise ValidationError({'reorder': f"Not in outfit: {', '.join(map(str, absent))}"})
+
+        placed = {item['product_id']: item.get('position') for item in add}
+        placed.update((item['product_id'], item['position']) for item in reorder)
+        order = [item.product_id for item in current if item.product_id not in placed]
+        positioned = _in_order([{'product_id': pid, 'position': pos} for pid, pos in placed.items()])
+        for item in positioned:
+            if item['position'] is None:
+                order.append(item['product_id'])
+            else:
+                order.insert(min(item['position'], len(order)), item['product_id'])
+
+        ranks = _ranks_for(order, {pid: item.rank for pid, item in existing.items() if pid not in placed})
+        if ranks is None:
+            ranks = dict(zip(order, spread_ranks(len(order))))
+        moved = []
+        for product_id, item in existing.items():
+            if product_id in ranks and item.rank != ranks[product_id]:
+                item.rank = ranks[product_id]
+                moved.append(item)
+        if moved:
+            OutfitItem.objects.bulk_update(moved, ['rank'])
+        OutfitItem.objects.bulk_create(
+            OutfitItem(outfit=outfit, product_id=product_id, rank=ranks[product_id]) for product_id in add_ids
+        )
+        # bulk_create/bulk_update send no signals; the rebuild also refreshes the feed
+        build_snapshots([outfit.id])
+    return outfit
+
+
+def rebalance_outfit(outfit_id):
+    """Respread an outfit's ranks evenly, keeping its order; call with the outfit row locked"""
+    items = list(OutfitItem.objects.filter(outfit_id=outfit_id).only('id', 'rank'))
+    changed = []
+    for item, rank in zip(items, spread_ranks(len(items))):
+        if item.rank != rank:
+            item.rank = rank
+            changed.append(item)
+    OutfitItem.objects.bulk_update(changed, ['rank'])
+    return len(changed)
+
+
+def _rank_after(outfit, anchor=None, moving_id=None):
+    """A rank right after the ``(rank, id)`` anchor (None for the start), or None if there is no room"""
+    following = OutfitItem.objects.filter(outfit=outfit).exclude(id=moving_id)
+    if anchor is not None:
+        rank, item_id = anchor
+        following = following.filter(Q(rank__gt=rank) | Q(rank=rank, id__gt=item_id))
+    after = following.values_list('rank', flat=True).first()
+    try:
+        rank = rank_between(anchor[0] if anchor is not None else None, after)
+    except ValueError:
+        return None
+    return rank if len(rank) <= RANK_MAX_LENGTH else None
+
+
+def move_item(outfit, item, after=None):
+    """
+    Move ``item`` right after the item with id ``after``, or first when it is None.
+
+    Only the moved row is written: it gets a rank between its new
+    neighbours. If they leave no room the outfit is rebalanced first, which
+    is rare; ``rebalance_ranks`` normally respreads long ranks in the
+    background long before that.
+    """
+    with transaction.atomic():
+        Outfit.objects.select_for_update().filter(id=outfit.id).first()
+        anchor_filter = OutfitItem.objects.filter(outfit=outfit, id=after).exclude(id=item.id)
+        if after is not None and not anchor_filter.exists():
+            raise ValidationError({'after': 'Not another item of this outfit.'})
+
+        def anchor():
+            return anchor_filter.values_list('rank', 'id').first() if after is not None else None
+
+        rank = _rank_after(outfit, anchor(), moving_id=item.id)
+        if rank is None:
+            rebalance_outfit(outfit.id)
+            rank = _rank_after(outfit, anchor(), moving_id=item.id)
+        OutfitItem.objects.filter(id=item.id).update(rank=rank)
+        item.rank = rank
+        schedule_snapshots([outfit.id])
+    return item
+
+
+def add_item(outfit, product, position=None):
+    """
+    Add one product at index ``position`` (appended when None or past the end).
+
+    Returns ``(item, created)``; a product already in the outfit is returned
+    as is.
+    """
+    with transaction.atomic():
+        Outfit.objects.select_for_update().filter(id=outfit.id).first()
+        item = OutfitItem.objects.filter(outfit=outfit, product=product).first()
+        if item is not None:
+            return item, False
+        ranked = OutfitItem.objects.filter(outfit=outfit).values_list('rank', 'id')
+
+        def anchor():
+            if position == 0:
+                return None
+            if position is not None:
+                preceding = ranked[position - 1:position].first()
+                if preceding is not None:
+                    return preceding
+            return ranked.reverse().first()
+
+        rank = _rank_after(outfit, anchor())
+        if rank is None:
+            rebalance_outfit(outfit.id)
+            rank = _rank_after(outfit, anchor())
+        # The post_save receiver schedules the snapshot rebuild
+        return OutfitItem.objects.create(outfit=outfit, product=product, rank=rank), True
+
+
+def rebalance_ranks(max_length=None):
+    """
+    Respread the ranks of outfits whose longest rank exceeds ``max_length``.
+
+    Repeated moves into the same gap lengthen ranks a character every few
+    moves; this background pass keeps them short. Returns the number of
+    outfits rebalanced.
+    """
+    max_length = max_length or getattr(settings, 'OUTFIT_RANK_REBALANCE_LENGTH', 16)
+    outfit_ids = list(
+        OutfitItem.objects.annotate(rank_length=Length('rank')).filter(rank_length__gt=max_length)
+        .order_by().values_list('outfit_id', flat=True).distinct()
+    )
+    for outfit_id in outfit_ids:
+        with transaction.atomic():
+            Outfit.objects.select_for_update().filter(id=outfit_id).first()
+            rebalance_outfit(outfit_id)
+    return len(outfit_ids)
+
+
+def add_pieces_to_cart(outfit, user, quantities):
+    """
+    Put the chosen variants of an outfit's pieces in ``user``'s cart.
+
+    ``quantities`` maps variant ids to quantities. Every variant must be of a
+    product in the outfit; the cart upsert then checks stock for all of them
+    at once and adds nothing if any is short.
+    """
+    pieces = OutfitItem.objects.filter(outfit=outfit).values('product_id')
+    known = set(ProductVariant.objects.filter(id__in=list(quantities), product__in=pieces).values_list('id', flat=True))
+    foreign = sorted(set(quantities) - known)
+    if foreign:
+        raise ValidationError({'items': f"Not variants of this outfit's pieces: {', '.join(map(str, foreign))}"})
+    try:
+        return add_to_cart(user, quantities)
+    except DjangoValidationError as exc:
+        raise ValidationError({'items': exc.messages})
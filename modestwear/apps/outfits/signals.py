@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.catalog.models import Promotion
+from apps.outfits.feed import bump_feed_version
+from apps.outfits.models import Outfit, OutfitItem
+from apps.outfits.snapshots import outfits_with_promotions, schedule_snapshots
+
+@receiver(post_save, sender=Outfit)
+@receiver(post_delete, sender=Outfit)
+def invalidate_feed_for_outfit(sender, instance, raw=False, **kwargs):
+	# Publishing, unpublishing and edits to public outfits all change the feed
+	if raw:
+		return
+	if instance.is_public or getattr(instance, '_loaded_is_public', False):
+		transaction.on_commit(bump_feed_version)
+
+@receiver(post_save, sender=OutfitItem)
+@receiver(post_delete, sender=OutfitItem)
+def rebuild_snapshot_for_item(sender, instance, raw=False, **kwargs):
+	# The rebuild refreshes the feed once the new snapshot is written
+	if raw:
+		return
+	schedule_snapshots([instance.outfit_id])
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def reprice_snapshots_for_promotion(sender, instance, raw=False, **kwargs):
+	if raw:
+		return
+	schedule_snapshots(outfits_with_promotions([instance]))
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+
+from apps.catalog.models import Product, ProductImage, ProductVariant, Promotion
+from apps.catalog.pricing import price_products
+from apps.outfits.feed import bump_feed_version
+from apps.outfits.models import Outfit, OutfitItem
+
+# Bumped when the snapshot layout changes; older snapshots are rendered from live rows until rebuilt
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = 200
+
+
+def _thumbnail(product):
+    # Images are prefetched feature-first
+    images = product.images.all()
+    return images[0].get_thumbnail() if images else ''
+
+
+def _product_entry(product, price, in_stock):
+    return {
+        'id': product.id,
+        'category': product.category_id,
+        'name': product.name,
+        'slug': product.slug,
+        'get_absolute_url': product.get_absolute_url(),
+        'base_price': str(product.base_price),
+        'price': str(price),
+        'thumbnail': _thumbnail(product),
+        'in_stock': in_stock,
+    }
+
+
+def snapshot_items(outfit_ids):
+    """
+    ``{outfit_id: [item entries]}`` for the given outfits, read from the live rows.
+
+    Items are read for the whole batch at once, with their products,
+    categories, feature images and stock in one query plus one prefetch, and
+    priced together.
+    """
+    in_stock = ProductVariant.objects.filter(product=OuterRef('product'), is_active=True, stock_available__gt=0)
+    items = list(
+        OutfitItem.objects.filter(outfit_id__in=outfit_ids)
+        .select_related('product__category')
+        .annotate(product_in_stock=Exists(in_stock))
+        .prefetch_related(Prefetch('product__images', queryset=ProductImage.objects.order_by('-is_feature', 'id')))
+    )
+    prices = price_products({item.product_id: item.product for item in items}.values())
+
+    entries = {outfit_id: [] for outfit_id in outfit_ids}
+    for item in items:
+        entries[item.outfit_id].append({
+            'id': item.id,
+            'position': len(entries[item.outfit_id]),
+            'product': _product_entry(item.product, prices[item.product_id].unit_price, item.product_in_stock),
+        })
+    return entries
+
+
+def build_snapshots(outfit_ids):
+    """
+    Rebuild the ``snapshot`` of the given outfits.
+
+    Each batch locks its outfit rows before reading items, prices and stock
+    in the same transaction, so two rebuilds of one outfit write in turn and
+    the last one reflects the latest edit. Snapshots are written with
+    ``bulk_update`` so ``updated_at`` stays the owner's last edit. Returns
+    the number of outfits rebuilt; ids of deleted outfits are ignored.
+    """
+    outfit_ids = sorted(set(outfit_ids))
+    rebuilt = 0
+    for start in range(0, len(outfit_ids), SNAPSHOT_BATCH_SIZE):
+        batch = outfit_ids[start:start + SNAPSHOT_BATCH_SIZE]
+        with transaction.atomic():
+            outfits = list(
+                Outfit.objects.select_for_update().filter(id__in=batch).order_by('id').only('id', 'is_public')
+            )
+            entries = snapshot_items([outfit.id for outfit in outfits])
+            for outfit in outfits:
+                outfit.snapshot = {'version': SNAPSHOT_VERSION, 'items': entries[outfit.id]}
+            Outfit.objects.bulk_update(outfits, ['snapshot'])
+            if any(outfit.is_public for outfit in outfits):
+                transaction.on_commit(bump_feed_version)
+        rebuilt += len(outfits)
+    return rebuilt
+
+
+def outfits_with_products(product_ids=(), variant_ids=()):
+    """Ids of outfits containing any of the products, or the products of the variants"""
+    products = Q(product_id__in=list(product_ids))
+    if variant_ids:
+        products |= Q(product__variants__id__in=list(variant_ids))
+    return set(OutfitItem.objects.filter(products).values_list('outfit_id', flat=True).distinct())
+
+
+def schedule_snapshots(outfit_ids):
+    """Rebuild the snapshots on a worker once the current transaction commits"""
+    outfit_ids = sorted(set(outfit_ids))
+    if outfit_ids:
+        from apps.outfits.tasks import rebuild_outfit_snapshots
+        transaction.on_commit(lambda: rebuild_outfit_snapshots.delay(outfit_ids=outfit_ids))
+
+
+def promoted_products(promotions):
+    """Product filter covering every product a promotion applies to; a catalog-wide one covers all"""
+    scope = Q(pk__in=[])
+    for promotion in promotions:
+        if not promotion.product_id and not promotion.category_id:
+            return Q()
+        if promotion.product_id:
+            scope |= Q(pk=promotion.product_id)
+        if promotion.category_id:
+            scope |= Q(category_id=promotion.category_id)
+    return scope
+
+
+def outfits_with_promotions(promotions):
+    products = Product.objects.filter(promoted_products(promotions)).values('id')
+    return set(OutfitItem.objects.filter(product_id__in=products).values_list('outfit_id', flat=True).distinct())
+
+
+def promotions_changed_since(since, now=None):
+    """Promotions that started or ended in ``(since, now]``, so their prices moved without a save"""
+    now = now or timezone.now()
+    return Promotion.objects.filter(
+        Q(starts_at__gt=since, starts_at__lte=now) | Q(ends_at__gt=since, ends_at__lte=now)
+    )
+
+
+def refresh_promoted_snapshots(hours=1):
+    """Rebuild outfits whose prices changed because a promotion window opened or closed"""
+    # A little overlap so a late beat run never misses a boundary
+    since = timezone.now() - timedelta(hours=hours, minutes=5)
+    promotions = list(promotions_changed_since(since))
+    if not promotions:
+        return 0
+    return build_snapshots(outfits_with_promotions(promotions))
@@ -0,0 +1,74 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def build_product_complements():
+    """
+    Rebuild complete-the-look complements from outfit co-occurrence
+    Run nightly via Celery Beat
+    """
+    from apps.outfits.complements import build_complements
+
+    return f"Built {build_complements()} product complements"
+
+
+@shared_task
+def flush_outfit_engagement():
+    """
+    Flush buffered outfit views, likes and saves to the database
+    Run every 30 seconds via Celery Beat
+    """
+    from apps.outfits.engagement import flush_engagement
+
+    return f"Flushed engagement for {flush_engagement()} outfits"
+
+
+@shared_task
+def decay_outfit_trending():
+    """
+    Decay outfit trending scores
+    Run hourly via Celery Beat
+    """
+    from apps.outfits.engagement import decay_trending
+
+    return f"Decayed trending scores of {decay_trending(hours=1)} outfits"
+
+
+@shared_task
+def rebuild_outfit_snapshots(outfit_ids=(), product_ids=(), variant_ids=()):
+    """
+    Rebuild outfit snapshots
+    Outbox handler for product.changed and variant.restocked events, which
+    name products or variants; outfit edits name the outfits directly
+    """
+    from apps.outfits.snapshots import build_snapshots, outfits_with_products
+
+    outfit_ids = set(outfit_ids)
+    if product_ids or variant_ids:
+        outfit_ids |= outfits_with_products(product_ids, variant_ids)
+    return f"Rebuilt {build_snapshots(outfit_ids)} outfit snapshots"
+
+
+@shared_task
+def refresh_promoted_outfit_snapshots():
+    """
+    Reprice outfit snapshots whose promotions started or ended
+    Run hourly via Celery Beat
+    """
+    from apps.outfits.snapshots import refresh_promoted_snapshots
+
+    return f"Rebuilt {refresh_promoted_snapshots(hours=1)} outfit snapshots"
+
+
+@shared_task
+def rebalance_outfit_item_ranks():
+    """
+    Respread outfit item ranks grown long through repeated moves
+    Run daily via Celery Beat
+    """
+    from apps.outfits.services import rebalance_ranks
+
+    return f"Rebalanced item ranks of {rebalance_ranks()} outfits"
@@ -0,0 +1,675 @@
+import pytest
+import redis
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.catalog.models import Category, Product, ProductVariant, Promotion
+from apps.orders.models import CartItem
+from apps.outfits import engagement
+from apps.outfits.complements import build_complements, count_cooccurrences
+from apps.outfits.feed import with_totals
+from apps.outfits.models import Outfit, OutfitItem, ProductComplement
+from apps.outfits.ranking import rank_between, spread_ranks
+from apps.outfits.services import rebalance_ranks
+from apps.outfits.snapshots import build_snapshots
+from apps.orders.outbox import dispatch_pending
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def wardrobe(category, coverage_level):
+    """A few products to build outfits from"""
+    return [
+        Product.objects.create(
+            category=category, name=f'Piece {i}', slug=f'piece-{i}', base_price=Decimal('30.00'),
+            product_size=coverage_level,
+        )
+        for i in range(3)
+    ]
+
+
+def _outfits(user, products, count, is_public=True):
+    outfits = []
+    for i in range(count):
+        outfit = Outfit.objects.create(user=user, name=f'Look {i}', is_public=is_public)
+        OutfitItem.objects.bulk_create(
+            OutfitItem(outfit=outfit, product=product, rank=rank) for product, rank in zip(products, spread_ranks(len(products)))
+        )
+        outfits.append(outfit)
+    build_snapshots(outfit.id for outfit in outfits)
+    return outfits
+
+
+@pytest.mark.api
+class TestPublicOutfitFeed:
+    """Test the paginated, cached public outfit feed"""
+
+    def test_paginates_newest_first(self, api_client, user, wardrobe, locmem_cache):
+        """Test the feed walks every public outfit once via the next cursor"""
+        outfits = _outfits(user, wardrobe, 5)
+        _outfits(user, wardrobe, 2, is_public=False)
+
+        url, seen = reverse('outfits:public-outfits') + '?page_size=2', []
+        while url:
+            response = api_client.get(url)
+            seen.extend(o['id'] for o in response.data['results'])
+            url = response.data['next']
+
+        assert seen == sorted((o.id for o in outfits), reverse=True)
+        assert response.data['results'][0]['items_count'] == 3
+
+    def test_constant_query_count(self, api_client, user, wardrobe, locmem_cache):
+        """Test items, products and categories do not add queries per outfit"""
+        url = reverse('outfits:public-outfits')
+        _outfits(user, wardrobe, 1)
+        with CaptureQueriesContext(connection) as small:
+            api_client.get(url)
+        _outfits(user, wardrobe, 10)
+        locmem_cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            api_client.get(url)
+
+        assert len(large) == len(small)
+
+    def test_cached_page_needs_no_queries(self, api_client, user, wardrobe, locmem_cache, django_assert_num_queries):
+        """Test a repeated page is served from the cache"""
+        _outfits(user, wardrobe, 2)
+        url = reverse('outfits:public-outfits')
+        first = api_client.get(url)
+
+        with django_assert_num_queries(0):
+            second = api_client.get(url)
+        assert second.data == first.data
+
+    def test_publish_and_unpublish_refresh_feed(self, api_client, user, wardrobe, locmem_cache, django_capture_on_commit_callbacks):
+        """Test publishing or unpublishing an outfit invalidates cached pages"""
+        url = reverse('outfits:public-outfits')
+        draft = _outfits(user, wardrobe, 1, is_public=False)[0]
+        assert api_client.get(url).data['results'] == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            draft.is_public = True
+            draft.save()
+        assert [o['id'] for o in api_client.get(url).data['results']] == [draft.id]
+
+        published = Outfit.objects.get(id=draft.id)
+        with django_capture_on_commit_callbacks(execute=True):
+            published.is_public = False
+            published.save()
+        assert api_client.get(url).data['results'] == []
+
+
+@pytest.mark.api
+class TestOutfitItemChanges:
+    """Test bulk outfit creation and the bulk item endpoint"""
+
+    def test_create_validates_and_returns_hydrated_outfit(self, authenticated_client, wardrobe):
+        """Test creating an outfit with items returns it with its items"""
+        items = [{'product_id': product.id, 'position': i} for i, product in enumerate(wardrobe)]
+        response = authenticated_client.post(
+            reverse('outfits:outfit-list-create'), {'name': 'Eid', 'is_public': True, 'items': items}, format='json'
+        )
+
+        assert response.status_code == 201
+        assert response.data['items_count'] == 3
+        assert [item['product']['name'] for item in response.data['items']] == ['Piece 0', 'Piece 1', 'Piece 2']
+
+    def test_create_query_count_independent_of_items(self, authenticated_client, wardrobe):
+        """Test item validation and inserts do not issue a query per item"""
+        url = reverse('outfits:outfit-list-create')
+        with CaptureQueriesContext(connection) as one:
+            authenticated_client.post(url, {'name': 'One', 'items': [{'product_id': wardrobe[0].id}]}, format='json')
+        with CaptureQueriesContext(connection) as three:
+            authenticated_client.post(
+                url, {'name': 'Three', 'items': [{'product_id': p.id} for p in wardrobe]}, format='json'
+            )
+
+        assert len(three) == len(one)
+
+    def test_create_rejects_unknown_products(self, authenticated_client, wardrobe):
+        """Test unknown or duplicate product ids fail before anything is written"""
+        url = reverse('outfits:outfit-list-create')
+        unknown = authenticated_client.post(
+            url, {'name': 'Bad', 'items': [{'product_id': wardrobe[0].id}, {'product_id': 999999}]}, format='json'
+        )
+        duplicate = authenticated_client.post(
+            url, {'name': 'Bad', 'items': [{'product_id': wardrobe[0].id}] * 2}, format='json'
+        )
+
+        assert unknown.status_code == duplicate.status_code == 400
+        assert '999999' in str(unknown.data)
+        assert not Outfit.objects.exists()
+
+    def test_add_remove_and_reorder_in_one_request(self, authenticated_client, user, wardrobe):
+        """Test one request applies removals, additions and moves"""
+        outfit = Outfit.objects.create(user=user, name='Work')
+        OutfitItem.objects.bulk_create([
+            OutfitItem(outfit=outfit, product=wardrobe[0], rank='a'),
+            OutfitItem(outfit=outfit, product=wardrobe[1], rank='b'),
+        ])
+
+        response = authenticated_client.post(
+            reverse('outfits:change-items', kwargs={'outfit_id': outfit.id}),
+            {
+                'remove': [wardrobe[0].id],
+                'add': [{'product_id': wardrobe[2].id, 'position': 0}],
+                'reorder': [{'product_id': wardrobe[1].id, 'position': 1}, {'product_id': wardrobe[2].id, 'position': 0}],
+            },
+            format='json',
+        )
+
+        assert response.status_code == 200
+        assert [item['product']['name'] for item in response.data['items']] == ['Piece 2', 'Piece 1']
+
+    def test_invalid_change_is_rolled_back(self, authenticated_client, user, wardrobe):
+        """Test a rejected change leaves the outfit untouched"""
+        outfit = Outfit.objects.create(user=user, name='Work')
+        OutfitItem.objects.create(outfit=outfit, product=wardrobe[0])
+        OutfitItem.objects.create(outfit=outfit, product=wardrobe[1])
+
+        response = authenticated_client.post(
+            reverse('outfits:change-items', kwargs={'outfit_id': outfit.id}),
+            {'remove': [wardrobe[0].id], 'add': [{'product_id': wardrobe[1].id}]},
+            format='json',
+        )
+
+        assert response.status_code == 400
+        assert outfit.items.count() == 2
+
+    def test_other_users_outfit_not_found(self, authenticated_client, admin_user, wardrobe):
+        """Test users can only change their own outfits"""
+        outfit = Outfit.objects.create(user=admin_user, name='Not mine')
+        response = authenticated_client.post(
+            reverse('outfits:change-items', kwargs={'outfit_id': outfit.id}), {'remove': [wardrobe[0].id]}, format='json'
+        )
+        assert response.status_code == 404
+
+
+@pytest.mark.api
+class TestCompleteTheLook:
+    """Test mining complements from outfits and suggesting missing pieces"""
+
+    @pytest.fixture
+    def looks(self, user, category, coverage_level):
+        def product(name, cat):
+            return Product.objects.create(
+                category=cat, name=name, slug=name.lower().replace(' ', '-'), base_price=Decimal('40.00'),
+                product_size=coverage_level,
+            )
+        cardigans = Category.objects.create(name='Cardigans', slug='cardigans')
+        shoes = Category.objects.create(name='Shoes', slug='shoes')
+        pieces = {
+            'dress': product('Maxi Dress', category),
+            'other_dress': product('Wrap Dress', category),
+            'cardigan': product('Long Cardigan', cardigans),
+            'shoes': product('Flats', shoes),
+        }
+        for names in (('dress', 'cardigan', 'shoes'), ('dress', 'cardigan'), ('dress', 'other_dress', 'cardigan'), ('other_dress', 'shoes')):
+            outfit = Outfit.objects.create(user=user, name='+'.join(names), is_public=True)
+            OutfitItem.objects.bulk_create(OutfitItem(outfit=outfit, product=pieces[name]) for name in names)
+        return pieces
+
+    def test_counts_only_cross_category_pairs(self, looks):
+        """Test dresses never pair with dresses"""
+        rows = OutfitItem.objects.order_by('outfit_id').values_list('outfit_id', 'product_id', 'product__category_id')
+        pairs, products = count_cooccurrences(rows)
+
+        dress, other, cardigan = looks['dress'].id, looks['other_dress'].id, looks['cardigan'].id
+        assert pairs[min(dress, cardigan), max(dress, cardigan)] == 3
+        assert (min(dress, other), max(dress, other)) not in pairs
+        assert products[dress] == 3
+
+    def test_build_keeps_pairs_seen_often_enough(self, looks):
+        """Test only pairs styled together min_count times are stored, in both directions"""
+        written = build_complements(top_k=5, min_count=2)
+
+        assert written == 2
+        assert list(ProductComplement.objects.values_list('product_id', 'complement_id', 'rank', 'co_occurrences')) == sorted([
+            (looks['dress'].id, looks['cardigan'].id, 0, 3),
+            (looks['cardigan'].id, looks['dress'].id, 0, 3),
+        ])
+
+    def test_suggests_missing_categories(self, api_client, user, looks):
+        """Test the endpoint suggests complements from categories the outfit lacks"""
+        build_complements(top_k=5, min_count=1)
+        outfit = Outfit.objects.create(user=user, name='Just a dress', is_public=True)
+        OutfitItem.objects.create(outfit=outfit, product=looks['dress'])
+
+        response = api_client.get(reverse('outfits:complete-outfit', kwargs={'outfit_id': outfit.id}))
+
+        names = [suggestion['product']['name'] for suggestion in response.data['suggestions']]
+        assert names == ['Long Cardigan', 'Flats']
+        assert response.data['suggestions'][0]['pairs_with'] == [looks['dress'].id]
+
+        OutfitItem.objects.create(outfit=outfit, product=looks['cardigan'])
+        response = api_client.get(reverse('outfits:complete-outfit', kwargs={'outfit_id': outfit.id}))
+        assert [s['product']['name'] for s in response.data['suggestions']] == ['Flats']
+
+    def test_private_outfits_of_others_are_hidden(self, api_client, admin_user):
+        """Test private outfits are only completed for their owner"""
+        outfit = Outfit.objects.create(user=admin_user, name='Private')
+        response = api_client.get(reverse('outfits:complete-outfit', kwargs={'outfit_id': outfit.id}))
+        assert response.status_code == 404
+
+
+def _redis_available():
+    try:
+        return redis.Redis.from_url(settings.CACHES['default']['LOCATION'], socket_connect_timeout=1).ping()
+    except (redis.RedisError, KeyError):
+        return False
+
+
+@pytest.mark.api
+class TestOutfitEngagement:
+    """Test engagement counters, their buffering and the ranked feed"""
+
+    def test_views_without_redis_write_through(self, api_client, user, locmem_cache):
+        """Test views still count when there is no Redis buffer"""
+        outfit = Outfit.objects.create(user=user, name='Eid', is_public=True)
+        url = reverse('outfits:record-view', kwargs={'outfit_id': outfit.id})
+
+        assert api_client.post(url).status_code == 204
+        api_client.post(url)
+
+        outfit.refresh_from_db()
+        assert (outfit.views_count, outfit.unique_viewers, outfit.popularity_score) == (2, 2, 2)
+        assert outfit.trending_score == 2
+
+    def test_private_outfit_views_not_counted(self, api_client, admin_user, locmem_cache):
+        """Test views of outfits the caller cannot see are rejected"""
+        outfit = Outfit.objects.create(user=admin_user, name='Private')
+        response = api_client.post(reverse('outfits:record-view', kwargs={'outfit_id': outfit.id}))
+        assert response.status_code == 404
+
+    def test_like_is_once_per_user_and_reversible(self, authenticated_client, admin_user, locmem_cache):
+        """Test liking twice counts once and unliking takes it back"""
+        outfit = Outfit.objects.create(user=admin_user, name='Eid', is_public=True)
+        url = reverse('outfits:like', kwargs={'outfit_id': outfit.id})
+
+        assert authenticated_client.post(url).status_code == 201
+        assert authenticated_client.post(url).status_code == 200
+        outfit.refresh_from_db()
+        assert (outfit.likes_count, outfit.popularity_score) == (1, 3)
+
+        assert authenticated_client.delete(url).status_code == 204
+        outfit.refresh_from_db()
+        assert (outfit.likes_count, outfit.popularity_score) == (0, 0)
+
+    def test_unique_viewers_never_go_down(self, user):
+        """Test a smaller HyperLogLog count (e.g. after a Redis restart) keeps the stored value"""
+        outfit = Outfit.objects.create(user=user, name='Eid', is_public=True, unique_viewers=10)
+        engagement.apply_engagement({outfit.id: {'views': 1}}, unique_viewers={outfit.id: 3})
+
+        outfit.refresh_from_db()
+        assert (outfit.views_count, outfit.unique_viewers) == (1, 10)
+
+    def test_feed_orderings(self, api_client, user, locmem_cache):
+        """Test the feed sorts by popularity or trending on request"""
+        quiet = Outfit.objects.create(user=user, name='Quiet', is_public=True, popularity_score=1, trending_score=9)
+        loved = Outfit.objects.create(user=user, name='Loved', is_public=True, popularity_score=50, trending_score=2)
+        url = reverse('outfits:public-outfits')
+
+        popular = api_client.get(url, {'ordering': 'popular'}).data['results']
+        trending = api_client.get(url, {'ordering': 'trending'}).data['results']
+
+        assert [o['id'] for o in popular] == [loved.id, quiet.id]
+        assert [o['id'] for o in trending] == [quiet.id, loved.id]
+        assert api_client.get(url, {'ordering': 'random'}).status_code == 400
+
+    def test_trending_decays_by_half_life(self, user, settings):
+        """Test one half-life of decay halves trending scores"""
+        settings.OUTFIT_TRENDING_HALF_LIFE_HOURS = 24
+        outfit = Outfit.objects.create(user=user, name='Eid', trending_score=8)
+
+        engagement.decay_trending(hours=24)
+
+        outfit.refresh_from_db()
+        assert outfit.trending_score == pytest.approx(4)
+
+    def test_flush_requeues_outfits_when_reading_fails(self, monkeypatch):
+        """Test outfits popped from the dirty set go back when their counters cannot be read"""
+        class FailingPipeline:
+            def __getattr__(self, name):
+                return lambda *args: None
+
+            def execute(self):
+                raise redis.ConnectionError('lost')
+
+        class Client:
+            dirty = {b'7', b'8'}
+
+            def spop(self, key, count):
+                popped, self.dirty = self.dirty, set()
+                return list(popped)
+
+            def pipeline(self, transaction=True):
+                return FailingPipeline()
+
+            def sadd(self, key, *ids):
+                self.dirty |= {str(outfit_id).encode() for outfit_id in ids}
+
+        client = Client()
+        monkeypatch.setattr(engagement, '_redis', lambda: client)
+
+        with pytest.raises(redis.ConnectionError):
+            engagement.flush_engagement()
+        assert client.dirty == {b'7', b'8'}
+
+    @pytest.mark.skipif(not _redis_available(), reason='Needs a reachable Redis')
+    def test_redis_buffers_until_flush(self, user, settings):
+        """Test views are buffered in Redis and applied by the flush, with the viewer sketch expiring"""
+        settings.OUTFIT_VIEWERS_TTL = 3600
+        outfit = Outfit.objects.create(user=user, name='Eid', is_public=True)
+        client = engagement._redis()
+        try:
+            for viewer in ('a', 'b', 'a'):
+                engagement.record(outfit.id, views=1, viewer=viewer)
+            outfit.refresh_from_db()
+            assert outfit.views_count == 0
+            assert 0 < client.ttl(engagement.VIEWERS_KEY.format(outfit.id)) <= 3600
+
+            assert engagement.flush_engagement() >= 1
+            outfit.refresh_from_db()
+            assert (outfit.views_count, outfit.unique_viewers) == (3, 2)
+        finally:
+            client.delete(engagement.COUNTERS_KEY.format(outfit.id), engagement.VIEWERS_KEY.format(outfit.id))
+            client.srem(engagement.DIRTY_KEY, outfit.id)
+
+
+@pytest.mark.api
+class TestOutfitSnapshots:
+    """Test outfits render from their denormalized snapshot and stay in step with the catalog"""
+
+    def test_feed_page_is_one_query(self, api_client, user, wardrobe, locmem_cache, django_assert_num_queries):
+        """Test a feed page reads only outfit rows"""
+        _outfits(user, wardrobe, 5)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse('outfits:public-outfits'))
+
+        item = response.data['results'][0]['items'][0]
+        assert item['product']['name'] == 'Piece 0'
+        assert item['product']['price'] == '30.00'
+        assert item['product']['in_stock'] is False
+
+    def test_detail_reads_only_the_outfit(self, authenticated_client, user, wardrobe, django_assert_num_queries):
+        """Test the detail view needs the user and the outfit row, nothing per item"""
+        outfit = _outfits(user, wardrobe, 1)[0]
+
+        with django_assert_num_queries(2):
+            response = authenticated_client.get(reverse('outfits:outfit-detail', kwargs={'pk': outfit.id}))
+        assert response.data['items_count'] == 3
+
+    def test_product_change_rebuilds_snapshot(self, user, wardrobe, coverage_level, django_capture_on_commit_callbacks):
+        """Test renames and stock changes reach the snapshot through the outbox"""
+        variant = ProductVariant.objects.create(
+            product=wardrobe[0], sku='P0-M', color='Navy', coverage=coverage_level, stock_available=1, is_active=True,
+        )
+        outfit = _outfits(user, wardrobe, 1)[0]
+        outfit.refresh_from_db()
+        assert outfit.snapshot['items'][0]['product']['in_stock'] is True
+
+        wardrobe[0].name = 'Renamed'
+        wardrobe[0].save()
+        variant.stock_available = 0
+        variant.save()
+        dispatch_pending()
+
+        outfit.refresh_from_db()
+        product = outfit.snapshot['items'][0]['product']
+        assert (product['name'], product['in_stock']) == ('Renamed', False)
+
+    def test_promotion_reprices_snapshot(self, user, wardrobe, django_capture_on_commit_callbacks):
+        """Test saving a promotion reprices the outfits holding its products"""
+        outfit = _outfits(user, wardrobe, 1)[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Promotion.objects.create(name='Sale', product=wardrobe[1], percent_off=Decimal('50'))
+
+        outfit.refresh_from_db()
+        assert [item['product']['price'] for item in outfit.snapshot['items']] == ['30.00', '15.00', '30.00']
+
+    def test_item_change_schedules_rebuild(self, user, wardrobe, django_capture_on_commit_callbacks):
+        """Test adding a single item rebuilds the snapshot after commit"""
+        outfit = _outfits(user, wardrobe[:1], 1)[0]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            OutfitItem.objects.create(outfit=outfit, product=wardrobe[2])
+
+        outfit.refresh_from_db()
+        assert [item['product']['name'] for item in outfit.snapshot['items']] == ['Piece 0', 'Piece 2']
+
+    def test_stale_snapshot_renders_live(self, authenticated_client, user, wardrobe):
+        """Test outfits without a current snapshot show their items in the snapshot's shape, read once"""
+        outfit = _outfits(user, wardrobe, 1)[0]
+        outfit.refresh_from_db()
+        current = outfit.snapshot['items']
+        Outfit.objects.filter(id=outfit.id).update(snapshot={})
+        url = reverse('outfits:outfit-detail', kwargs={'pk': outfit.id})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(url)
+        assert response.data['items_count'] == 3
+        assert response.data['items'] == current
+        item_reads = [query for query in queries.captured_queries if 'FROM "outfits_outfititem" INNER JOIN' in query['sql']]
+        assert len(item_reads) == 1
+
+    def test_save_keeps_background_fields(self, user):
+        """Test saving an outfit does not overwrite counters and snapshots written meanwhile"""
+        outfit = Outfit.objects.create(user=user, name='Eid')
+        Outfit.objects.filter(id=outfit.id).update(views_count=7, snapshot={'version': 0})
+
+        outfit.name = 'Eid al-Fitr'
+        outfit.save()
+
+        outfit.refresh_from_db()
+        assert (outfit.name, outfit.views_count, outfit.snapshot) == ('Eid al-Fitr', 7, {'version': 0})
+
+
+@pytest.mark.api
+class TestOutfitTotals:
+    """Test outfit totals and availability annotated in the database"""
+
+    @pytest.fixture
+    def stocked(self, wardrobe, coverage_level):
+        """Stock per product: 4 (across two variants), 2 and none"""
+        for sku, product, units in (('P0-S', 0, 3), ('P0-M', 0, 1), ('P1-S', 1, 2), ('P2-S', 2, 0)):
+            ProductVariant.objects.create(
+                product=wardrobe[product], sku=sku, color='Navy', coverage=coverage_level,
+                stock_available=units, is_active=True,
+            )
+        ProductVariant.objects.create(
+            product=wardrobe[2], sku='P2-M', color='Navy', coverage=coverage_level, stock_available=9, is_active=False,
+        )
+        return wardrobe
+
+    def test_annotations(self, user, stocked):
+        """Test totals sum list prices and stock counts only active variants"""
+        full = _outfits(user, stocked, 1)[0]
+        buyable = _outfits(user, stocked[:2], 1)[0]
+        empty = Outfit.objects.create(user=user, name='Empty')
+
+        rows = with_totals(Outfit.objects.all()).in_bulk([full.id, buyable.id, empty.id])
+
+        assert (rows[full.id].total_price, rows[full.id].min_stock, rows[full.id].all_in_stock) == (Decimal('90.00'), 0, False)
+        assert (rows[buyable.id].total_price, rows[buyable.id].min_stock, rows[buyable.id].all_in_stock) == (Decimal('60.00'), 2, True)
+        assert (rows[empty.id].total_price, rows[empty.id].all_in_stock) == (Decimal('0.00'), False)
+
+    def test_feed_filters_and_sorts(self, api_client, user, stocked, locmem_cache):
+        """Test the feed filters on availability and price and pages through by total"""
+        full = _outfits(user, stocked, 1)[0]
+        buyable = _outfits(user, stocked[:2], 1)[0]
+        single = _outfits(user, stocked[1:2], 1)[0]
+        url = reverse('outfits:public-outfits')
+
+        in_stock = api_client.get(url, {'in_stock': 'true'}).data['results']
+        assert {o['id'] for o in in_stock} == {buyable.id, single.id}
+        assert in_stock[0]['all_in_stock'] is True
+
+        bounded = api_client.get(url, {'min_price': '40', 'max_price': '60'}).data['results']
+        assert [o['id'] for o in bounded] == [buyable.id]
+
+        seen, params = [], {'ordering': 'price_desc', 'page_size': 1}
+        response = api_client.get(url, params)
+        while True:
+            seen.extend(o['id'] for o in response.data['results'])
+            if not response.data['next']:
+                break
+            response = api_client.get(response.data['next'])
+        assert seen == [full.id, buyable.id, single.id]
+
+    def test_rejects_bad_price(self, api_client, locmem_cache):
+        """Test non-numeric price bounds are a 400"""
+        url = reverse('outfits:public-outfits')
+        assert api_client.get(url, {'min_price': 'cheap'}).status_code == 400
+        assert api_client.get(url, {'max_price': 'NaN'}).status_code == 400
+
+    def test_detail_includes_totals(self, authenticated_client, user, stocked):
+        """Test the owner's views carry the totals too"""
+        outfit = _outfits(user, stocked[:2], 1)[0]
+        response = authenticated_client.get(reverse('outfits:outfit-detail', kwargs={'pk': outfit.id}))
+        assert (response.data['total_price'], response.data['min_stock']) == ('60.00', 2)
+
+
+@pytest.mark.api
+class TestAddOutfitToCart:
+    """Test adding a whole outfit to the cart in one request"""
+
+    @pytest.fixture
+    def sized(self, wardrobe, coverage_level):
+        """One variant per piece, 3 in stock each"""
+        return [
+            ProductVariant.objects.create(
+                product=product, sku=f'P{i}-M', color='Navy', coverage=coverage_level, stock_available=3, is_active=True,
+            )
+            for i, product in enumerate(wardrobe)
+        ]
+
+    def _add(self, client, outfit, items):
+        return client.post(reverse('outfits:add-to-cart', kwargs={'outfit_id': outfit.id}), {'items': items}, format='json')
+
+    def test_inserts_new_and_increments_existing(self, authenticated_client, user, admin_user, wardrobe, sized):
+        """Test pieces already in the cart gain quantity and the rest are added"""
+        outfit = _outfits(admin_user, wardrobe, 1)[0]
+        CartItem.objects.create(user=user, variant=sized[0], quantity=1)
+
+        response = self._add(authenticated_client, outfit, [
+            {'variant_id': sized[0].id, 'quantity': 2}, {'variant_id': sized[1].id},
+        ])
+
+        assert response.status_code == 201
+        assert {item['variant']: item['quantity'] for item in response.data} == {sized[0].id: 3, sized[1].id: 1}
+        assert CartItem.objects.filter(user=user).count() == 2
+
+    def test_short_stock_adds_nothing(self, authenticated_client, user, wardrobe, sized):
+        """Test one short piece rejects the whole request, counting what is already in the cart"""
+        outfit = _outfits(user, wardrobe, 1)[0]
+        CartItem.objects.create(user=user, variant=sized[1], quantity=2)
+
+        response = self._add(authenticated_client, outfit, [
+            {'variant_id': sized[0].id}, {'variant_id': sized[1].id, 'quantity': 2},
+        ])
+
+        assert response.status_code == 400
+        assert list(CartItem.objects.filter(user=user).values_list('variant_id', 'quantity')) == [(sized[1].id, 2)]
+
+    def test_rejects_variants_of_other_products(self, authenticated_client, user, wardrobe, sized):
+        """Test only variants of the outfit's pieces can be added"""
+        outfit = _outfits(user, wardrobe[:1], 1)[0]
+
+        response = self._add(authenticated_client, outfit, [{'variant_id': sized[2].id}])
+
+        assert response.status_code == 400
+        assert not CartItem.objects.exists()
+
+    def test_private_outfit_of_others_not_found(self, authenticated_client, admin_user, wardrobe, sized):
+        """Test other users' private outfits cannot be bought from"""
+        outfit = _outfits(admin_user, wardrobe, 1, is_public=False)[0]
+        assert self._add(authenticated_client, outfit, [{'variant_id': sized[0].id}]).status_code == 404
+
+    def test_query_count_independent_of_pieces(self, authenticated_client, user, wardrobe, sized):
+        """Test stock checks and upserts do not issue a query per piece"""
+        one, three = _outfits(user, wardrobe[:1], 1)[0], _outfits(user, wardrobe, 1)[0]
+        with CaptureQueriesContext(connection) as single:
+            self._add(authenticated_client, one, [{'variant_id': sized[0].id}])
+        CartItem.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self._add(authenticated_client, three, [{'variant_id': variant.id} for variant in sized])
+
+        assert len(many) == len(single)
+
+
+@pytest.mark.api
+class TestItemRanks:
+    """Test fractional ranks keep item order with single-row moves"""
+
+    def _names(self, outfit):
+        return list(outfit.items.values_list('product__name', flat=True))
+
+    def _move(self, client, item, after):
+        url = reverse('outfits:move-item', kwargs={'outfit_id': item.outfit_id, 'item_id': item.id})
+        return client.post(url, {'after': after.id if after else None}, format='json')
+
+    def test_rank_between_always_fits(self):
+        """Test repeated inserts into one gap stay strictly ordered"""
+        low, high = 'a', 'b'
+        for _ in range(50):
+            middle = rank_between(low, high)
+            assert low < middle < high and not middle.endswith('0')
+            high = middle
+        assert spread_ranks(40) == sorted(spread_ranks(40))
+
+    def test_move_writes_one_row(self, authenticated_client, user, wardrobe):
+        """Test a move updates only the moved item and changes the order"""
+        outfit = _outfits(user, wardrobe, 1)[0]
+        first, _, last = outfit.items.all()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._move(authenticated_client, last, first)
+
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "outfits_outfititem"')]
+        assert response.status_code == 200
+        assert response.data['position'] == 1
+        assert len(writes) == 1
+        assert self._names(outfit) == ['Piece 0', 'Piece 2', 'Piece 1']
+
+        assert self._move(authenticated_client, last, None).status_code == 200
+        assert self._names(outfit) == ['Piece 2', 'Piece 0', 'Piece 1']
+
+    def test_move_after_foreign_item_rejected(self, authenticated_client, user, wardrobe):
+        """Test the anchor must be another item of the same outfit"""
+        outfit, other = _outfits(user, wardrobe, 2)
+        item = outfit.items.first()
+
+        assert self._move(authenticated_client, item, item).status_code == 400
+        assert self._move(authenticated_client, item, other.items.first()).status_code == 400
+
+    def test_add_item_at_position(self, authenticated_client, user, wardrobe):
+        """Test single adds go to the given index, or last without one"""
+        outfit = _outfits(user, wardrobe[:1], 1)[0]
+        url = reverse('outfits:add-item', kwargs={'outfit_id': outfit.id})
+
+        authenticated_client.post(url, {'product_id': wardrobe[1].id}, format='json')
+        response = authenticated_client.post(url, {'product_id': wardrobe[2].id, 'position': 0}, format='json')
+
+        assert response.data['position'] == 0
+        assert self._names(outfit) == ['Piece 2', 'Piece 0', 'Piece 1']
+
+    def test_rebalance_shortens_long_ranks(self, authenticated_client, user, wardrobe, settings):
+        """Test the background pass respreads grown ranks without changing the order"""
+        settings.OUTFIT_RANK_REBALANCE_LENGTH = 8
+        outfit = _outfits(user, wardrobe, 1)[0]
+        first, middle, last = outfit.items.all()
+        for _ in range(30):
+            # Keep pushing into the gap right after the first item
+            self._move(authenticated_client, last, first)
+            self._move(authenticated_client, middle, first)
+        before = self._names(outfit)
+        assert max(len(rank) for rank in outfit.items.values_list('rank', flat=True)) > 8
+
+        assert rebalance_ranks() == 1
+        assert self._names(outfit) == before
+        assert max(len(rank) for rank in outfit.items.values_list('rank', flat=True)) <= 2
@@ -40,8 +40,7 @@ class OutfitModelTest(TestCase):
         )
         outfit_item = OutfitItem.objects.create(
             outfit=outfit,
-            product=self.product,
-            position=1
+            product=self.product
         )
         self.assertEqual(str(outfit_item), "Test Outfit - Test Dress")
 
@@ -4,6 +4,12 @@ from .api.views import (
     OutfitDetailView,
     PublicOutfitListView,
     add_item_to_outfit,
+    add_outfit_to_cart,
+    change_outfit_items,
+    complete_outfit,
+    move_outfit_item,
+    react_to_outfit,
+    record_outfit_view,
     remove_item_from_outfit
 )
 
@@ -13,6 +19,13 @@ urlpatterns = [
     path('', OutfitListCreateView.as_view(), name='outfit-list-create'),
     path('<int:pk>/', OutfitDetailView.as_view(), name='outfit-detail'),
     path('public/', PublicOutfitListView.as_view(), name='public-outfits'),
+    path('<int:outfit_id>/view/', record_outfit_view, name='record-view'),
+    path('<int:outfit_id>/like/', react_to_outfit, {'kind': 'like'}, name='like'),
+    path('<int:outfit_id>/save/', react_to_outfit, {'kind': 'save'}, name='save'),
+    path('<int:outfit_id>/complete/', complete_outfit, name='complete-outfit'),
+    path('<int:outfit_id>/add-to-cart/', add_outfit_to_cart, name='add-to-cart'),
     path('<int:outfit_id>/items/', add_item_to_outfit, name='add-item'),
+    path('<int:outfit_id>/items/bulk/', change_outfit_items, name='change-items'),
     path('<int:outfit_id>/items/<int:item_id>/', remove_item_from_outfit, name='remove-item'),
+    path('<int:outfit_id>/items/<int:item_id>/move/', move_outfit_item, name='move-item'),
 ]
\ No newline at end of file
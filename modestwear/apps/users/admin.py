@@ -4,6 +4,7 @@ from django.utils.html import format_html
 from django.db.models import Count, Sum
 from django.urls import reverse
 from .models import User
+from core.exports import export_action
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -12,7 +13,7 @@ class UserAdmin(BaseUserAdmin):
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
     search_fields = ('email', 'first_name', 'last_name', 'phone_number')
     list_per_page = 25
-    actions = ['activate_users', 'deactivate_users']
+    actions = ['activate_users', 'deactivate_users', export_action('users', 'csv'), export_action('users', 'ndjson')]
     
     # Required for custom user models without 'username'
     fieldsets = (
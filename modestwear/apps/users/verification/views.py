@@ -10,6 +10,7 @@ from apps.users.core_auth.base_view import BaseAPIView
 from apps.users.core_auth.response import standardized_response
 from apps.users.verification.services import EmailVerificationService, User
 from apps.users.verification.password_reset_service import PasswordResetService
+from core.idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +64,7 @@ class SendVerificationEmailView(BaseAPIView):
 	permission_classes = [IsAuthenticated]
 	throttle_classes = [UserRateThrottle]
 
+	@idempotent
 	def post(self, request):
 		try:
 			# Use service layer for sending verification email
@@ -122,6 +124,7 @@ class PasswordResetView(BaseAPIView):
 	permission_classes = [AllowAny]
 	throttle_classes = [AnonRateThrottle]
 
+	@idempotent
 	def post(self, request):
 		try:
 			email = request.data.get('email')
@@ -14,6 +14,20 @@ def api_client():
     return APIClient()
 
 
+@pytest.fixture
+def locmem_cache(settings):
+    """Swap the Redis cache for an isolated in-memory cache"""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'modestwear-tests',
+        }
+    }
+    from django.core.cache import cache
+    cache.clear()
+    return cache
+
+
 @pytest.fixture
 def user(db):
     """Create and return a test user"""
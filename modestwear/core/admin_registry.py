@@ -4,16 +4,16 @@ from core.admin import admin_site
 # Import all admin classes
 from apps.catalog.admin import (
     ProductAdmin, CategoryAdmin, CoverageLevelAdmin, 
-    ProductVariantAdmin, ProductImageAdmin
+    ProductVariantAdmin, ProductImageAdmin, PromotionAdmin
 )
 from apps.users.admin import UserAdmin
-from apps.orders.admin import OrderAdmin, OrderItemAdmin, CartItemAdmin, WishListAdmin
+from apps.orders.admin import OrderAdmin, OrderItemAdmin, CartItemAdmin, WishListAdmin, OutboxEventAdmin, BulkOrderJobAdmin, ArchivedOrderAdmin, CouponAdmin
 from apps.outfits.admin import OutfitAdmin, OutfitItemAdmin
 
 # Import models
-from apps.catalog.models import Product, Category, CoverageLevel, ProductVariant, ProductImage
+from apps.catalog.models import Product, Category, CoverageLevel, ProductVariant, ProductImage, Promotion
 from apps.users.models import User
-from apps.orders.models import Order, OrderItem, CartItem, WishList
+from apps.orders.models import Order, OrderItem, CartItem, WishList, OutboxEvent, BulkOrderJob, ArchivedOrder, Coupon
 from apps.outfits.models import Outfit, OutfitItem
 
 # Unregister from default admin first
@@ -29,6 +29,7 @@ admin_site.register(Category, CategoryAdmin)
 admin_site.register(CoverageLevel, CoverageLevelAdmin)
 admin_site.register(ProductVariant, ProductVariantAdmin)
 admin_site.register(ProductImage, ProductImageAdmin)
+admin_site.register(Promotion, PromotionAdmin)
 
 admin_site.register(User, UserAdmin)
 
@@ -36,6 +37,10 @@ admin_site.register(Order, OrderAdmin)
 admin_site.register(OrderItem, OrderItemAdmin)
 admin_site.register(CartItem, CartItemAdmin)
 admin_site.register(WishList, WishListAdmin)
+admin_site.register(OutboxEvent, OutboxEventAdmin)
+admin_site.register(BulkOrderJob, BulkOrderJobAdmin)
+admin_site.register(ArchivedOrder, ArchivedOrderAdmin)
+admin_site.register(Coupon, CouponAdmin)
 
 admin_site.register(Outfit, OutfitAdmin)
 admin_site.register(OutfitItem, OutfitItemAdmin)
\ No newline at end of file
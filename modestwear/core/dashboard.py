@@ -0,0 +1,143 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product, ProductVariant
+from apps.orders import analytics
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_KEY = 'admin_dashboard:snapshot'
+
+# name -> (function, ttl in seconds); filled by @widget
+WIDGETS = {}
+
+
+def widget(name, ttl):
+    """Register a dashboard widget recomputed at most every ``ttl`` seconds"""
+    def decorator(func):
+        WIDGETS[name] = (func, ttl)
+        return func
+    return decorator
+
+
+@widget('totals', ttl=300)
+def totals():
+    return {
+        'total_users': User.objects.count(),
+        'total_products': Product.objects.count(),
+        # The rollups also cover archived orders
+        'total_orders': sum(row['count'] for row in analytics.status_breakdown()),
+        'total_revenue': analytics.revenue(),
+    }
+
+
+@widget('recent_activity', ttl=300)
+def recent_activity():
+    last_7_days = timezone.now() - timedelta(days=7)
+    return {
+        'recent_orders': sum(row['count'] for row in analytics.status_breakdown(days=7)),
+        'recent_users': User.objects.filter(date_joined__gte=last_7_days).count(),
+    }
+
+
+@widget('order_status', ttl=300)
+def order_status():
+    return [{'status': row['status'], 'count': row['count']} for row in analytics.status_breakdown()]
+
+
+@widget('top_products', ttl=900)
+def top_products():
+    return [
+        {'name': row['product__name'], 'order_count': row['orders']}
+        for row in analytics.top_products(days=None, limit=5)
+    ]
+
+
+@widget('low_stock_products', ttl=600)
+def low_stock_products():
+    return list(
+        ProductVariant.objects.filter(is_active=True, stock_available__lte=F('low_stock_threshold'))
+        .values('product_id', 'product__name')
+        .annotate(variants=Count('id'))
+        .order_by('product__name')[:10]
+    )
+
+
+@widget('category_performance', ttl=900)
+def category_performance():
+    rows = analytics.category_performance(days=None, limit=5)
+    product_counts = dict(
+        Category.objects.filter(id__in=[row['category_id'] for row in rows])
+        .annotate(product_count=Count('products'))
+        .values_list('id', 'product_count')
+    )
+    return [
+        {
+            'name': row['category__name'],
+            'product_count': product_counts.get(row['category_id'], 0),
+            'order_count': row['orders'],
+        }
+        for row in rows
+    ]
+
+
+def refresh_snapshot(force=False, names=None):
+    """
+    Recompute stale widgets (or all of them with ``force``) and store the snapshot.
+
+    Widgets keep their own ``computed_at`` so each is refreshed on its own TTL.
+    A failing widget keeps its previous value instead of breaking the dashboard.
+    Returns the snapshot dict.
+    """
+    snapshot = cache.get(DASHBOARD_CACHE_KEY) or {}
+    now = timezone.now()
+    for name, (func, ttl) in WIDGETS.items():
+        if names is not None and name not in names:
+            continue
+        entry = snapshot.get(name)
+        if not force and entry is not None and entry['computed_at'] + timedelta(seconds=ttl) > now:
+            continue
+        try:
+            snapshot[name] = {'data': func(), 'computed_at': now}
+        except Exception as exc:
+            logger.error(f"Dashboard widget {name} failed: {str(exc)}")
+    cache.set(DASHBOARD_CACHE_KEY, snapshot, timeout=None)
+    return snapshot
+
+
+def get_snapshot():
+    """Return the cached snapshot, building it in-request only when the cache is cold"""
+    snapshot = cache.get(DASHBOARD_CACHE_KEY)
+    if snapshot is None or any(name not in snapshot for name in WIDGETS):
+        snapshot = refresh_snapshot(names=[name for name in WIDGETS if name not in (snapshot or {})])
+    return snapshot
+
+
+def snapshot_context(snapshot):
+    """Flatten a snapshot into the dashboard template context"""
+    context = {}
+    for name, entry in snapshot.items():
+        data = entry['data']
+        if isinstance(data, dict):
+            context.update(data)
+        else:
+            context[name] = data
+    computed = [entry['computed_at'] for entry in snapshot.values()]
+    context['snapshot_updated_at'] = min(computed) if computed else None
+    return context
+
+
+@shared_task
+def refresh_dashboard_snapshot(force=False):
+    """
+    Refresh stale admin dashboard widgets
+    Run every minute via Celery Beat
+    """
+    snapshot = refresh_snapshot(force=force)
+    return f"Dashboard snapshot has {len(snapshot)} widgets"
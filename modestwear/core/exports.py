@@ -0,0 +1,181 @@
+import csv
+import json
+import logging
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from apps.catalog.models import ProductVariant
+from apps.orders.models import Order
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+ORDER_FIELDS = ('id', 'user_id', 'user__email', 'status', 'total_price', 'address', 'created_at')
+ORDER_ITEM_FIELDS = ('items__id', 'items__variant__sku', 'items__quantity', 'items__price_at_purchase')
+USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'phone_number',
+    'is_verified', 'is_active', 'is_staff', 'date_joined', 'last_login',
+)
+VARIANT_FIELDS = (
+    'id', 'sku', 'product_id', 'product__name', 'product__category__name', 'size', 'color',
+    'stock_available', 'low_stock_threshold', 'is_active', 'product__base_price', 'stock_updated_at',
+)
+# Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportBusy(Exception):
+    """Raised when the caller already runs an export or every export slot is taken"""
+
+
+def _order_rows(queryset):
+    # One LEFT JOIN row per line item; NDJSON folds them back into one object per order
+    return queryset.values(*ORDER_FIELDS, *ORDER_ITEM_FIELDS).order_by('id', 'items__id')
+
+
+def _nest_order_items(rows):
+    for _, lines in groupby(rows, key=itemgetter('id')):
+        lines = list(lines)
+        order = {field: lines[0][field] for field in ORDER_FIELDS}
+        order['items'] = [
+            {field.split('__', 1)[1]: line[field] for field in ORDER_ITEM_FIELDS}
+            for line in lines if line['items__id'] is not None
+        ]
+        yield order
+
+
+# name -> (base queryset, CSV columns, values() rows for a queryset, NDJSON regrouping or None)
+EXPORTS = {
+    'orders': (
+        lambda: Order.objects.all(),
+        ORDER_FIELDS + ORDER_ITEM_FIELDS,
+        _order_rows,
+        _nest_order_items,
+    ),
+    'users': (
+        lambda: User.objects.all(),
+        USER_FIELDS,
+        lambda queryset: queryset.values(*USER_FIELDS).order_by('id'),
+        None,
+    ),
+    'variants': (
+        lambda: ProductVariant.objects.all(),
+        VARIANT_FIELDS,
+        lambda queryset: queryset.values(*VARIANT_FIELDS).order_by('id'),
+        None,
+    ),
+}
+
+
+class _Echo:
+    """File-like object handing each csv line straight back instead of buffering it"""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    # Quoted so user-entered text (names, addresses) cannot run as a formula when the file is opened
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    # The header goes out first, so an export with no rows is still a valid file
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[column]) for column in columns])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def _acquire_slot(owner):
+    """
+    Claim the caller's single export slot and one of ``EXPORT_MAX_CONCURRENT`` global slots.
+
+    Slots are cache keys with a TTL, so a crashed worker cannot hold one forever.
+    When the cache is unreachable exports are allowed rather than blocked.
+    Returns the keys to release.
+    """
+    ttl = getattr(settings, 'EXPORT_SLOT_TTL', 60 * 30)
+    user_key = f"exports:user:{owner}"
+    if not cache.add(user_key, 1, timeout=ttl) and cache.get(user_key) is not None:
+        raise ExportBusy("You already have an export running")
+    for slot in range(getattr(settings, 'EXPORT_MAX_CONCURRENT', 2)):
+        slot_key = f"exports:slot:{slot}"
+        if cache.add(slot_key, owner, timeout=ttl) or cache.get(slot_key) is None:
+            return [user_key, slot_key]
+    cache.delete(user_key)
+    raise ExportBusy("Too many exports are running, try again shortly")
+
+
+class _ReleasingStream:
+    """Streams the export and frees its slots when done or when the response is closed early"""
+    def __init__(self, chunks, keys):
+        self.chunks = chunks
+        self.keys = keys
+
+    def __iter__(self):
+        try:
+            yield from self.chunks
+        finally:
+            self.close()
+
+    def close(self):
+        if self.keys:
+            cache.delete_many(self.keys)
+            self.keys = None
+
+
+def export_response(name, file_format, queryset=None, owner='anon'):
+    """
+    Stream the ``name`` export as CSV or NDJSON.
+
+    Rows come from ``.values()`` over a server-side cursor fetched
+    ``EXPORT_CHUNK_SIZE`` at a time, so memory stays flat at any size.
+    Raises ExportBusy when the caller or the whole site is at its export limit.
+    """
+    base_queryset, columns, to_rows, regroup = EXPORTS[name]
+    queryset = base_queryset() if queryset is None else queryset
+    rows = to_rows(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'ndjson':
+        chunks = stream_ndjson(regroup(rows) if regroup else rows)
+    else:
+        chunks = stream_csv(rows, columns)
+
+    keys = _acquire_slot(owner)
+    logger.info(f"Streaming {name} export as {file_format} for {owner}")
+    response = StreamingHttpResponse(_ReleasingStream(chunks, keys), content_type=CONTENT_TYPES[file_format])
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_action(name, file_format):
+    """Build an admin action streaming the selected rows of the ``name`` export"""
+    def action(modeladmin, request, queryset):
+        # Re-select by pk so changelist annotations do not leak into the export query
+        selected = queryset.model._default_manager.filter(pk__in=queryset.values('pk'))
+        try:
+            return export_response(name, file_format, selected, owner=request.user.pk)
+        except ExportBusy as exc:
+            modeladmin.message_user(request, str(exc), level='warning')
+    action.__name__ = f"export_{file_format}"
+    action.short_description = f"Export selected as {file_format.upper()}"
+    return action
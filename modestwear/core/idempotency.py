@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+
+def _request_fingerprint(request):
+    """Hash method, path and canonical body so a reused key with a different payload is detected"""
+    try:
+        body = json.dumps(request.data, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        body = repr(request.data)
+    raw = f"{request.method}:{request.path}:{body}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_key(request, key):
+    """Scope keys per user (or anonymous) and endpoint so clients cannot collide"""
+    owner = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+    digest = hashlib.sha256(f"{owner}:{request.method}:{request.path}:{key}".encode('utf-8')).hexdigest()
+    return f"idempotency:{digest}"
+
+
+def _replay(entry, fingerprint):
+    if entry.get('fingerprint') != fingerprint:
+        return Response(
+            {'error': 'Idempotency-Key was already used with a different request payload'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if entry.get('state') == IN_PROGRESS:
+        return Response(
+            {'error': 'A request with this Idempotency-Key is still being processed'},
+            status=status.HTTP_409_CONFLICT
+        )
+    response = Response(entry.get('data'), status=entry['status_code'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Deduplicate mutating requests carrying an ``Idempotency-Key`` header.
+
+    The first request claims the key with an atomic ``cache.add`` and runs the view;
+    a successful (2xx) response is stored for ``IDEMPOTENCY_KEY_TTL`` seconds and
+    replayed to retries without re-executing the view. Anything else, whether the
+    view returns a 4xx/5xx or raises (validation errors, 404s), releases the key:
+    such failures usually depend on state that can change, like stock, so a retry
+    runs the view again. Requests without the header are passed straight through.
+
+    Works on APIView methods and on ``@api_view`` functions (apply it below ``@api_view``).
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = args[0] if isinstance(args[0], Request) else args[1]
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_func(*args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'error': 'Idempotency-Key must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _request_fingerprint(request)
+        lock_ttl = getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60)
+        result_ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
+        claimed = cache.add(cache_key, {'state': IN_PROGRESS, 'fingerprint': fingerprint}, timeout=lock_ttl)
+        if not claimed:
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            # Cache unavailable or the claim expired between add and get: degrade to a normal request
+            logger.warning("Idempotency cache unavailable, processing request without deduplication")
+
+        try:
+            response = view_func(*args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if not status.is_success(response.status_code) or not hasattr(response, 'data'):
+            cache.delete(cache_key)
+            return response
+
+        cache.set(cache_key, {
+            'state': COMPLETED,
+            'fingerprint': fingerprint,
+            'status_code': response.status_code,
+            'data': response.data,
+        }, timeout=result_ttl)
+        return response
+
+    return wrapper
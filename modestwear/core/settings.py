@@ -61,6 +61,13 @@ INSTALLED_APPS = [
 	"apps.outfits.apps.OutfitsConfig",	
 ]
 
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    "idempotency-key",
+)
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://localhost:3001",
@@ -129,6 +136,13 @@ CACHES = {
     }
 }
 
+# Idempotency-Key replay window for mutating endpoints (seconds)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TTL = 60
+
+# How long polled order statuses stay cached; transitions rewrite the entry
+ORDER_STATUS_CACHE_TTL = 60 * 60
+
 # Celery Configuration
 CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="redis://127.0.0.1:6379/0")
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND", default="redis://127.0.0.1:6379/0")
@@ -152,7 +166,81 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.orders.tasks.check_low_stock_alerts',
         'schedule': crontab(minute=0),  # Every hour
     },
+    'dispatch-outbox-events': {
+        'task': 'apps.orders.tasks.dispatch_outbox_events',
+        'schedule': 10.0,  # Every 10 seconds
+    },
+    'purge-outbox-events': {
+        'task': 'apps.orders.tasks.purge_outbox_events',
+        'schedule': crontab(hour=3, minute=0),  # Daily at 3 AM
+    },
+    'archive-old-orders': {
+        'task': 'apps.orders.tasks.archive_old_orders',
+        'schedule': crontab(hour=4, minute=0),  # Daily at 4 AM
+    },
+    'refresh-dashboard-snapshot': {
+        'task': 'core.dashboard.refresh_dashboard_snapshot',
+        'schedule': 60.0,  # Every minute; each widget only recomputes once its TTL is up
+    },
+    'build-product-complements': {
+        'task': 'apps.outfits.tasks.build_product_complements',
+        'schedule': crontab(hour=5, minute=0),  # Daily at 5 AM
+    },
+    'flush-outfit-engagement': {
+        'task': 'apps.outfits.tasks.flush_outfit_engagement',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    'decay-outfit-trending': {
+        'task': 'apps.outfits.tasks.decay_outfit_trending',
+        'schedule': crontab(minute=15),  # Every hour
+    },
+    'refresh-promoted-outfit-snapshots': {
+        'task': 'apps.outfits.tasks.refresh_promoted_outfit_snapshots',
+        'schedule': crontab(minute=0),  # Every hour
+    },
+    'rebalance-outfit-item-ranks': {
+        'task': 'apps.outfits.tasks.rebalance_outfit_item_ranks',
+        'schedule': crontab(hour=5, minute=30),  # Daily at 5:30 AM
+    },
 }
+# core is not an installed app, so autodiscovery does not see its tasks
+CELERY_IMPORTS = ('core.dashboard',)
+
+# Transactional outbox dispatch
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETENTION_DAYS = 7
+
+# Delivered/cancelled orders older than this move to the archive tables, in batches
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', 365))
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+# Orders per transaction for admin bulk status changes
+BULK_ORDER_JOB_CHUNK_SIZE = 1000
+
+# Streaming exports: concurrent exports site-wide (one per user) and how long a crashed one holds its slot
+EXPORT_MAX_CONCURRENT = 2
+EXPORT_SLOT_TTL = 60 * 30
+
+# Compiled promotion rules are reloaded at least this often, even if the cache missed an invalidation
+PRICING_RULES_TTL = 300
+
+# Public outfit feed pages; also dropped whenever a public outfit changes
+OUTFIT_FEED_CACHE_TTL = 300
+
+# Complete-the-look: complements kept per product, and outfits a pair must share to count
+COMPLEMENT_TOP_K = 10
+COMPLEMENT_MIN_COUNT = 2
+
+# Outfit engagement: popularity/trending weight per unique viewer (or view), like and save
+OUTFIT_ENGAGEMENT_WEIGHTS = {'views': 1, 'likes': 3, 'saves': 5}
+OUTFIT_ENGAGEMENT_FLUSH_BATCH = 500
+OUTFIT_TRENDING_HALF_LIFE_HOURS = 24
+# Unique viewer sketches of outfits not viewed for this many seconds are dropped from Redis
+OUTFIT_VIEWERS_TTL = 60 * 60 * 24 * 30
+
+# Outfits whose item ranks grew longer than this through repeated moves are respread by the nightly pass
+OUTFIT_RANK_REBALANCE_LENGTH = 16
 if CELERY_BROKER_URL.startswith("rediss://"):
     CELERY_BROKER_USE_SSL = {"ssl_cert_reqs": ssl.CERT_NONE}
     CELERY_REDIS_BACKEND_USE_SSL = {"ssl_cert_reqs": ssl.CERT_NONE}
@@ -288,6 +376,10 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = 'modestwear <noreply@yourapp.com>'
 CONTACT_EMAIL = 'support@modestwear'
+# Staff addresses receiving the hourly low stock digest (comma separated)
+STOCK_ALERT_RECIPIENTS = [e.strip() for e in os.getenv('STOCK_ALERT_RECIPIENTS', '').split(',') if e.strip()]
+# Skip re-sending the same wishlist restock/price drop alert within this window
+WISHLIST_NOTIFY_COOLDOWN = 60 * 60 * 24
 
 # Social Auth
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', '')
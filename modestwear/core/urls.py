@@ -8,7 +8,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view as swagger_get_schema_view
 from core.admin import admin_site
 from .health import health_check, healthz
-from .views import index
+from .views import ExportView, index
 
 # Import admin registry to register models
 import core.admin_registry
@@ -33,6 +33,7 @@ urlpatterns = [
 	path("api/catalog/", include("apps.catalog.urls")),
 	path("api/orders/", include("apps.orders.urls")),
 	path("api/outfits/", include("apps.outfits.urls")),
+	path("api/exports/<str:name>.<str:file_format>", ExportView.as_view(), name="export"),
 	path("docs/", schema_view.with_ui("swagger", cache_timeout=0), name="swagger-schema"),
 	path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="redoc-schema"),
 	
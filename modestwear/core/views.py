@@ -1,4 +1,48 @@
 from django.shortcuts import render
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.orders.models import Order
+from core.exports import CONTENT_TYPES, EXPORTS, ExportBusy, export_response
 
 def index(request):
-    return render(request, 'index.html')
\ No newline at end of file
+    return render(request, 'index.html')
+
+class ExportView(APIView):
+    """Staff-only streaming export: /api/exports/<orders|users|variants>.<csv|ndjson>"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name, file_format):
+        if name not in EXPORTS or file_format not in CONTENT_TYPES:
+            raise NotFound('Unknown export')
+        queryset = None
+        if name == 'orders':
+            queryset = self._filter_orders(request)
+        try:
+            return export_response(name, file_format, queryset, owner=request.user.pk)
+        except ExportBusy as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': '60'})
+
+    def _filter_orders(self, request):
+        queryset = Order.objects.all()
+        order_status = request.query_params.get('status')
+        if order_status:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                raise ValidationError({'status': f"Unknown status '{order_status}'"})
+            queryset = queryset.filter(status=order_status)
+        for param, lookup in (('created_after', 'created_at__date__gte'), ('created_before', 'created_at__date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    # None when malformed, ValueError for well-formed impossible dates like 2024-13-45
+                    day = parse_date(value)
+                except ValueError:
+                    day = None
+                if day is None:
+                    raise ValidationError({param: 'Use YYYY-MM-DD'})
+                queryset = queryset.filter(**{lookup: day})
+        return queryset
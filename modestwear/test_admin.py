@@ -1,15 +1,19 @@
 import pytest
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.admin.sites import AdminSite
 from decimal import Decimal
 from datetime import datetime, timedelta
 from unittest.mock import patch, Mock
-from apps.catalog.models import Category, Product, ProductVariant
+from apps.catalog.models import Category, CoverageLevel, Product, ProductVariant
 from apps.orders.models import Order, OrderItem
 from apps.outfits.models import Outfit
 from core.admin import ModestWearAdminSite
+from core.dashboard import DASHBOARD_CACHE_KEY, WIDGETS, refresh_snapshot
 from apps.catalog.admin import ProductAdmin, CategoryAdmin
 from apps.orders.admin import OrderAdmin
 from apps.users.admin import UserAdmin
@@ -476,4 +480,94 @@ class AdminSecurityTests(TestCase):
     
     def test_admin_access_anonymous_user_denied(self):
         response = self.client.get('/admin/')
-        self.assertEqual(response.status_code, 302)  # Redirect to login
\ No newline at end of file
+        self.assertEqual(response.status_code, 302)  # Redirect to login
+@pytest.mark.django_db
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'dashboard-tests'}},
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password=TEST_ADMIN_PASSWORD
+        )
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
+    def test_dashboard_renders_from_one_cache_read(self):
+        refresh_snapshot()
+        with self.assertNumQueries(2):  # session and user lookups only
+            response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Total Users')
+
+    def test_cold_cache_builds_snapshot(self):
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(cache.get(DASHBOARD_CACHE_KEY)), set(WIDGETS))
+
+    def test_widgets_refresh_on_their_own_ttl(self):
+        snapshot = refresh_snapshot()
+        computed_at = snapshot['totals']['computed_at']
+        snapshot['top_products']['computed_at'] -= timedelta(seconds=WIDGETS['top_products'][1] + 1)
+        cache.set(DASHBOARD_CACHE_KEY, snapshot)
+
+        refreshed = refresh_snapshot()
+        self.assertEqual(refreshed['totals']['computed_at'], computed_at)
+        self.assertGreater(refreshed['top_products']['computed_at'], computed_at)
+
+    def test_refresh_button_recomputes(self):
+        refresh_snapshot()
+        User.objects.create_user(username='new', email='new@example.com', password=TEST_USER_PASSWORD)
+        self.assertEqual(self.client.get('/admin/dashboard/refresh/').status_code, 405)
+
+        response = self.client.post('/admin/dashboard/refresh/')
+        self.assertRedirects(response, '/admin/', fetch_redirect_response=False)
+        self.assertEqual(cache.get(DASHBOARD_CACHE_KEY)['totals']['data']['total_users'], 2)
+
+@pytest.mark.django_db
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ProductChangelistQueryTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password=TEST_ADMIN_PASSWORD
+        )
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+        self.category = Category.objects.create(name="Dresses", slug="dresses")
+        self.coverage = CoverageLevel.objects.create(name="Full")
+
+    def _create_products(self, count, variants=3):
+        for i in range(Product.objects.count(), Product.objects.count() + count):
+            product = Product.objects.create(
+                name=f"Dress {i}", slug=f"dress-{i}", category=self.category, base_price=Decimal('50.00')
+            )
+            for v in range(variants):
+                ProductVariant.objects.create(
+                    product=product, sku=f"D{i}-{v}", color='Blue', coverage=self.coverage, stock_available=i + v
+                )
+
+    def _changelist_queries(self, url='/admin/catalog/product/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_constant_queries_for_any_page_size(self):
+        self._create_products(2)
+        _, few = self._changelist_queries()
+        self._create_products(10)
+        _, many = self._changelist_queries()
+        self.assertEqual(few, many)
+
+    def test_annotated_columns_sort_without_duplicates(self):
+        self._create_products(3)
+        response, _ = self._changelist_queries('/admin/catalog/product/?o=-6')
+        products = list(response.context['cl'].result_list)
+        self.assertEqual([p.total_stock for p in products], [9, 6, 3])
+        self.assertEqual({p.variant_count for p in products}, {3})
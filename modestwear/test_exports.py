@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.orders.models import OrderItem
+from core import exports
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(api_client, admin_user):
+    token = RefreshToken.for_user(admin_user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return api_client
+
+
+def _body(response):
+    assert response.streaming
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.mark.api
+class TestExports:
+    """Test streaming CSV/NDJSON exports"""
+
+    @pytest.fixture
+    def order_with_items(self, order, product_variant):
+        OrderItem.objects.create(order=order, variant=product_variant, quantity=2, price_at_purchase=10)
+        OrderItem.objects.create(order=order, variant=product_variant, quantity=1, price_at_purchase=12)
+        return order
+
+    def test_orders_ndjson_nests_items(self, admin_client, order_with_items, locmem_cache):
+        """Test NDJSON emits one object per order with its line items"""
+        response = admin_client.get(reverse('export', args=['orders', 'ndjson']))
+
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = [json.loads(line) for line in _body(response).splitlines()]
+        assert len(lines) == 1
+        assert lines[0]['id'] == order_with_items.id
+        assert [item['quantity'] for item in lines[0]['items']] == [2, 1]
+
+    def test_orders_csv_one_row_per_item(self, admin_client, order_with_items, locmem_cache):
+        """Test CSV flattens orders into one row per line item"""
+        response = admin_client.get(reverse('export', args=['orders', 'csv']))
+
+        rows = list(csv.DictReader(io.StringIO(_body(response))))
+        assert [row['items__variant__sku'] for row in rows] == ['EMD-001-M-NAVY'] * 2
+        assert 'attachment' in response['Content-Disposition']
+
+    def test_csv_cells_cannot_run_formulas(self, admin_client, order_with_items, locmem_cache):
+        """Test text cells starting with formula characters are quoted"""
+        order_with_items.address = '=HYPERLINK("http://example.com")'
+        order_with_items.save()
+        response = admin_client.get(reverse('export', args=['orders', 'csv']))
+
+        rows = list(csv.DictReader(io.StringIO(_body(response))))
+        assert rows[0]['address'] == '\'=HYPERLINK("http://example.com")'
+        assert rows[0]['total_price'] == str(order_with_items.total_price)
+
+    def test_empty_csv_has_header(self, admin_client, locmem_cache):
+        """Test an export matching no rows still starts with the header row"""
+        response = admin_client.get(reverse('export', args=['orders', 'csv']), {'status': 'shipped'})
+
+        assert _body(response).splitlines() == [','.join(exports.ORDER_FIELDS + exports.ORDER_ITEM_FIELDS)]
+
+    def test_invalid_dates_rejected(self, admin_client, locmem_cache):
+        """Test malformed and impossible dates are 400s"""
+        for value in ('yesterday', '2024-13-45'):
+            response = admin_client.get(reverse('export', args=['orders', 'csv']), {'created_after': value})
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_variants_and_users(self, admin_client, product_variant, locmem_cache):
+        """Test variant stock and user exports"""
+        variants = list(csv.DictReader(io.StringIO(_body(admin_client.get(reverse('export', args=['variants', 'csv']))))))
+        assert variants[0]['sku'] == product_variant.sku
+        assert variants[0]['stock_available'] == '50'
+
+        users = _body(admin_client.get(reverse('export', args=['users', 'ndjson']))).splitlines()
+        assert json.loads(users[0])['email'] == 'admin@example.com'
+
+    def test_staff_only(self, authenticated_client):
+        """Test regular users cannot export"""
+        response = authenticated_client.get(reverse('export', args=['users', 'csv']))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_unknown_export(self, admin_client):
+        """Test unknown names and formats are 404s"""
+        assert admin_client.get(reverse('export', args=['secrets', 'csv'])).status_code == status.HTTP_404_NOT_FOUND
+        assert admin_client.get(reverse('export', args=['users', 'xml'])).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_concurrent_exports_limited(self, admin_client, admin_user, settings, locmem_cache):
+        """Test one export per user and a global cap, with slots freed when the stream ends"""
+        settings.EXPORT_MAX_CONCURRENT = 1
+        first = admin_client.get(reverse('export', args=['users', 'csv']))
+        busy = admin_client.get(reverse('export', args=['users', 'csv']))
+        assert busy.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        with pytest.raises(exports.ExportBusy):
+            exports.export_response('users', 'csv', owner='someone-else')
+
+        first.close()
+        assert admin_client.get(reverse('export', args=['users', 'csv'])).status_code == status.HTTP_200_OK
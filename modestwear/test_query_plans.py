@@ -0,0 +1,143 @@
+"""
+Query plan regression tests for the hot ORM queries.
+
+Each query is EXPLAINed against a seeded, ANALYZEd Postgres database and the
+test fails when the plan falls back to a sequential scan over a table larger
+than SEQ_SCAN_ROW_THRESHOLD rows. Skipped on other databases, whose planners
+(and lack of statistics) make the check meaningless.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from apps.catalog.models import Category, CoverageLevel, Product, ProductVariant
+from apps.orders.models import CartItem, Order, OrderItem, OutboxEvent, WishList
+from apps.outfits.models import Outfit
+from apps.users.models import User
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'postgresql', reason='EXPLAIN checks need Postgres'),
+]
+
+SEQ_SCAN_ROW_THRESHOLD = 1000
+SEED_USERS = 200
+SEED_PRODUCTS = 2000
+SEED_ORDERS = 5000
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _plan_nodes(child)
+
+
+def assert_no_large_seq_scan(queryset):
+    """EXPLAIN ``queryset`` and fail on a sequential scan of a table above the row threshold"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        raw = cursor.fetchone()[0]
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+        offenders = []
+        for node in _plan_nodes(plan):
+            if node['Node Type'] != 'Seq Scan':
+                continue
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [node['Relation Name']])
+            rows = cursor.fetchone()[0]
+            if rows > SEQ_SCAN_ROW_THRESHOLD:
+                offenders.append(f"{node['Relation Name']} ({int(rows)} rows)")
+    assert not offenders, f"Sequential scan on {', '.join(offenders)}:\n{json.dumps(plan, indent=2)}"
+
+
+@pytest.fixture
+def seeded(db):
+    """Enough rows in every hot table for the planner to prefer indexes, then ANALYZE"""
+    now = timezone.now()
+    users = User.objects.bulk_create(
+        User(email=f'user{i}@example.com', username=f'user{i}') for i in range(SEED_USERS)
+    )
+    coverage = CoverageLevel.objects.create(name='Full')
+    categories = Category.objects.bulk_create(
+        Category(name=f'Category {i}', slug=f'category-{i}') for i in range(20)
+    )
+    products = Product.objects.bulk_create(
+        Product(
+            category=categories[i % len(categories)], name=f'Product {i}', slug=f'product-{i}',
+            base_price=Decimal(10 + i % 200), product_size=coverage,
+        )
+        for i in range(SEED_PRODUCTS)
+    )
+    variants = ProductVariant.objects.bulk_create(
+        ProductVariant(
+            product=products[i % len(products)], sku=f'SKU-{i}', color='Navy', coverage=coverage,
+            stock_available=i % 40, is_active=i % 5 != 0,
+        )
+        for i in range(SEED_PRODUCTS * 3)
+    )
+    orders = Order.objects.bulk_create(
+        Order(user=users[i % len(users)], total_price=Decimal('50.00'), address='x', status='delivered')
+        for i in range(SEED_ORDERS)
+    )
+    Order.objects.update(created_at=now - timedelta(days=30))
+    OrderItem.objects.bulk_create(
+        OrderItem(order=orders[i % len(orders)], variant=variants[i % len(variants)], quantity=1, price_at_purchase=10)
+        for i in range(SEED_ORDERS * 2)
+    )
+    CartItem.objects.bulk_create(
+        CartItem(user=users[i % len(users)], variant=variants[i]) for i in range(SEED_ORDERS)
+    )
+    WishList.objects.bulk_create(
+        WishList(user=users[i % len(users)], variant=variants[i]) for i in range(SEED_ORDERS)
+    )
+    Outfit.objects.bulk_create(
+        Outfit(user=users[i % len(users)], name=f'Outfit {i}', is_public=i % 10 == 0) for i in range(SEED_ORDERS)
+    )
+    OutboxEvent.objects.bulk_create(
+        OutboxEvent(topic='order.created', payload={}, processed_at=now) for _ in range(SEED_ORDERS)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return {'user': users[0], 'variant': variants[1], 'product': products[1], 'category': categories[1]}
+
+
+class TestHotQueryPlans:
+    """Hot queries must be served by an index"""
+
+    def test_order_history(self, seeded):
+        assert_no_large_seq_scan(
+            Order.objects.filter(user=seeded['user']).order_by('-created_at', '-id')[:21]
+        )
+
+    def test_cart_item_lookup(self, seeded):
+        assert_no_large_seq_scan(CartItem.objects.filter(user=seeded['user'], variant=seeded['variant']))
+
+    def test_variant_sales(self, seeded):
+        assert_no_large_seq_scan(OrderItem.objects.filter(variant=seeded['variant']).values('order_id'))
+
+    def test_active_variants_of_product(self, seeded):
+        assert_no_large_seq_scan(ProductVariant.objects.filter(product=seeded['product'], is_active=True))
+
+    def test_public_outfit_feed(self, seeded):
+        assert_no_large_seq_scan(Outfit.objects.filter(is_public=True).order_by('-created_at')[:20])
+
+    def test_category_price_range(self, seeded):
+        assert_no_large_seq_scan(
+            Product.objects.filter(category=seeded['category'], base_price__lte=50).order_by('base_price')
+        )
+
+    def test_wishers_of_variant(self, seeded):
+        assert_no_large_seq_scan(WishList.objects.filter(variant=seeded['variant']).order_by('user_id'))
+
+    def test_pending_outbox_events(self, seeded):
+        assert_no_large_seq_scan(OutboxEvent.objects.filter(processed_at__isnull=True).order_by('id')[:100])
+
+    def test_old_orders_to_archive(self, seeded):
+        assert_no_large_seq_scan(
+            Order.objects.filter(status__in=('delivered', 'cancelled'), created_at__lt=timezone.now() - timedelta(days=365))
+            .order_by('id')[:1000]
+        )